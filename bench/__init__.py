@@ -0,0 +1,31 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Benchmarks for rtctree.
+
+The benchmarks run against a system of mock components and an in-memory
+naming service served by this package, so neither OpenRTM nor omniNames is
+needed. omniORBpy and the rtctree IDL stubs are required. Run them from the
+top of the source tree:
+
+    $ python -m bench.run --components 100 --ports 4 --connections 100 \\
+        --depth 2 --output results.json
+
+See "python -m bench.run --help" for all options.
+
+'''
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
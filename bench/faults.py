@@ -0,0 +1,184 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Artificial latency and failure injection for mock servants.
+
+'''
+
+
+import random
+import threading
+import time
+
+import omniORB
+from omniORB import CORBA
+
+
+## Kinds of failure that can be injected.
+TRANSIENT = 'TRANSIENT'
+OBJECT_NOT_EXIST = 'OBJECT_NOT_EXIST'
+
+
+def make_exception(kind):
+    '''Create the CORBA system exception for a kind of failure.'''
+    if kind == TRANSIENT:
+        return CORBA.TRANSIENT(omniORB.TRANSIENT_ConnectFailed,
+                CORBA.COMPLETED_NO)
+    elif kind == OBJECT_NOT_EXIST:
+        return CORBA.OBJECT_NOT_EXIST(0, CORBA.COMPLETED_NO)
+    raise ValueError(kind)
+
+
+##############################################################################
+## Faults object
+
+class Faults(object):
+    '''Latency and failures to apply to operations on mock servants.
+
+    Every operation called on a servant using this object first sleeps for
+    its latency, then fails if a failure rule matches it. Random choices use
+    a seeded generator, so a run with the same seed and the same sequence of
+    calls fails the same calls.
+
+    '''
+    def __init__(self, latency=0.0, jitter=0.0, seed=0):
+        '''Constructor.
+
+        @param latency The default latency of every operation, in seconds.
+        @param jitter Maximum random time, in seconds, added to the latency.
+        @param seed Seed for the random number generator.
+
+        '''
+        self._latency = latency
+        self._op_latency = {}
+        self._jitter = jitter
+        self._rules = []
+        self._next = {}
+        self._dead = set()
+        self._counts = {}
+        self._random = random.Random(seed)
+        self._mutex = threading.Lock()
+
+    def add_failure(self, kind, probability=1.0, operation=None):
+        '''Make operations fail with a probability.
+
+        @param kind TRANSIENT or OBJECT_NOT_EXIST.
+        @param probability The probability of each matching call failing.
+        @param operation The name of the operation to fail, or None for all
+                         operations.
+
+        '''
+        with self._mutex:
+            self._rules.append((operation, probability, kind))
+
+    def clear(self):
+        '''Remove all latencies, failures and dead servants.'''
+        with self._mutex:
+            self._latency = 0.0
+            self._op_latency = {}
+            self._jitter = 0.0
+            self._rules = []
+            self._next = {}
+            self._dead = set()
+
+    def fail_next(self, operation, kind, count=1):
+        '''Make the next calls to an operation fail.
+
+        @param operation The name of the operation.
+        @param kind TRANSIENT or OBJECT_NOT_EXIST.
+        @param count The number of calls to fail.
+
+        '''
+        with self._mutex:
+            self._next[operation] = (kind, count)
+
+    def kill(self, servant):
+        '''Make all calls on a servant fail with OBJECT_NOT_EXIST.'''
+        with self._mutex:
+            self._dead.add(id(servant))
+
+    def revive(self, servant):
+        '''Undo @ref kill.'''
+        with self._mutex:
+            self._dead.discard(id(servant))
+
+    def set_latency(self, latency, operation=None):
+        '''Set the latency, in seconds, of one or all operations.'''
+        with self._mutex:
+            if operation is None:
+                self._latency = latency
+            else:
+                self._op_latency[operation] = latency
+
+    @property
+    def counts(self):
+        '''The number of calls made to each operation.'''
+        with self._mutex:
+            return dict(self._counts)
+
+    def apply(self, operation, servant):
+        '''Apply the latency and failures to a call.
+
+        @raises CORBA.TRANSIENT, CORBA.OBJECT_NOT_EXIST
+
+        '''
+        with self._mutex:
+            self._counts[operation] = self._counts.get(operation, 0) + 1
+            latency = self._op_latency.get(operation, self._latency)
+            if self._jitter:
+                latency += self._random.uniform(0, self._jitter)
+            failure = None
+            if id(servant) in self._dead:
+                failure = OBJECT_NOT_EXIST
+            elif operation in self._next:
+                failure, count = self._next[operation]
+                if count <= 1:
+                    del self._next[operation]
+                else:
+                    self._next[operation] = (failure, count - 1)
+            else:
+                for op, probability, kind in self._rules:
+                    if op is not None and op != operation:
+                        continue
+                    if self._random.random() < probability:
+                        failure = kind
+                        break
+        if latency > 0:
+            time.sleep(latency)
+        if failure:
+            raise make_exception(failure)
+
+
+class FaultInjecting(object):
+    '''Mixin applying a Faults object to the public methods of a servant.
+
+    The servant must have a _faults attribute. It may be None, in which case
+    no faults are applied.
+
+    '''
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        faults = object.__getattribute__(self, '_faults')
+        if faults is None:
+            return attr
+        def call(*args, **kwargs):
+            faults.apply(name, self)
+            return attr(*args, **kwargs)
+        return call
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
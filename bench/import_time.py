@@ -0,0 +1,118 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Import time benchmark.
+
+Measures how long a fresh interpreter takes to import an rtctree module, by
+default rtctree.tree, and which modules the time is spent in:
+
+    $ python -m bench.import_time --repeats 10 --output import.json
+
+'''
+
+
+from __future__ import print_function
+
+import json
+import optparse
+import subprocess
+import sys
+import time
+
+import rtctree
+
+from bench.run import timed
+
+
+def import_once(module):
+    '''Import a module in a new interpreter and time it.
+
+    @return The wall-clock time the interpreter took to start, import the
+            module and exit, in seconds.
+
+    '''
+    start = time.time()
+    subprocess.check_call([sys.executable, '-c', 'import ' + module])
+    return time.time() - start
+
+
+def module_times(module):
+    '''Get the time spent importing each module, using -X importtime.
+
+    @return A dictionary of module names to their cumulative import times in
+            seconds.
+
+    '''
+    proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c',
+        'import ' + module], stderr=subprocess.PIPE)
+    err = proc.communicate()[1].decode()
+    times = {}
+    for line in err.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        times[parts[2].strip()] = int(parts[1]) / 1e6
+    return times
+
+
+def run(options):
+    baseline = timed(lambda: import_once('sys'), options.repeats)
+    result = timed(lambda: import_once(options.module), options.repeats)
+    modules = module_times(options.module)
+    top = sorted(modules.items(), key=lambda x: x[1], reverse=True)
+    return {'rtctree_version': rtctree.RTCTREE_VERSION,
+            'timestamp': time.time(),
+            'config': {'module': options.module,
+                       'repeats': options.repeats},
+            'results': {'interpreter': baseline,
+                        'import': result,
+                        'import_only_median': result['median'] - \
+                                baseline['median'],
+                        'slowest_modules': top[:options.top]}}
+
+
+##############################################################################
+## Main
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-m', '--module', dest='module', default='rtctree.tree',
+            help='Module to import. [Default: %default]')
+    parser.add_option('--repeats', dest='repeats', type='int', default=10,
+            help='Times to repeat the import. [Default: %default]')
+    parser.add_option('--top', dest='top', type='int', default=20,
+            help='Number of slowest modules to report. [Default: %default]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+            help='File to write the results to. [Default: stdout]')
+    options, args = parser.parse_args(argv[1:])
+
+    results = run(options)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
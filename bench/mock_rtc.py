@@ -0,0 +1,714 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Mock RT components for benchmarking.
+
+These servants implement enough of the RTObject, PortService,
+ExecutionContextService, SDO Configuration and RTM Manager interfaces for
+rtctree to discover, inspect, connect and control them. They do nothing else.
+Latency and failures can be injected into all of them with a
+bench.faults.Faults object.
+
+This module can also be run as a program to serve a mock system from a
+separate process, either on an existing naming service or on an in-memory
+one served by the same process:
+
+    $ python -m bench.mock_rtc --naming localhost:2809 --components 10
+    $ python -m bench.mock_rtc --memory-naming 2809 --components 10
+
+It prints "READY" on standard output once all the components are bound.
+
+'''
+
+
+from __future__ import print_function
+
+import optparse
+import sys
+import threading
+import uuid
+
+import CosNaming
+import omniORB.any
+from omniORB import CORBA
+
+from rtctree.rtc import RTC
+from rtctree.rtc import RTC__POA
+from rtctree.rtc import RTM
+from rtctree.rtc import RTM__POA
+from rtctree.rtc import SDOPackage
+from rtctree.rtc import SDOPackage__POA
+
+from bench import faults
+from bench.faults import FaultInjecting
+from bench.naming import MemoryNamingService
+
+
+def to_nvlist(d):
+    # Convert a dictionary of strings to an NVList.
+    return [SDOPackage.NameValue(k, omniORB.any.to_any(v)) \
+            for k, v in d.items()]
+
+
+##############################################################################
+## Servants
+
+class MockExecutionContext(FaultInjecting,
+        RTC__POA.ExecutionContextService):
+    '''A periodic execution context that only records component states.'''
+    def __init__(self, system, rate=1000.0):
+        self._sys = system
+        self._faults = system.faults
+        self._rate = rate
+        self._running = True
+        self._owner = None
+        self._participants = []
+        self._states = {}
+        self._mutex = threading.Lock()
+
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        self._running = True
+        return RTC.RTC_OK
+
+    def stop(self):
+        self._running = False
+        return RTC.RTC_OK
+
+    def get_rate(self):
+        return self._rate
+
+    def set_rate(self, rate):
+        self._rate = rate
+        return RTC.RTC_OK
+
+    def add_component(self, comp):
+        with self._mutex:
+            self._participants.append(comp)
+        return RTC.RTC_OK
+
+    def remove_component(self, comp):
+        return RTC.RTC_OK
+
+    def activate_component(self, comp):
+        return self._set_state(comp, RTC.ACTIVE_STATE)
+
+    def deactivate_component(self, comp):
+        return self._set_state(comp, RTC.INACTIVE_STATE)
+
+    def reset_component(self, comp):
+        return self._set_state(comp, RTC.INACTIVE_STATE)
+
+    def get_component_state(self, comp):
+        with self._mutex:
+            return self._states.get(self._sys.servant(comp),
+                    RTC.INACTIVE_STATE)
+
+    def get_kind(self):
+        return RTC.PERIODIC
+
+    def get_profile(self):
+        return RTC.ExecutionContextProfile(RTC.PERIODIC, self._rate,
+                self._owner, self._participants, [])
+
+    def _set_state(self, comp, state):
+        with self._mutex:
+            self._states[self._sys.servant(comp)] = state
+        return RTC.RTC_OK
+
+
+class MockPort(FaultInjecting, RTC__POA.PortService):
+    '''A data port holding connector profiles.'''
+    def __init__(self, system, name, port_type, owner):
+        self._sys = system
+        self._faults = system.faults
+        self._name = name
+        self._props = {'port.port_type': port_type,
+                       'dataport.data_type': 'IDL:RTC/TimedLong:1.0',
+                       'dataport.dataflow_type': 'push,pull',
+                       'dataport.interface_type': 'corba_cdr',
+                       'dataport.subscription_type': 'flush,new,periodic'}
+        self._owner = owner
+        self._conns = {}
+        self._mutex = threading.Lock()
+
+    def get_port_profile(self):
+        return self._profile()
+
+    def get_connector_profiles(self):
+        with self._mutex:
+            return list(self._conns.values())
+
+    def get_connector_profile(self, connector_id):
+        with self._mutex:
+            return self._conns.get(connector_id,
+                    RTC.ConnectorProfile('', '', [], []))
+
+    def connect(self, connector_profile):
+        if not connector_profile.connector_id:
+            connector_profile.connector_id = str(uuid.uuid4())
+        for p in connector_profile.ports:
+            self._sys.servant(p)._add(connector_profile)
+        return RTC.RTC_OK, connector_profile
+
+    def disconnect(self, connector_id):
+        return self._disconnect(connector_id)
+
+    def disconnect_all(self):
+        with self._mutex:
+            ids = list(self._conns.keys())
+        for id in ids:
+            self._disconnect(id)
+        return RTC.RTC_OK
+
+    def notify_connect(self, connector_profile):
+        self._add(connector_profile)
+        return RTC.RTC_OK, connector_profile
+
+    def notify_disconnect(self, connector_id):
+        self._remove(connector_id)
+        return RTC.RTC_OK
+
+    def _add(self, profile):
+        with self._mutex:
+            self._conns[profile.connector_id] = profile
+
+    def _disconnect(self, connector_id):
+        with self._mutex:
+            if connector_id not in self._conns:
+                return RTC.BAD_PARAMETER
+            prof = self._conns[connector_id]
+        for p in prof.ports:
+            self._sys.servant(p)._remove(connector_id)
+        return RTC.RTC_OK
+
+    def _profile(self):
+        with self._mutex:
+            conns = list(self._conns.values())
+        return RTC.PortProfile(self._name, [], self._sys.ref(self), conns,
+                self._sys.ref(self._owner), to_nvlist(self._props))
+
+    def _remove(self, connector_id):
+        with self._mutex:
+            if connector_id in self._conns:
+                del self._conns[connector_id]
+
+
+class MockConfiguration(FaultInjecting, SDOPackage__POA.Configuration):
+    '''Configuration sets and service profiles of a component.'''
+    def __init__(self, system, params):
+        self._faults = system.faults
+        self._sets = {'default': dict(params)}
+        self._active = 'default'
+        self._services = {}
+        self._mutex = threading.Lock()
+
+    def get_configuration_sets(self):
+        with self._mutex:
+            return [self._make_set(id) for id in self._sets]
+
+    def get_configuration_set(self, config_id):
+        with self._mutex:
+            if config_id not in self._sets:
+                raise SDOPackage.InvalidParameter(config_id)
+            return self._make_set(config_id)
+
+    def set_configuration_set_values(self, configuration_set):
+        with self._mutex:
+            values = self._sets.setdefault(configuration_set.id, {})
+            for nv in configuration_set.configuration_data:
+                values[nv.name] = nv.value.value()
+        return True
+
+    def get_active_configuration_set(self):
+        with self._mutex:
+            return self._make_set(self._active)
+
+    def add_configuration_set(self, configuration_set):
+        return self.set_configuration_set_values(configuration_set)
+
+    def remove_configuration_set(self, config_id):
+        with self._mutex:
+            return self._sets.pop(config_id, None) is not None
+
+    def activate_configuration_set(self, config_id):
+        with self._mutex:
+            if config_id not in self._sets:
+                return False
+            self._active = config_id
+        return True
+
+    def add_service_profile(self, sProfile):
+        with self._mutex:
+            self._services[sProfile.id] = sProfile
+        return True
+
+    def remove_service_profile(self, id):
+        with self._mutex:
+            return self._services.pop(id, None) is not None
+
+    def _make_set(self, id):
+        return SDOPackage.ConfigurationSet(id, '', to_nvlist(self._sets[id]))
+
+
+class MockComponent(FaultInjecting, RTC__POA.RTObject):
+    '''A component with data ports and one owned execution context.'''
+    def __init__(self, system, name, ports=2, params=4):
+        self._sys = system
+        self._faults = system.faults
+        self._name = name
+        self._ec = MockExecutionContext(system)
+        self._conf = MockConfiguration(system,
+                dict([('param{0}'.format(ii), '0') for ii in range(params)]))
+        self._ports = []
+        for ii in range(ports):
+            if ii % 2 == 0:
+                self._ports.append(MockPort(system, '{0}.out{1}'.format(name,
+                    ii // 2), 'DataOutPort', self))
+            else:
+                self._ports.append(MockPort(system, '{0}.in{1}'.format(name,
+                    ii // 2), 'DataInPort', self))
+        self._alive = True
+
+    def _activate(self):
+        # Activate this servant and the servants it holds.
+        self._sys.activate(self)
+        self._sys.activate(self._ec)
+        self._sys.activate(self._conf)
+        for p in self._ports:
+            self._sys.activate(p)
+        self._ec._owner = self._sys.ref(self)
+        self._ec._participants = [self._sys.ref(self)]
+
+    @property
+    def inports(self):
+        return [p for p in self._ports \
+                if p._props['port.port_type'] == 'DataInPort']
+
+    @property
+    def outports(self):
+        return [p for p in self._ports \
+                if p._props['port.port_type'] == 'DataOutPort']
+
+    # LightweightRTObject
+
+    def initialize(self):
+        return RTC.RTC_OK
+
+    def finalize(self):
+        return RTC.RTC_OK
+
+    def is_alive(self, exec_context):
+        return self._alive
+
+    def exit(self):
+        self._alive = False
+        return RTC.RTC_OK
+
+    def attach_context(self, exec_context):
+        return 1
+
+    def detach_context(self, exec_handle):
+        return RTC.RTC_OK
+
+    def get_context(self, exec_handle):
+        return self._sys.ref(self._ec)
+
+    def get_owned_contexts(self):
+        return [self._sys.ref(self._ec)]
+
+    def get_participating_contexts(self):
+        return []
+
+    def get_context_handle(self, cxt):
+        return 0
+
+    # SDO
+
+    def get_owned_organizations(self):
+        return []
+
+    def get_organizations(self):
+        return []
+
+    def get_sdo_id(self):
+        return self._name
+
+    def get_sdo_type(self):
+        return 'MockComponent'
+
+    def get_configuration(self):
+        return self._sys.ref(self._conf)
+
+    def get_service_profiles(self):
+        return []
+
+    def get_status_list(self):
+        return []
+
+    # RTObject
+
+    def get_component_profile(self):
+        return self._profile()
+
+    def _profile(self):
+        props = to_nvlist({'naming.type': 'corba',
+                           'exec_cxt.periodic.rate': '1000.0'})
+        return RTC.ComponentProfile(self._name, 'Mock',
+                'Mock component for benchmarking', '1.0', 'rtctree',
+                'Benchmark', [p._profile() for p in self._ports],
+                None, props)
+
+    def get_ports(self):
+        return [self._sys.ref(p) for p in self._ports]
+
+
+class MockManager(FaultInjecting, RTM__POA.Manager):
+    '''A manager that creates mock components from a single factory.'''
+    def __init__(self, system, name='manager', master=True, ports=2,
+            params=4):
+        self._sys = system
+        self._faults = system.faults
+        self._name = name
+        self._master = master
+        self._comp_ports = ports
+        self._comp_params = params
+        self._comps = []
+        self._masters = []
+        self._slaves = []
+        self._config = {'manager.instance_name': name,
+                        'manager.is_master': 'YES' if master else 'NO'}
+        self._next_id = 0
+        self._mutex = threading.Lock()
+
+    def load_module(self, pathname, initfunc):
+        return RTC.RTC_OK
+
+    def unload_module(self, pathname):
+        return RTC.RTC_OK
+
+    def get_loadable_modules(self):
+        return []
+
+    def get_loaded_modules(self):
+        return []
+
+    def get_factory_profiles(self):
+        return [RTM.ModuleProfile(to_nvlist({'implementation_id': 'Mock',
+            'type_name': 'Mock'}))]
+
+    def create_component(self, module_name):
+        # The module name may carry parameters after a '?', including the
+        # instance name.
+        name = None
+        if '?' in module_name:
+            module_name, query = module_name.split('?', 1)
+            for item in query.split('&'):
+                key, sep, value = item.partition('=')
+                if key == 'instance_name' and value:
+                    name = value
+        if module_name != 'Mock':
+            return None
+        with self._mutex:
+            if name is None:
+                name = 'Mock{0}'.format(self._next_id)
+                self._next_id += 1
+            if [c for c in self._comps if c._name == name]:
+                return None
+            comp = MockComponent(self._sys, name, self._comp_ports,
+                    self._comp_params)
+            self._comps.append(comp)
+        comp._activate()
+        return self._sys.ref(comp)
+
+    def delete_component(self, instance_name):
+        with self._mutex:
+            comps = [c for c in self._comps if c._name == instance_name]
+            if not comps:
+                return RTC.BAD_PARAMETER
+            self._comps.remove(comps[0])
+        comps[0]._alive = False
+        self._sys.deactivate(comps[0])
+        return RTC.RTC_OK
+
+    def get_components(self):
+        with self._mutex:
+            return [self._sys.ref(c) for c in self._comps]
+
+    def get_component_profiles(self):
+        with self._mutex:
+            comps = list(self._comps)
+        return [c._profile() for c in comps]
+
+    def get_profile(self):
+        return RTM.ManagerProfile(to_nvlist({'name': self._name,
+            'instance_name': self._name}))
+
+    def get_configuration(self):
+        with self._mutex:
+            return to_nvlist(self._config)
+
+    def set_configuration(self, name, value):
+        with self._mutex:
+            self._config[name] = value
+        return RTC.RTC_OK
+
+    def is_master(self):
+        return self._master
+
+    def get_master_managers(self):
+        with self._mutex:
+            return list(self._masters)
+
+    def add_master_manager(self, mgr):
+        with self._mutex:
+            self._masters.append(mgr)
+        return RTC.RTC_OK
+
+    def remove_master_manager(self, mgr):
+        return self._remove_manager(self._masters, mgr)
+
+    def get_slave_managers(self):
+        with self._mutex:
+            return list(self._slaves)
+
+    def add_slave_manager(self, mgr):
+        with self._mutex:
+            self._slaves.append(mgr)
+        return RTC.RTC_OK
+
+    def remove_slave_manager(self, mgr):
+        return self._remove_manager(self._slaves, mgr)
+
+    def fork(self):
+        return RTC.UNSUPPORTED
+
+    def shutdown(self):
+        return RTC.UNSUPPORTED
+
+    def restart(self):
+        return RTC.UNSUPPORTED
+
+    def get_service(self, name):
+        return None
+
+    def _remove_manager(self, mgrs, mgr):
+        with self._mutex:
+            for m in mgrs:
+                if m._is_equivalent(mgr):
+                    mgrs.remove(m)
+                    return RTC.RTC_OK
+        return RTC.BAD_PARAMETER
+
+
+##############################################################################
+## Mock system
+
+class MockSystem(object):
+    '''A set of mock components bound on a name server.
+
+    The components are bound in a hierarchy of naming contexts @ref depth
+    levels deep, spread evenly over the deepest contexts. Connections are
+    made from the output ports of each component to the input ports of the
+    following components, in order, until @ref connections have been made.
+
+    '''
+    def __init__(self, orb, components=10, ports=2, connections=10, depth=0,
+            params=4, width=2, managers=0, faults=None):
+        '''Constructor.
+
+        @param orb The ORB to serve the components with.
+        @param components The number of components.
+        @param ports The number of ports on each component, alternating
+                     output and input.
+        @param connections The number of connections to make.
+        @param depth The depth of naming contexts to bind the components in.
+        @param params The number of parameters in each component's default
+                      configuration set.
+        @param width The number of subcontexts in each context.
+        @param managers The number of managers to bind in the root context.
+                        Their components are not bound.
+        @param faults A bench.faults.Faults object to apply to all calls on
+                      the servants, or None.
+
+        '''
+        self.faults = faults
+        self._orb = orb
+        self._poa = orb.resolve_initial_references('RootPOA')
+        self._poa._get_the_POAManager().activate()
+        self.depth = depth
+        self.width = width
+        self.components = [MockComponent(self, 'Mock{0}'.format(ii), ports,
+            params) for ii in range(components)]
+        for c in self.components:
+            c._activate()
+        self.managers = [MockManager(self, 'manager{0}'.format(ii),
+            ports=ports, params=params) for ii in range(managers)]
+        for m in self.managers:
+            self.activate(m)
+        self.connections = self._connect(connections)
+
+    def activate(self, servant):
+        '''Activate a servant in the POA.'''
+        self._poa.activate_object(servant)
+
+    def deactivate(self, servant):
+        '''Deactivate a servant.'''
+        self._poa.deactivate_object(self._poa.servant_to_id(servant))
+
+    def bind(self, root_context):
+        '''Bind the components on a naming service.
+
+        @param root_context The root naming context of the naming service.
+        @return The list of the paths the components were bound at, relative
+                to the root context.
+
+        '''
+        contexts = [([], root_context)]
+        for level in range(self.depth):
+            next_contexts = []
+            for path, cxt in contexts:
+                for ii in range(self.width):
+                    name = [CosNaming.NameComponent('level{0}_{1}'.format(
+                        level, ii), 'dir')]
+                    try:
+                        sub = cxt.bind_new_context(name)
+                    except CosNaming.NamingContext.AlreadyBound:
+                        sub = cxt.resolve(name)._narrow(
+                                CosNaming.NamingContext)
+                    next_contexts.append((path + ['level{0}_{1}.dir'.format(
+                        level, ii)], sub))
+            contexts = next_contexts
+        paths = []
+        for ii, c in enumerate(self.components):
+            path, cxt = contexts[ii % len(contexts)]
+            cxt.rebind([CosNaming.NameComponent(c._name, 'rtc')], self.ref(c))
+            paths.append(path + [c._name + '.rtc'])
+        for m in self.managers:
+            root_context.rebind([CosNaming.NameComponent(m._name, 'mgr')],
+                    self.ref(m))
+            paths.append([m._name + '.mgr'])
+        return paths
+
+    def ref(self, servant):
+        '''Get the object reference of a servant.'''
+        return self._poa.servant_to_reference(servant)
+
+    def servant(self, ref):
+        '''Get the servant of an object reference.'''
+        return self._poa.reference_to_servant(ref)
+
+    def _connect(self, count):
+        # Connect output ports to the input ports of the following
+        # components.
+        made = 0
+        n = len(self.components)
+        for offset in range(1, n):
+            for ii, c in enumerate(self.components):
+                if made >= count:
+                    return made
+                dest = self.components[(ii + offset) % n]
+                for op, ip in zip(c.outports, dest.inports):
+                    if made >= count:
+                        return made
+                    prof = RTC.ConnectorProfile('conn{0}'.format(made),
+                            'conn{0}'.format(made),
+                            [self.ref(op), self.ref(ip)],
+                            to_nvlist({'dataport.dataflow_type': 'push'}))
+                    op._add(prof)
+                    ip._add(prof)
+                    made += 1
+        return made
+
+
+def resolve_root_context(orb, address):
+    '''Get the root naming context of a naming service.'''
+    obj = orb.string_to_object('corbaloc::{0}/NameService'.format(address))
+    return obj._narrow(CosNaming.NamingContext)
+
+
+##############################################################################
+## Main
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--naming', dest='naming', default='localhost:2809',
+            help='Address of the naming service. [Default: %default]')
+    parser.add_option('--memory-naming', dest='memory_naming', type='int',
+            default=None, help='Serve an in-memory naming service on this '
+            'port instead of using --naming.')
+    parser.add_option('--components', dest='components', type='int',
+            default=10, help='Number of components. [Default: %default]')
+    parser.add_option('--ports', dest='ports', type='int', default=2,
+            help='Ports per component. [Default: %default]')
+    parser.add_option('--connections', dest='connections', type='int',
+            default=10, help='Number of connections. [Default: %default]')
+    parser.add_option('--depth', dest='depth', type='int', default=0,
+            help='Depth of naming contexts. [Default: %default]')
+    parser.add_option('--params', dest='params', type='int', default=4,
+            help='Configuration parameters per component. '
+            '[Default: %default]')
+    parser.add_option('--managers', dest='managers', type='int', default=0,
+            help='Number of managers. [Default: %default]')
+    parser.add_option('--latency', dest='latency', type='float',
+            default=0.0, help='Latency of every call, in seconds. '
+            '[Default: %default]')
+    parser.add_option('--jitter', dest='jitter', type='float', default=0.0,
+            help='Maximum random latency added to every call, in seconds. '
+            '[Default: %default]')
+    parser.add_option('--transient', dest='transient', type='float',
+            default=0.0, help='Probability of a call failing with '
+            'TRANSIENT. [Default: %default]')
+    parser.add_option('--not-exist', dest='not_exist', type='float',
+            default=0.0, help='Probability of a call failing with '
+            'OBJECT_NOT_EXIST. [Default: %default]')
+    parser.add_option('--seed', dest='seed', type='int', default=0,
+            help='Seed for random latency and failures. [Default: %default]')
+    options, args = parser.parse_args(argv[1:])
+
+    f = None
+    if options.latency or options.jitter or options.transient or \
+            options.not_exist:
+        f = faults.Faults(options.latency, options.jitter, options.seed)
+        if options.transient:
+            f.add_failure(faults.TRANSIENT, options.transient)
+        if options.not_exist:
+            f.add_failure(faults.OBJECT_NOT_EXIST, options.not_exist)
+    if options.memory_naming:
+        orb = CORBA.ORB_init([argv[0], '-ORBendPoint',
+            'giop:tcp:127.0.0.1:{0}'.format(options.memory_naming)])
+        # Calls on the naming service are slowed and failed as well as those
+        # on the mock system.
+        root_context = MemoryNamingService(orb, faults=f).root_context
+    else:
+        orb = CORBA.ORB_init([argv[0]])
+        root_context = resolve_root_context(orb, options.naming)
+    system = MockSystem(orb, options.components, options.ports,
+            options.connections, options.depth, options.params,
+            managers=options.managers, faults=f)
+    system.bind(root_context)
+    print('READY')
+    sys.stdout.flush()
+    orb.run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
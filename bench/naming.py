@@ -0,0 +1,235 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+In-memory CosNaming service.
+
+A naming context tree held in the memory of the serving process, so
+benchmarks do not need an omniNames process. Latency and failures can be
+injected into it with a bench.faults.Faults object, the same as the mock
+components.
+
+'''
+
+
+import threading
+
+import CosNaming
+import CosNaming__POA
+from omniORB import CORBA
+
+from bench.faults import FaultInjecting
+
+
+def _key(name_component):
+    return (name_component.id, name_component.kind)
+
+
+##############################################################################
+## Servants
+
+class MemoryBindingIterator(FaultInjecting, CosNaming__POA.BindingIterator):
+    '''Iterator over the bindings of a context that did not fit in a list.'''
+    def __init__(self, naming, bindings):
+        self._naming = naming
+        self._faults = naming.faults
+        self._bindings = list(bindings)
+        self._mutex = threading.Lock()
+
+    def next_one(self):
+        with self._mutex:
+            if not self._bindings:
+                return False, CosNaming.Binding([], CosNaming.nobject)
+            return True, self._bindings.pop(0)
+
+    def next_n(self, how_many):
+        if how_many == 0:
+            raise CORBA.BAD_PARAM(0, CORBA.COMPLETED_NO)
+        with self._mutex:
+            result = self._bindings[:how_many]
+            self._bindings = self._bindings[how_many:]
+        return bool(result), result
+
+    def destroy(self):
+        self._naming.deactivate(self)
+
+
+class MemoryNamingContext(FaultInjecting, CosNaming__POA.NamingContext):
+    '''A naming context storing its bindings in a dictionary.'''
+    def __init__(self, naming):
+        self._naming = naming
+        self._faults = naming.faults
+        # (id, kind) -> (object, binding type)
+        self._bindings = {}
+        self._mutex = threading.Lock()
+
+    def bind(self, n, obj):
+        self._bind(n, obj, CosNaming.nobject, False)
+
+    def rebind(self, n, obj):
+        self._bind(n, obj, CosNaming.nobject, True)
+
+    def bind_context(self, n, nc):
+        self._bind(n, nc, CosNaming.ncontext, False)
+
+    def rebind_context(self, n, nc):
+        self._bind(n, nc, CosNaming.ncontext, True)
+
+    def resolve(self, n):
+        cxt, last = self._traverse(n)
+        return cxt._get(n, last)[0]
+
+    def unbind(self, n):
+        cxt, last = self._traverse(n)
+        with cxt._mutex:
+            if _key(last) not in cxt._bindings:
+                raise CosNaming.NamingContext.NotFound(
+                        CosNaming.NamingContext.missing_node, [last])
+            del cxt._bindings[_key(last)]
+
+    def new_context(self):
+        return self._naming.new_context()
+
+    def bind_new_context(self, n):
+        nc = self._naming.new_context()
+        try:
+            self.bind_context(n, nc)
+        except Exception:
+            self._naming.deactivate(self._naming.servant(nc))
+            raise
+        return nc
+
+    def destroy(self):
+        with self._mutex:
+            if self._bindings:
+                raise CosNaming.NamingContext.NotEmpty()
+        self._naming.deactivate(self)
+
+    def list(self, how_many):
+        with self._mutex:
+            bindings = [CosNaming.Binding([CosNaming.NameComponent(id, kind)],
+                btype) for (id, kind), (obj, btype) in
+                sorted(self._bindings.items())]
+        if len(bindings) <= how_many:
+            return bindings, None
+        it = MemoryBindingIterator(self._naming, bindings[how_many:])
+        self._naming.activate(it)
+        return bindings[:how_many], self._naming.ref(it)
+
+    def _bind(self, n, obj, btype, replace):
+        cxt, last = self._traverse(n)
+        with cxt._mutex:
+            if not replace and _key(last) in cxt._bindings:
+                raise CosNaming.NamingContext.AlreadyBound()
+            cxt._bindings[_key(last)] = (obj, btype)
+
+    def _get(self, n, nc):
+        # Get the binding of a single name component in this context.
+        with self._mutex:
+            if _key(nc) not in self._bindings:
+                raise CosNaming.NamingContext.NotFound(
+                        CosNaming.NamingContext.missing_node,
+                        n[n.index(nc):])
+            return self._bindings[_key(nc)]
+
+    def _traverse(self, n):
+        # Find the context holding the last component of a compound name.
+        # Only contexts served by this naming service can be traversed.
+        if not n:
+            raise CosNaming.NamingContext.InvalidName()
+        cxt = self
+        for nc in n[:-1]:
+            obj, btype = cxt._get(n, nc)
+            if btype != CosNaming.ncontext:
+                raise CosNaming.NamingContext.NotFound(
+                        CosNaming.NamingContext.not_context, n[n.index(nc):])
+            sub = self._naming.servant(obj)
+            if sub is None:
+                raise CosNaming.NamingContext.CannotProceed(
+                        self._naming.ref(cxt), n[n.index(nc):])
+            cxt = sub
+        return cxt, n[-1]
+
+
+##############################################################################
+## Naming service
+
+class MemoryNamingService(object):
+    '''An in-memory naming service served by an ORB.
+
+    The root context is available at corbaloc::127.0.0.1:<port>/NameService
+    when the ORB was initialised with a matching end point, e.g.:
+
+        orb = CORBA.ORB_init([sys.argv[0], '-ORBendPoint',
+                              'giop:tcp:127.0.0.1:2809'])
+
+    '''
+    def __init__(self, orb, faults=None):
+        '''Constructor.
+
+        @param orb The ORB to serve the naming contexts with.
+        @param faults A bench.faults.Faults object to apply to all calls on
+                      the contexts, or None.
+
+        '''
+        self.faults = faults
+        self._poa = orb.resolve_initial_references('RootPOA')
+        self._poa._get_the_POAManager().activate()
+        self._root = MemoryNamingContext(self)
+        # The root context is served by the INS POA so it can be found with
+        # a corbaloc URL.
+        ins_poa = orb.resolve_initial_references('omniINSPOA')
+        ins_poa.activate_object_with_id(b'NameService', self._root)
+        ins_poa._get_the_POAManager().activate()
+        self._root_ref = ins_poa.servant_to_reference(self._root)
+
+    @property
+    def root_context(self):
+        '''The object reference of the root naming context.'''
+        return self._root_ref._narrow(CosNaming.NamingContext)
+
+    def activate(self, servant):
+        '''Activate a servant in the POA.'''
+        self._poa.activate_object(servant)
+
+    def deactivate(self, servant):
+        '''Deactivate a servant.'''
+        if servant is self._root:
+            return
+        self._poa.deactivate_object(self._poa.servant_to_id(servant))
+
+    def new_context(self):
+        '''Create and activate a new, unbound, naming context.'''
+        cxt = MemoryNamingContext(self)
+        self.activate(cxt)
+        return self.ref(cxt)
+
+    def ref(self, servant):
+        '''Get the object reference of a servant.'''
+        if servant is self._root:
+            return self._root_ref
+        return self._poa.servant_to_reference(servant)
+
+    def servant(self, ref):
+        '''Get the servant of a context reference, or None if the context
+        is not served by this naming service.'''
+        if ref._is_equivalent(self._root_ref):
+            return self._root
+        try:
+            return self._poa.reference_to_servant(ref)
+        except Exception:
+            return None
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
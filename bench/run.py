@@ -0,0 +1,299 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Discovery and control benchmarks.
+
+Starts a naming service and a mock system of components, then measures
+how long rtctree takes to build a tree of them, refresh their states, list
+their connections and control them. The results are written as JSON.
+
+By default the naming service is held in memory by the mock system's process,
+so nothing needs to be installed but omniORBpy. Use "--naming omniNames" to
+benchmark against a real omniNames instead.
+
+'''
+
+
+from __future__ import print_function
+
+import json
+import optparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from omniORB import CORBA
+
+import rtctree
+from rtctree import utils
+from rtctree.options import Options, orb_tuning_args
+from rtctree.tree import RTCTree
+
+from bench import mock_rtc
+
+
+##############################################################################
+## Local services
+
+def free_port():
+    '''Find a free TCP port on the local host.'''
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def wait_for_port(port, timeout=10.0):
+    '''Wait for something to listen on a local TCP port.'''
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.5).close()
+            return
+        except socket.error:
+            time.sleep(0.05)
+    raise RuntimeError('Nothing listening on port {0}'.format(port))
+
+
+class NamingService(object):
+    '''An omniNames process with its own log directory.'''
+    def __init__(self, port=None):
+        self.port = port or free_port()
+        self._logdir = tempfile.mkdtemp(prefix='rtctree_bench')
+        self._proc = subprocess.Popen(['omniNames', '-start', str(self.port),
+            '-logdir', self._logdir], stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL)
+        wait_for_port(self.port)
+
+    @property
+    def address(self):
+        return 'localhost:{0}'.format(self.port)
+
+    def stop(self):
+        self._proc.terminate()
+        self._proc.wait()
+        shutil.rmtree(self._logdir, ignore_errors=True)
+
+
+class MockSystemProcess(object):
+    '''A mock system served from a separate process.
+
+    If @ref naming is None, the process serves its own in-memory naming
+    service on a free port.
+
+    '''
+    def __init__(self, naming, options):
+        args = [sys.executable, '-m', 'bench.mock_rtc',
+                '--components', str(options.components),
+                '--ports', str(options.ports),
+                '--connections', str(options.connections),
+                '--depth', str(options.depth),
+                '--latency', str(options.latency),
+                '--jitter', str(options.jitter),
+                '--transient', str(options.transient),
+                '--not-exist', str(options.not_exist),
+                '--seed', str(options.seed)]
+        if naming:
+            self.address = naming
+            args += ['--naming', naming]
+        else:
+            port = free_port()
+            self.address = 'localhost:{0}'.format(port)
+            args += ['--memory-naming', str(port)]
+        self._proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+        line = self._proc.stdout.readline().decode().strip()
+        if line != 'READY':
+            self.stop()
+            raise RuntimeError('Mock system failed to start')
+
+    def stop(self):
+        self._proc.terminate()
+        self._proc.wait()
+
+
+##############################################################################
+## Benchmarks
+
+def timed(func, repeats):
+    '''Call a function several times and summarise how long it took.
+
+    @return A dictionary of the minimum, maximum, mean and median times in
+            seconds, and the list of all times.
+
+    '''
+    times = []
+    for ii in range(repeats):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    s = sorted(times)
+    return {'min': s[0], 'max': s[-1], 'mean': sum(s) / len(s),
+            'median': s[len(s) // 2], 'times': times}
+
+
+def all_components(tree):
+    return tree.iterate(lambda n, args: n, filter=['is_component'])
+
+
+def bench_tree_construction(orb, address, repeats):
+    def build():
+        RTCTree(servers=[address], orb=orb)
+    return timed(build, repeats)
+
+
+def bench_state_refresh(tree, repeats):
+    comps = all_components(tree)
+    def refresh():
+        for c in comps:
+            c.reparse_ecs()
+            c.state
+    return timed(refresh, repeats)
+
+
+def bench_connection_listing(tree, repeats):
+    comps = all_components(tree)
+    def per_port():
+        for c in comps:
+            for p in c.ports:
+                p.reparse_connections()
+                p.connections
+    def graph():
+        tree.dataflow_graph().close()
+    return {'per_port': timed(per_port, repeats),
+            'graph': timed(graph, repeats)}
+
+
+def bench_bulk_control(tree, repeats):
+    comps = all_components(tree)
+    def sequential():
+        for c in comps:
+            c.activate_in_ec(0)
+        for c in comps:
+            c.deactivate_in_ec(0)
+    def concurrent():
+        utils.call_concurrently(lambda c: c.activate_in_ec(0), comps)
+        utils.call_concurrently(lambda c: c.deactivate_in_ec(0), comps)
+    return {'sequential': timed(sequential, repeats),
+            'concurrent': timed(concurrent, repeats)}
+
+
+def run(options):
+    orb_args = [sys.argv[0]] + orb_tuning_args(options.orb_tuning)
+    orb = CORBA.ORB_init(orb_args)
+    if options.max_workers:
+        Options().set_option('max_workers', options.max_workers)
+    naming = None
+    system = None
+    try:
+        if options.naming == 'omniNames':
+            naming = NamingService(options.naming_port)
+            system = MockSystemProcess(naming.address, options)
+        else:
+            system = MockSystemProcess(None, options)
+        address = system.address
+        results = {}
+        results['tree_construction'] = bench_tree_construction(orb,
+                address, options.repeats)
+        tree = RTCTree(servers=[address], orb=orb)
+        results['state_refresh'] = bench_state_refresh(tree, options.repeats)
+        results['connection_listing'] = bench_connection_listing(tree,
+                options.repeats)
+        results['bulk_control'] = bench_bulk_control(tree, options.repeats)
+    finally:
+        if system:
+            system.stop()
+        if naming:
+            naming.stop()
+    return {'rtctree_version': rtctree.RTCTREE_VERSION,
+            'timestamp': time.time(),
+            'config': {'components': options.components,
+                       'ports': options.ports,
+                       'connections': options.connections,
+                       'depth': options.depth,
+                       'naming': options.naming,
+                       'latency': options.latency,
+                       'jitter': options.jitter,
+                       'transient': options.transient,
+                       'not_exist': options.not_exist,
+                       'seed': options.seed,
+                       'repeats': options.repeats,
+                       'orb_tuning': options.orb_tuning,
+                       'max_workers': Options().get_option('max_workers')},
+            'results': results}
+
+
+##############################################################################
+## Main
+
+def main(argv):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--components', dest='components', type='int',
+            default=100, help='Number of components. [Default: %default]')
+    parser.add_option('--ports', dest='ports', type='int', default=4,
+            help='Ports per component. [Default: %default]')
+    parser.add_option('--connections', dest='connections', type='int',
+            default=100, help='Number of connections. [Default: %default]')
+    parser.add_option('--depth', dest='depth', type='int', default=2,
+            help='Depth of naming contexts. [Default: %default]')
+    parser.add_option('--repeats', dest='repeats', type='int', default=5,
+            help='Times to repeat each benchmark. [Default: %default]')
+    parser.add_option('--orb-tuning', dest='orb_tuning', default=None,
+            help='ORB tuning preset to use. [Default: none]')
+    parser.add_option('--max-workers', dest='max_workers', type='int',
+            default=None, help='Threads to use for concurrent operations.')
+    parser.add_option('--naming', dest='naming', type='choice',
+            choices=['memory', 'omniNames'], default='memory',
+            help='Naming service to use, memory or omniNames. '
+            '[Default: %default]')
+    parser.add_option('--naming-port', dest='naming_port', type='int',
+            default=None, help='Port for omniNames. [Default: a free port]')
+    parser.add_option('--latency', dest='latency', type='float',
+            default=0.0, help='Latency added to every call on the mock '
+            'system, in seconds. [Default: %default]')
+    parser.add_option('--jitter', dest='jitter', type='float', default=0.0,
+            help='Maximum random latency added to every call, in seconds. '
+            '[Default: %default]')
+    parser.add_option('--transient', dest='transient', type='float',
+            default=0.0, help='Probability of a call failing with '
+            'TRANSIENT. [Default: %default]')
+    parser.add_option('--not-exist', dest='not_exist', type='float',
+            default=0.0, help='Probability of a call failing with '
+            'OBJECT_NOT_EXIST. [Default: %default]')
+    parser.add_option('--seed', dest='seed', type='int', default=0,
+            help='Seed for random latency and failures. [Default: %default]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+            help='File to write the results to. [Default: stdout]')
+    options, args = parser.parse_args(argv[1:])
+
+    results = run(options)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
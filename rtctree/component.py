@@ -21,11 +21,13 @@ import time
 import uuid
 
 from rtctree import exceptions
+from rtctree import instrument
 from rtctree import ports
-from rtctree import sdo
+from rtctree import tracing
 from rtctree import utils
 from rtctree.config_set import ConfigurationSet
 from rtctree.exec_context import ExecutionContext
+from rtctree.name_cache import InstanceNameCache
 from rtctree.node import TreeNode
 from rtctree.rtc import RTC
 from rtctree.rtc import SDOPackage
@@ -232,15 +234,18 @@ class Component(TreeNode):
     >>> p[1].wait()
     -15
     '''
-    def __init__(self, name=None, parent=None, obj=None, *args, **kwargs):
+    def __init__(self, name=None, parent=None, obj=None, profile=None,
+            *args, **kwargs):
         '''Constructor.
 
         @param name Name of this component (i.e. its entry in the path).
         @param parent The parent node of this node, if any.
         @param obj The CORBA LightweightRTObject object to wrap.
+        @param profile The component's profile, if it has already been
+                       retrieved. If None, it is retrieved from the component.
 
         '''
-        self._obj = obj
+        self._obj = instrument.wrap(obj, self._call_stats)
         self._obs = None
         self._obs_id = None
         self._loggers = {}
@@ -250,7 +255,7 @@ class Component(TreeNode):
         self._set_events(['rtc_status', 'component_profile', 'ec_event',
             'port_event', 'config_event', 'heartbeat', 'fsm_event'])
         self._reset_data()
-        self._parse_profile()
+        self._parse_profile(profile)
 
     def reparse(self):
         '''Reparse the component's information.
@@ -526,8 +531,10 @@ class Component(TreeNode):
         @return The result of attempting to exit.
 
         '''
-        with self._mutex:
-            return self._obj.exit()
+        with tracing.span('Component.exit', node=self, obj=self._obj,
+                operation='exit'):
+            with self._mutex:
+                return self._obj.exit()
 
     def activate_in_ec(self, ec_index):
         '''Activate this component in an execution context.
@@ -541,15 +548,17 @@ class Component(TreeNode):
                         @ref participating_ecs.
 
         '''
-        with self._mutex:
-            if ec_index >= len(self.owned_ecs):
-                ec_index -= len(self.owned_ecs)
-                if ec_index >= len(self.participating_ecs):
-                    raise exceptions.BadECIndexError(ec_index)
-                ec = self.participating_ecs[ec_index]
-            else:
-                ec = self.owned_ecs[ec_index]
-            ec.activate_component(self._obj)
+        with tracing.span('Component.activate_in_ec', node=self,
+                obj=self._obj, operation='activate_in_ec', ec_index=ec_index):
+            with self._mutex:
+                if ec_index >= len(self.owned_ecs):
+                    ec_index -= len(self.owned_ecs)
+                    if ec_index >= len(self.participating_ecs):
+                        raise exceptions.BadECIndexError(ec_index)
+                    ec = self.participating_ecs[ec_index]
+                else:
+                    ec = self.owned_ecs[ec_index]
+                ec.activate_component(self._obj)
 
     def deactivate_in_ec(self, ec_index):
         '''Deactivate this component in an execution context.
@@ -563,15 +572,18 @@ class Component(TreeNode):
                         @ref participating_ecs.
 
         '''
-        with self._mutex:
-            if ec_index >= len(self.owned_ecs):
-                ec_index -= len(self.owned_ecs)
-                if ec_index >= len(self.participating_ecs):
-                    raise exceptions.BadECIndexError(ec_index)
-                ec = self.participating_ecs[ec_index]
-            else:
-                ec = self.owned_ecs[ec_index]
-            ec.deactivate_component(self._obj)
+        with tracing.span('Component.deactivate_in_ec', node=self,
+                obj=self._obj, operation='deactivate_in_ec',
+                ec_index=ec_index):
+            with self._mutex:
+                if ec_index >= len(self.owned_ecs):
+                    ec_index -= len(self.owned_ecs)
+                    if ec_index >= len(self.participating_ecs):
+                        raise exceptions.BadECIndexError(ec_index)
+                    ec = self.participating_ecs[ec_index]
+                else:
+                    ec = self.owned_ecs[ec_index]
+                ec.deactivate_component(self._obj)
 
     def get_ec(self, ec_handle):
         '''Get a reference to the execution context with the given handle.
@@ -686,15 +698,17 @@ class Component(TreeNode):
                         used as an index into @ref participating_ecs.
 
         '''
-        with self._mutex:
-            if ec_index >= len(self.owned_ecs):
-                ec_index -= len(self.owned_ecs)
-                if ec_index >= len(self.participating_ecs):
-                    raise exceptions.BadECIndexError(ec_index)
-                ec = self.participating_ecs[ec_index]
-            else:
-                ec = self.owned_ecs[ec_index]
-            ec.reset_component(self._obj)
+        with tracing.span('Component.reset_in_ec', node=self,
+                obj=self._obj, operation='reset_in_ec', ec_index=ec_index):
+            with self._mutex:
+                if ec_index >= len(self.owned_ecs):
+                    ec_index -= len(self.owned_ecs)
+                    if ec_index >= len(self.participating_ecs):
+                        raise exceptions.BadECIndexError(ec_index)
+                    ec = self.participating_ecs[ec_index]
+                else:
+                    ec = self.owned_ecs[ec_index]
+                ec.reset_component(self._obj)
 
     def state_in_ec(self, ec_index):
         '''Get the state of the component in an execution context.
@@ -775,7 +789,8 @@ class Component(TreeNode):
         with self._mutex:
             if not self._owned_ecs:
                 self._owned_ecs = [ExecutionContext(ec,
-                    self._obj.get_context_handle(ec)) \
+                    self._obj.get_context_handle(ec), dynamic=self.dynamic,
+                    call_stats=self._call_stats) \
                     for ec in self._obj.get_owned_contexts()]
         return self._owned_ecs
 
@@ -804,7 +819,9 @@ class Component(TreeNode):
         with self._mutex:
             if not self._participating_ecs:
                 self._participating_ecs = [ExecutionContext(ec,
-                                    self._obj.get_context_handle(ec)) \
+                                    self._obj.get_context_handle(ec),
+                                    dynamic=self.dynamic,
+                                    call_stats=self._call_stats) \
                              for ec in self._obj.get_participating_contexts()]
         return self._participating_ecs
 
@@ -923,7 +940,7 @@ class Component(TreeNode):
 
         '''
         return [p for p in self.ports \
-                if p.__class__.__name__ == 'DataInPort' and p.is_connected]
+                if p.porttype == 'DataInPort' and p.is_connected]
 
     @property
     def connected_outports(self):
@@ -932,7 +949,7 @@ class Component(TreeNode):
 
         '''
         return [p for p in self.ports \
-                    if p.__class__.__name__ == 'DataOutPort' \
+                    if p.porttype == 'DataOutPort' \
                     and p.is_connected]
 
     @property
@@ -950,17 +967,17 @@ class Component(TreeNode):
 
         '''
         return [p for p in self.ports \
-                if p.__class__.__name__ == 'CorbaPort' and p.is_connected]
+                if p.porttype == 'CorbaPort' and p.is_connected]
 
     @property
     def inports(self):
         '''The list of all input ports belonging to this component.'''
-        return [p for p in self.ports if p.__class__.__name__ == 'DataInPort']
+        return [p for p in self.ports if p.porttype == 'DataInPort']
 
     @property
     def outports(self):
         '''The list of all output ports belonging to this component.'''
-        return [p for p in self.ports if p.__class__.__name__ == 'DataOutPort']
+        return [p for p in self.ports if p.porttype == 'DataOutPort']
 
     @property
     def ports(self):
@@ -974,7 +991,7 @@ class Component(TreeNode):
     @property
     def svcports(self):
         '''The list of all service ports belonging to this component.'''
-        return [p for p in self.ports if p.__class__.__name__ == 'CorbaPort']
+        return [p for p in self.ports if p.porttype == 'CorbaPort']
 
     ###########################################################################
     # Node functionality
@@ -1012,7 +1029,10 @@ class Component(TreeNode):
             name of the component the log record came from, time is a
             floating-point time stamp, source is the name of the logger that
             provided the log record, level is the log level of the record and
-            message is a text string.
+            message is a text string. The callback is called in the ORB
+            thread that received the record; pass an
+            rtctree.log_stream.LogPipeline to buffer the records and handle
+            them in another thread instead.
         @param level The maximum level of log records to receive.
         @param filters Filter the objects from which to receive log messages.
         @return An ID for this logger. Use this ID in future operations such as
@@ -1020,8 +1040,10 @@ class Component(TreeNode):
         @raises AddLoggerError
 
         '''
+        # The logger servant and its skeletons are only loaded when needed
+        from rtctree.sdo import RTCLogger
         with self._mutex:
-            obs = sdo.RTCLogger(self, cb)
+            obs = RTCLogger(self, cb)
             uuid_val = uuid.uuid4()
             intf_type = obs._this()._NP_RepositoryId
             props = {'logger.log_level': level,
@@ -1088,6 +1110,57 @@ class Component(TreeNode):
             self._conf.set_configuration_set_values(\
                     self.conf_sets[set_name].object)
 
+    def set_conf_set_values(self, set_name, values, activate=False):
+        '''Set several parameters of a configuration set at once.
+
+        All the parameters are checked before any are changed. The set is then
+        sent to the component in a single update, rather than one update per
+        parameter as with set_conf_set_value(). If the update, or the
+        activation, fails, the old values of the set are restored, both in
+        the cache and, if they had been sent, in the component.
+
+        @param set_name The name of the configuration set the parameters are
+                        in.
+        @param values A dictionary of parameter names and their new values.
+        @param activate If True, activate the configuration set after it has
+                        been updated, so the component uses the new values.
+        @raises NoSuchConfSetError, NoSuchConfParamError,
+                ConfigurationSetUpdateError
+
+        '''
+        with self._mutex:
+            if not set_name in self.conf_sets:
+                raise exceptions.NoSuchConfSetError(set_name)
+            conf_set = self.conf_sets[set_name]
+            for param in values:
+                if not conf_set.has_param(param):
+                    raise exceptions.NoSuchConfParamError(param)
+            old_values = dict([(p, conf_set.data[p]) for p in values])
+            conf_set.set_params(values)
+            try:
+                if not self._conf.set_configuration_set_values(
+                        conf_set.object):
+                    raise exceptions.ConfigurationSetUpdateError(self.name,
+                            set_name)
+            except Exception:
+                conf_set.set_params(old_values)
+                raise
+            if not activate:
+                return
+            try:
+                if not self._conf.activate_configuration_set(set_name):
+                    raise exceptions.ConfigurationSetUpdateError(self.name,
+                            set_name)
+            except Exception:
+                # Put the old values back in the component as well
+                conf_set.set_params(old_values)
+                try:
+                    self._conf.set_configuration_set_values(conf_set.object)
+                except Exception:
+                    # Report the original error
+                    pass
+                raise
+
     @property
     def active_conf_set(self):
         '''The currently-active configuration set.'''
@@ -1152,9 +1225,27 @@ class Component(TreeNode):
         # Call callbacks outside the mutex
         self._call_cb('config_event', (name, event))
 
+    def _discard(self):
+        # Remove the observer and loggers from the remote component, so it
+        # stops calling back into a node that is no longer in the tree.
+        with self._mutex:
+            loggers = list(self._loggers.keys())
+            observed = self._obs_id is not None
+        for cb_id in loggers:
+            try:
+                self.remove_logger(cb_id)
+            except Exception:
+                pass
+        if observed:
+            try:
+                self._enable_dynamic(False)
+            except Exception:
+                pass
+
     def _enable_dynamic(self, enable=True):
         if enable:
-            obs = sdo.RTCObserver(self)
+            from rtctree.sdo import RTCObserver
+            obs = RTCObserver(self)
             uuid_val = str(uuid.uuid4())
             intf_type = obs._this()._NP_RepositoryId
             props = utils.dict_to_nvlist({'heartbeat.enable': 'YES',
@@ -1173,6 +1264,7 @@ class Component(TreeNode):
                 self._dynamic = True
                 self._obs = obs
                 self._obs_id = uuid_val
+                self._set_ecs_dynamic(True)
                 # If we could set an observer, the component is alive
                 self._last_heartbeat = time.time()
             else:
@@ -1184,6 +1276,7 @@ class Component(TreeNode):
                 self._dynamic = False
                 self._obs = None
                 self._obs_id = None
+                self._set_ecs_dynamic(False)
 
     def _ec_event(self, ec_handle, event):
         def get_ec(ec_handle):
@@ -1195,7 +1288,7 @@ class Component(TreeNode):
                         tgt_ec = ec
                         loc = self._owned_ecs
                         break
-            if not del_ec and self._participating_ecs:
+            if not tgt_ec and self._participating_ecs:
                 for ec in self._participating_ecs:
                     if ec.handle == ec_handle:
                         tgt_ec = ec
@@ -1207,7 +1300,8 @@ class Component(TreeNode):
             if event == self.EC_ATTACHED:
                 # New EC has been attached
                 self._participating_ecs.append(ExecutionContext(
-                    self._obj.get_context(ec_handle), ec_handle))
+                    self._obj.get_context(ec_handle), ec_handle,
+                    dynamic=self.dynamic, call_stats=self._call_stats))
             elif event == self.EC_DETACHED:
                 # An EC has been detached; delete the local facade
                 # if ec is not None, the corresponding EC has a local
@@ -1216,8 +1310,9 @@ class Component(TreeNode):
                 if ec:
                     loc.remove(ec)
             elif event == self.EC_RATE_CHANGED:
-                # Nothing to do
-                pass
+                ec, loc = get_ec(ec_handle)
+                if ec:
+                    ec._invalidate('rate')
             elif event == self.EC_STARTUP:
                 ec, loc = get_ec(ec_handle)
                 if ec:
@@ -1227,7 +1322,7 @@ class Component(TreeNode):
                 if ec:
                     ec._set_running(False)
         # Call callbacks outside the mutex
-        self._call_cb('ec_event', (ec_handle, state))
+        self._call_cb('ec_event', (ec_handle, event))
 
     def _get_ec_state(self, ec):
         # Get the state of this component in an EC and return the enum value.
@@ -1266,22 +1361,27 @@ class Component(TreeNode):
             except SDOPackage.NotAvailable:
                 self._active_conf_set = ''
 
-    def _parse_profile(self):
-        # Parse the component's profile
-        with self._mutex:
-            profile = self._obj.get_component_profile()
-            self._instance_name = profile.instance_name
-            self._type_name = profile.type_name
-            self._description = profile.description
-            self._version = profile.version
-            self._vendor = profile.vendor
-            self._category = profile.category
-            if profile.parent:
-                self._parent_obj = \
-                        profile.parent.get_component_profile().instance_name
-            else:
-                self._parent_obj = ''
-            self._properties = utils.nvlist_to_dict(profile.properties)
+    def _parse_profile(self, profile=None):
+        # Parse the component's profile, retrieving it if it is not given
+        with tracing.span('Component.parse_profile', node=self,
+                path=self._path_str, obj=self._obj,
+                operation='get_component_profile'):
+            with self._mutex:
+                if profile is None:
+                    profile = self._obj.get_component_profile()
+                self._instance_name = profile.instance_name
+                InstanceNameCache().add(self._obj, self._instance_name)
+                self._type_name = profile.type_name
+                self._description = profile.description
+                self._version = profile.version
+                self._vendor = profile.vendor
+                self._category = profile.category
+                if profile.parent:
+                    self._parent_obj = \
+                            InstanceNameCache().resolve([profile.parent])[0]
+                else:
+                    self._parent_obj = ''
+                self._properties = utils.nvlist_to_dict(profile.properties)
 
     def _port_event(self, port_name, event):
         def get_port_obj(port_name):
@@ -1358,6 +1458,15 @@ class Component(TreeNode):
             self._parent_orgs = []
             self._members = {}
 
+    def _set_ecs_dynamic(self, dynamic):
+        # Tell the execution contexts whether to rely on observer events.
+        # This may be called during construction, before the lists exist.
+        with self._mutex:
+            for ec in (getattr(self, '_owned_ecs', None) or []) + \
+                    (getattr(self, '_participating_ecs', None) or []):
+                ec._dynamic = dynamic
+                ec._invalidate()
+
     def _set_state_in_ec(self, ec_handle, state):
         # Forcefully set the state of this component in an EC
         with self._mutex:
@@ -50,7 +50,17 @@ class ConfigurationSet(object):
 
     def set_param(self, param, value):
         '''Set a parameter in this configuration set.'''
-        self.data[param] = value
+        self.set_params({param: value})
+
+    def set_params(self, params):
+        '''Set several parameters in this configuration set.
+
+        The configuration set object is encoded once for all the parameters.
+
+        @param params A dictionary of parameter names and their new values.
+
+        '''
+        self.data.update(params)
         self._object.configuration_data = utils.dict_to_nvlist(self.data)
 
     @property
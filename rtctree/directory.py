@@ -18,22 +18,23 @@ Object representing a directory node in the tree.
 '''
 
 
-import copy
 import sys
 
 import CosNaming
 from omniORB import CORBA, TRANSIENT_ConnectFailed
 
 from rtctree import exceptions
+from rtctree import instrument
+from rtctree import tracing
 from rtctree import utils
 from rtctree.component import Component
 from rtctree.manager import Manager
+from rtctree.name_cache import InstanceNameCache
 from rtctree.node import TreeNode
 from rtctree.options import Options
 from rtctree.unknown import Unknown
 from rtctree.zombie import Zombie
 from rtctree.rtc import RTC
-from rtctree.rtc import RTM
 
 
 ##############################################################################
@@ -47,12 +48,95 @@ class Directory(TreeNode):
     directory context may specialise as a name server context, in which case
     it represents the root context of a name server.
 
+    The following callbacks are available on this node type. They are called
+    by relist() when the bindings of the naming context change, and for each
+    of them the callbacks for the same event on the root node of the tree
+    are also called:
+
+    - node_added(node)
+      A child node was added.
+    - node_removed(node)
+      A child node was removed.
+    - node_replaced((old node, new node))
+      A child node was replaced, for example because its name was bound to a
+      different object.
+
     '''
     def __init__(self, name=None, parent=None, children=None, filter=[], *args,
             **kwargs):
         '''Constructor. Calls the TreeNode constructor.'''
         super(Directory, self).__init__(name=name, parent=parent,
                 children=children, filter=filter, *args, **kwargs)
+        self._filter = utils.compile_filter(filter)
+        self._set_events(['node_added', 'node_removed', 'node_replaced'])
+
+    def relist(self, recursive=True):
+        '''Update the children of this directory from its naming context.
+
+        The bindings of the naming context are listed again and compared with
+        the children. Only the bindings that were added or removed, or that
+        now refer to a different object, are parsed; other children are left
+        as they are. The node_added, node_removed and node_replaced callbacks
+        are called for each change, after the children have been updated.
+
+        Zombie children are parsed again each time, so a component that comes
+        back under the same name replaces its zombie.
+
+        @param recursive Also relist the subdirectories of this directory.
+        @return The number of changes found.
+
+        '''
+        events = []
+        with self._mutex:
+            current = {}
+            for binding in self._list_bindings():
+                name = corba_name_to_string(binding.binding_name)
+                if self._filter.child(name) is not None:
+                    current[name] = binding
+            for name in sorted(self._children.keys()):
+                if name not in current:
+                    events.append(('node_removed',
+                        self._remove_binding_child(name)))
+            names = sorted(current.keys())
+            existing = [(current[n], self._children[n]) for n in names \
+                    if n in self._children]
+            added = [n for n in names if n not in self._children]
+            changed = utils.call_concurrently(
+                    lambda x: self._binding_changed(*x), existing)
+            for (binding, old), (is_changed, e) in zip(existing, changed):
+                if not is_changed and not e:
+                    continue
+                self._remove_binding_child(old.name)
+                self._reprocess_binding(binding)
+                new = self._children.get(old.name)
+                if new is None:
+                    events.append(('node_removed', old))
+                elif old.is_zombie and new.is_zombie:
+                    # Still dead
+                    self._add_child(old)
+                else:
+                    events.append(('node_replaced', (old, new)))
+            for name in added:
+                self._reprocess_binding(current[name])
+                if name in self._children:
+                    events.append(('node_added', self._children[name]))
+            new_nodes = [v for e, v in events if e == 'node_added'] + \
+                    [v[1] for e, v in events if e == 'node_replaced']
+            subdirs = [c for c in self._children.values() \
+                    if isinstance(c, Directory) and c not in new_nodes]
+            dropped = [v for e, v in events if e == 'node_removed'] + \
+                    [v[0] for e, v in events if e == 'node_replaced']
+        # Release the dropped nodes' observers and loggers, and call
+        # callbacks, outside the mutex
+        for node in dropped:
+            node._discard()
+        for event, value in events:
+            self._call_tree_cb(event, value)
+        changes = len(events)
+        if recursive:
+            for d in subdirs:
+                changes += d.relist()
+        return changes
 
     def reparse(self):
         '''Reparse all children of this directory.
@@ -65,7 +149,7 @@ class Directory(TreeNode):
 
         '''
         self._remove_all_children()
-        self._parse_context(self._context, self.orb)
+        self._parse_context(self._context, self.orb, self._filter)
 
     def unbind(self, name):
         '''Unbind an object from the context represented by this directory.
@@ -100,96 +184,137 @@ class Directory(TreeNode):
         '''Is this node a directory?'''
         return True
 
+    def _binding_changed(self, binding, node):
+        # Check if a binding no longer refers to the object of a child node.
+        if binding.binding_type != CosNaming.nobject:
+            return not isinstance(node, Directory)
+        if isinstance(node, Directory) or node.is_zombie:
+            return True
+        obj = self._context.resolve(binding.binding_name)
+        return not obj or not obj._is_equivalent(node.object)
+
+    def _list_bindings(self):
+        # Get all the bindings of the naming context, including those that
+        # did not fit in the first list.
+        max_bindings = Options().get_option('max_bindings')
+        bindings, bindings_it = self._context.list(max_bindings)
+        bindings = list(bindings)
+        if bindings_it:
+            bindings_it = instrument.wrap(bindings_it, self._call_stats)
+            remaining, more = bindings_it.next_n(max_bindings)
+            while remaining:
+                bindings += more
+                remaining, more = bindings_it.next_n(max_bindings)
+            bindings_it.destroy()
+        return bindings
+
     def _parse_context(self, context, orb, filter=[]):
+        # The filter is compiled once and its branches are passed down to
+        # subdirectories.
+        filter = utils.compile_filter(filter)
         with self._mutex:
             # Parse a naming context to fill in the children.
-            self._context = context
-            # Get the list of bindings from the context
-            bindings, bindings_it = context.list(Options().\
-                                        get_option('max_bindings'))
-            for binding in bindings:
-                # Process the bindings that are within max_bindings
+            self._context = instrument.wrap(context, self._call_stats)
+            self._filter = filter
+            for binding in self._list_bindings():
                 self._process_binding(binding, orb, filter)
-            if bindings_it:
-                # Handle the iterator containing the remaining bindings
-                remaining, bindings = bindings_it.next_n(Options().\
-                                            get_option('max_bindings'))
-                while remaining:
-                    for binding in bindings:
-                        self._process_binding(binding, orb, filter)
-                    remaining, binding = bindings_it.next_n(Options().\
-                                                get_option('max_bindings'))
-                bindings_it.destroy()
 
     def _process_binding(self, binding, orb, filter):
-        if utils.filtered([corba_name_to_string(binding.binding_name)], filter):
+        binding_name = corba_name_to_string(binding.binding_name)
+        child_filter = filter.child(binding_name)
+        if child_filter is None:
             # Do not pass anything which does not pass the filter
             return
-        trimmed_filter = utils.trim_filter(copy.deepcopy(filter))
-        with self._mutex:
-            # Process a binding, creating the correct child type for it and
-            # adding that child to this node's children.
-            if binding.binding_type == CosNaming.nobject:
-                # This is a leaf node; either a component or a manager.  The
-                # specific type can be determined from the binding name kind.
-                if binding.binding_name[0].kind == 'mgr':
-                    name = corba_name_to_string(binding.binding_name)
-                    obj = self._context.resolve(binding.binding_name)
-                    if not obj:
-                        leaf = Zombie(name, self)
-                        return
-                    obj = obj._narrow(RTM.Manager)
-                    try:
-                        leaf = Manager(name, self, obj, dynamic=self.dynamic)
-                    except CORBA.OBJECT_NOT_EXIST:
-                        # Manager zombie
-                        leaf = Zombie(name, self)
-                    except CORBA.TRANSIENT:
-                        # Manager zombie
-                        leaf = Zombie(name, self)
-                    self._add_child(leaf)
-                elif binding.binding_name[0].kind == 'rtc':
-                    name = corba_name_to_string(binding.binding_name)
-                    obj = self._context.resolve(binding.binding_name)
-                    try:
-                        obj = obj._narrow(RTC.RTObject)
-                    except CORBA.TRANSIENT as e:
-                        if e.args[0] == TRANSIENT_ConnectFailed:
+        with tracing.span('Directory.process_binding', node=self,
+                operation='resolve', binding=binding_name):
+            with self._mutex:
+                # Process a binding, creating the correct child type for it and
+                # adding that child to this node's children.
+                if binding.binding_type == CosNaming.nobject:
+                    # This is a leaf node; either a component or a manager.
+                    # The specific type can be determined from the binding
+                    # name kind.
+                    if binding.binding_name[0].kind == 'mgr':
+                        name = binding_name
+                        obj = self._context.resolve(binding.binding_name)
+                        if not obj:
                             self._add_child(Zombie(name, self))
                             return
-                        else:
-                            raise
-                    except CORBA.OBJECT_NOT_EXIST:
-                        self._add_child(Zombie(name, self))
-                        return
-                    try:
-                        leaf = Component(name, self, obj, dynamic=self.dynamic)
-                    except CORBA.OBJECT_NOT_EXIST:
-                        # Component zombie
-                        leaf = Zombie(name, self, dynamic=self.dynamic)
-                    except CORBA.TRANSIENT as e:
-                        if e.args[0] == TRANSIENT_ConnectFailed:
+                        # The Manager stubs are only loaded when a manager
+                        # is found
+                        from rtctree.rtc import RTM
+                        obj = obj._narrow(RTM.Manager)
+                        try:
+                            leaf = Manager(name, self, obj,
+                                    dynamic=self.dynamic)
+                        except CORBA.OBJECT_NOT_EXIST:
+                            # Manager zombie
+                            leaf = Zombie(name, self)
+                        except CORBA.TRANSIENT:
+                            # Manager zombie
+                            leaf = Zombie(name, self)
+                        self._add_child(leaf)
+                    elif binding.binding_name[0].kind == 'rtc':
+                        name = binding_name
+                        obj = self._context.resolve(binding.binding_name)
+                        try:
+                            obj = obj._narrow(RTC.RTObject)
+                        except CORBA.TRANSIENT as e:
+                            if e.args[0] == TRANSIENT_ConnectFailed:
+                                self._add_child(Zombie(name, self))
+                                return
+                            else:
+                                raise
+                        except CORBA.OBJECT_NOT_EXIST:
                             self._add_child(Zombie(name, self))
                             return
-                        else:
-                            raise
-                    self._add_child(leaf)
+                        try:
+                            leaf = Component(name, self, obj,
+                                    dynamic=self.dynamic)
+                        except CORBA.OBJECT_NOT_EXIST:
+                            # Component zombie
+                            leaf = Zombie(name, self, dynamic=self.dynamic)
+                        except CORBA.TRANSIENT as e:
+                            if e.args[0] == TRANSIENT_ConnectFailed:
+                                self._add_child(Zombie(name, self))
+                                return
+                            else:
+                                raise
+                        self._add_child(leaf)
+                    else:
+                        # Unknown type - add a plain node
+                        name = binding_name
+                        obj = self._context.resolve(binding.binding_name)
+                        leaf = Unknown(name, self, obj)
+                        self._add_child(leaf)
                 else:
-                    # Unknown type - add a plain node
-                    name = corba_name_to_string(binding.binding_name)
-                    obj = self._context.resolve(binding.binding_name)
-                    leaf = Unknown(name, self, obj)
-                    self._add_child(leaf)
-            else:
-                # This is a context, and therefore a subdirectory.
-                subdir_name = corba_name_to_string(binding.binding_name)
-                subdir = Directory(subdir_name, self, filter=trimmed_filter,
-                        dynamic=self.dynamic)
-                subdir_context = self._context.resolve(binding.binding_name)
-                subdir_context = subdir_context._narrow(CosNaming.NamingContext)
-                subdir._parse_context(subdir_context, orb,
-                        filter=trimmed_filter)
-                self._add_child(subdir)
+                    # This is a context, and therefore a subdirectory.
+                    subdir_name = binding_name
+                    subdir = Directory(subdir_name, self,
+                            filter=child_filter, dynamic=self.dynamic)
+                    subdir_context = self._context.resolve(
+                            binding.binding_name)
+                    subdir_context = subdir_context._narrow(
+                            CosNaming.NamingContext)
+                    subdir._parse_context(subdir_context, orb,
+                            filter=child_filter)
+                    self._add_child(subdir)
+
+
+    def _reprocess_binding(self, binding):
+        # Process a binding found when relisting. It may have been unbound
+        # since it was listed.
+        try:
+            self._process_binding(binding, self.orb, self._filter)
+        except CosNaming.NamingContext.NotFound:
+            pass
+
+    def _remove_binding_child(self, name):
+        # Remove a child whose binding has gone or changed.
+        node = self._children.pop(name)
+        if node.is_component:
+            InstanceNameCache().remove(node.object)
+        return node
 
 
 def corba_name_to_string(name):
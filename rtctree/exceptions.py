@@ -19,7 +19,6 @@ General exception classes.
 
 
 import rtctree
-from rtctree.rtc import RTC
 
 
 ##############################################################################
@@ -43,6 +42,9 @@ class ReturnCodeError(RtcTreeError):
         codes defined in the RTC IDL.
 
         '''
+        # Imported here so that importing the exceptions does not load the
+        # IDL stubs
+        from rtctree.rtc import RTC
         if return_code == RTC.RTC_ERROR:
             RtcTreeError.__init__(self, 'General error')
         elif return_code == RTC.BAD_PARAMETER:
@@ -149,6 +151,13 @@ class NoSuchConfParamError(RtcTreeError):
         return 'No such configuration parameter: {0}'.format(self.args[0])
 
 
+class ConfigurationSetUpdateError(RtcTreeError):
+    '''A component refused to update or activate a configuration set.'''
+    def __str__(self):
+        return 'Failed to update configuration set {0} of {1}'.format(
+                self.args[1], self.args[0])
+
+
 class NoSuchOptionError(RtcTreeError):
     '''The requested option has not been set.'''
     def __str__(self):
@@ -300,5 +309,17 @@ class InvalidSdoServiceError(RtcTreeError):
         return 'Invalid SDO service: {0}'.format(self.args[0])
 
 
+class SnapshotError(RtcTreeError):
+    '''The operation needs the remote object, which a snapshot node lacks.'''
+    def __str__(self):
+        return 'Not available in a snapshot: {0}'.format(self.args[0])
+
+
+class BadSnapshotError(RtcTreeError):
+    '''A snapshot could not be read.'''
+    def __str__(self):
+        return 'Bad snapshot: {0}'.format(self.args[0])
+
+
 
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -19,8 +19,12 @@ Object representing an execution context.
 
 
 import threading
+import time
 
+from rtctree import instrument
 from rtctree import utils
+from rtctree.name_cache import InstanceNameCache
+from rtctree.options import Options
 from rtctree.rtc import RTC
 
 
@@ -28,13 +32,26 @@ from rtctree.rtc import RTC
 ## Execution context object
 
 class ExecutionContext(object):
-    '''An execution context, within which components may be executing.'''
-    def __init__(self, ec_obj=None, handle=None, *args, **kwargs):
+    '''An execution context, within which components may be executing.
+
+    The rate, running state and kind of the context are cached after they
+    are first retrieved. The kind never changes. If the context is dynamic,
+    the rate and running state are kept up-to-date by the events received by
+    the component that created it. Otherwise, they are retrieved again once
+    they are older than the 'ec_cache_ttl' option (in seconds).
+
+    '''
+    def __init__(self, ec_obj=None, handle=None, dynamic=False,
+            call_stats=None, *args, **kwargs):
         '''Constructor.
 
         @param ec_obj The CORBA ExecutionContext object to wrap.
         @param handle The handle of this execution context, which can be used
                       to uniquely identify it.
+        @param dynamic Rely on observer events to keep the cached rate and
+                       running state up-to-date instead of expiring them.
+        @param call_stats The rtctree.instrument.CallStats object to record
+                          the remote calls made by this object in, or None.
 
         '''
         super(ExecutionContext, self).__init__(*args, **kwargs)
@@ -44,7 +61,10 @@ class ExecutionContext(object):
             # EC does not implement the ExecutionContextService interface
             self._is_service = False
             self._obj = ec_obj
+        self._obj = instrument.wrap(self._obj, call_stats)
         self._handle = handle
+        self._dynamic = dynamic
+        self._cache = {}
         self._mutex = threading.RLock()
         self._parse()
 
@@ -136,11 +156,13 @@ class ExecutionContext(object):
         '''Start the context.'''
         with self._mutex:
             self._obj.start()
+            self._invalidate('running')
 
     def stop(self):
         '''Stop the context.'''
         with self._mutex:
             self._obj.stop()
+            self._invalidate('running')
 
     @property
     def handle(self):
@@ -152,7 +174,7 @@ class ExecutionContext(object):
     def kind(self):
         '''The kind of this execution context.'''
         with self._mutex:
-            kind = self._obj.get_kind()
+            kind = self._get_cached('kind', self._obj.get_kind, expires=False)
             if kind == RTC.PERIODIC:
                 return self.PERIODIC
             elif kind == RTC.EVENT_DRIVEN:
@@ -176,7 +198,7 @@ class ExecutionContext(object):
         '''The name of the RTObject that owns this context.'''
         with self._mutex:
             if self._owner:
-                return self._owner.get_component_profile().instance_name
+                return InstanceNameCache().resolve([self._owner])[0]
             else:
                 return ''
 
@@ -188,10 +210,15 @@ class ExecutionContext(object):
 
     @property
     def participant_names(self):
-        '''The names of the RTObjects participating in this context.'''
+        '''The names of the RTObjects participating in this context.
+
+        Names are looked up in the process-wide instance name cache.
+        Participants that are not cached are asked for their names in
+        parallel.
+
+        '''
         with self._mutex:
-            return [obj.get_component_profile().instance_name \
-                    for obj in self._participants]
+            return InstanceNameCache().resolve(self._participants)
 
     @property
     def properties(self):
@@ -203,27 +230,55 @@ class ExecutionContext(object):
     def rate(self):
         '''The execution rate of this execution context.'''
         with self._mutex:
-            return self._obj.get_rate()
+            return self._get_cached('rate', self._obj.get_rate)
 
     @rate.setter
     def rate(self, new_rate):
         with self._mutex:
             self._obj.set_rate(new_rate)
+            self._invalidate('rate')
 
     @property
     def running(self):
         '''Is this execution context running?'''
         with self._mutex:
-            return self._obj.is_running()
+            return self._get_cached('running', self._obj.is_running)
 
     @property
     def running_string(self):
         '''The state of this execution context as a coloured string.'''
         return self.running_as_string()
 
+    def _get_cached(self, name, fetch, expires=True):
+        # Get a cached value, fetching it if it is not cached or has expired.
+        with self._mutex:
+            if name in self._cache:
+                value, stamp = self._cache[name]
+                if not expires or self._dynamic or \
+                        time.time() - stamp < \
+                        Options().get_option('ec_cache_ttl'):
+                    return value
+            value = fetch()
+            self._cache[name] = (value, time.time())
+            return value
+
+    def _invalidate(self, name=None):
+        # Discard a cached value, or all cached values if name is None.
+        with self._mutex:
+            if name is None:
+                self._cache = {}
+            elif name in self._cache:
+                del self._cache[name]
+
+    def _set_running(self, running):
+        # Set the cached running state after being told it has changed.
+        with self._mutex:
+            self._cache['running'] = (running, time.time())
+
     def _parse(self):
         # Parse the ExecutionContext object.
         with self._mutex:
+            self._invalidate()
             if self._is_service:
                 profile = self._obj.get_profile()
                 self._owner = profile.owner
@@ -0,0 +1,261 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Index of the dataflow graph formed by the connections between ports.
+
+'''
+
+
+import threading
+
+from rtctree import utils
+
+
+##############################################################################
+## Graph connection object
+
+class GraphConnection(object):
+    '''A connection (edge) in a dataflow graph.'''
+    def __init__(self, id, name, ports, properties):
+        '''Constructor.
+
+        @param id The connector ID of the connection.
+        @param name The name of the connection.
+        @param ports A list of the paths of the connected ports. Ports that are
+                     not in the indexed part of the tree are None.
+        @param properties The connection's properties dictionary.
+
+        '''
+        self.id = id
+        self.name = name
+        self.ports = ports
+        self.properties = properties
+
+    def __str__(self):
+        return 'Connection {0} (ID: {1}), with ports {2}'.format(self.name,
+                self.id, self.ports)
+
+
+##############################################################################
+## Dataflow graph object
+
+class DataflowGraph(object):
+    '''An index of the connections between the ports of components.
+
+    The graph is built in one pass over all components below a node of the
+    tree. Its nodes are ports, identified by their full path (e.g.
+    '/localhost/Comp0.rtc:in'), and its edges are connections, identified by
+    their connector ID. Each connection is stored once, no matter how many of
+    its ports are in the graph.
+
+    Once built, queries on the graph make no remote calls. If a component is
+    dynamic, the graph is updated when it reports a port being connected or
+    disconnected.
+
+    '''
+    def __init__(self, node, *args, **kwargs):
+        '''Constructor.
+
+        @param node The tree node below which to index components.
+
+        '''
+        super(DataflowGraph, self).__init__(*args, **kwargs)
+        self._node = node
+        self._mutex = threading.RLock()
+        self._watched = []
+        self._build()
+
+    def close(self):
+        '''Stop updating the graph from component events.'''
+        with self._mutex:
+            for comp in self._watched:
+                comp._rem_listener('port_event', self._port_event)
+            self._watched = []
+
+    def rebuild(self):
+        '''Rebuild the graph from scratch.'''
+        self.close()
+        self._build()
+
+    def component_neighbours(self, comp_path):
+        '''Get the components connected to a component.
+
+        @param comp_path The full path of the component as a string.
+        @return A sorted list of the full paths of the connected components.
+
+        '''
+        with self._mutex:
+            result = set()
+            for id in self._comp_conns.get(comp_path, []):
+                for p in self._conns[id].ports:
+                    if p is None:
+                        continue
+                    c = p.rpartition(':')[0]
+                    if c != comp_path:
+                        result.add(c)
+            return sorted(result)
+
+    def connected_components(self):
+        '''Get the groups of components that are connected to each other.
+
+        @return A list of sets of component paths. Each component in the graph
+                is in exactly one set; unconnected components are alone in
+                their set.
+
+        '''
+        with self._mutex:
+            result = []
+            seen = set()
+            for comp in sorted(self._comp_conns.keys()):
+                if comp in seen:
+                    continue
+                group = set([comp])
+                to_visit = [comp]
+                while to_visit:
+                    for n in self.component_neighbours(to_visit.pop()):
+                        if n not in group:
+                            group.add(n)
+                            to_visit.append(n)
+                seen |= group
+                result.append(group)
+            return result
+
+    def get_connection(self, id):
+        '''Get a connection by its connector ID, or None if not found.'''
+        with self._mutex:
+            return self._conns.get(id, None)
+
+    def neighbours(self, port_path):
+        '''Get the ports connected to a port.
+
+        @param port_path The full path of the port as a string.
+        @return A sorted list of the paths of the connected ports.
+
+        '''
+        with self._mutex:
+            result = set()
+            for id in self._port_conns.get(port_path, []):
+                for p in self._conns[id].ports:
+                    if p is not None and p != port_path:
+                        result.add(p)
+            return sorted(result)
+
+    def port_connections(self, port_path):
+        '''Get the connections involving a port.
+
+        @param port_path The full path of the port as a string.
+        @return A list of GraphConnection objects.
+
+        '''
+        with self._mutex:
+            return [self._conns[id] for id in \
+                    sorted(self._port_conns.get(port_path, []))]
+
+    @property
+    def components(self):
+        '''The paths of the components in the graph.'''
+        with self._mutex:
+            return sorted(self._comp_conns.keys())
+
+    @property
+    def connections(self):
+        '''The connections in the graph.'''
+        with self._mutex:
+            return [self._conns[id] for id in sorted(self._conns.keys())]
+
+    @property
+    def ports(self):
+        '''The paths of the ports in the graph.'''
+        with self._mutex:
+            return sorted(self._port_conns.keys())
+
+    def _add_connection(self, profile):
+        # Add a connection from its ConnectorProfile, if it is not already in
+        # the graph.
+        id = profile.connector_id
+        if id in self._conns:
+            return
+        paths = [self._port_paths.get(utils.object_key(p), None) \
+                 for p in profile.ports]
+        self._conns[id] = GraphConnection(id, profile.name, paths,
+                utils.nvlist_to_dict(profile.properties))
+        for p in paths:
+            if p is None:
+                continue
+            self._port_conns[p].add(id)
+            self._comp_conns[p.rpartition(':')[0]].add(id)
+
+    def _build(self):
+        # Index all the ports and connections below the node.
+        with self._mutex:
+            self._conns = {}
+            self._port_conns = {}
+            self._comp_conns = {}
+            self._port_paths = {}
+            self._ports = {}
+            comps = self._node.iterate(lambda n, args: n,
+                    filter=['is_component'])
+            ports = []
+            for c, (c_ports, e) in zip(comps, utils.call_concurrently(
+                    lambda c: c.ports, comps)):
+                if e:
+                    raise e
+                self._comp_conns[c.full_path_str] = set()
+                for p in c_ports:
+                    path = c.full_path_str + ':' + p.name
+                    self._port_paths[utils.object_key(p.object)] = path
+                    self._port_conns[path] = set()
+                    self._ports[path] = p
+                    ports.append(p)
+                if c.dynamic:
+                    c._add_listener('port_event', self._port_event)
+                    self._watched.append(c)
+            for profiles, e in utils.call_concurrently(
+                    lambda p: p.object.get_connector_profiles(), ports):
+                if e:
+                    raise e
+                for prof in profiles:
+                    self._add_connection(prof)
+
+    def _port_event(self, node, value, cb_args):
+        # Update the connections of a port after it reports a change.
+        port_name, event = value
+        if event != node.PORT_CONNECT and event != node.PORT_DISCONNECT:
+            return
+        prefix = node.instance_name + '.'
+        if port_name.startswith(prefix):
+            port_name = port_name[len(prefix):]
+        path = node.full_path_str + ':' + port_name
+        with self._mutex:
+            if path not in self._ports:
+                return
+            profiles = self._ports[path].object.get_connector_profiles()
+            current = set([prof.connector_id for prof in profiles])
+            for id in self._port_conns[path] - current:
+                self._remove_connection(id)
+            for prof in profiles:
+                self._add_connection(prof)
+
+    def _remove_connection(self, id):
+        # Remove a connection from all the ports and components it involves.
+        conn = self._conns.pop(id)
+        for p in conn.ports:
+            if p is None:
+                continue
+            self._port_conns[p].discard(id)
+            self._comp_conns[p.rpartition(':')[0]].discard(id)
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,324 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Opt-in instrumentation of remote calls.
+
+When enabled, the object references held by components, ports, execution
+contexts, managers and directories record the number of calls made on them,
+the number of errors and a histogram of call latencies, by operation and by
+remote end point. Each tree created with instrumentation enabled keeps its
+statistics in its own CallStats object.
+
+'''
+
+
+import binascii
+import bisect
+import json
+import struct
+import threading
+import time
+
+from omniORB import CORBA
+
+from rtctree import utils
+
+
+## Upper bounds, in seconds, of the latency histogram buckets. The last bucket
+## holds all longer calls.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+## Endpoint label used for references without an IIOP profile.
+UNKNOWN_ENDPOINT = 'unknown'
+
+
+##############################################################################
+## IOR parsing
+
+def _align(offset, n):
+    return (offset + n - 1) // n * n
+
+
+def _read_ulong(data, offset, endian):
+    offset = _align(offset, 4)
+    return struct.unpack_from(endian + 'L', data, offset)[0], offset + 4
+
+
+def ior_endpoint(ior):
+    '''Get the host and port of the first IIOP profile in a stringified IOR.
+
+    >>> ior_endpoint('IOR:010000001d00000049444c3a6f6d672e6f72672f5254432f5254'
+    ...     '4f626a6563743a312e300000000001000000000000001c000000010102000a'
+    ...     '0000003132372e302e302e3100f90a0400000061626364')
+    '127.0.0.1:2809'
+    >>> ior_endpoint('corbaloc::localhost/NameService')
+    'unknown'
+
+    @param ior The stringified IOR, as returned by ORB.object_to_string().
+    @return The end point as a 'host:port' string, or UNKNOWN_ENDPOINT if it
+            could not be found.
+
+    '''
+    if not ior.startswith('IOR:'):
+        return UNKNOWN_ENDPOINT
+    try:
+        data = binascii.unhexlify(ior[4:])
+        endian = '<' if data[0] else '>'
+        # Skip the repository ID
+        length, offset = _read_ulong(data, 1, endian)
+        offset += length
+        count, offset = _read_ulong(data, offset, endian)
+        for ii in range(count):
+            tag, offset = _read_ulong(data, offset, endian)
+            length, offset = _read_ulong(data, offset, endian)
+            if tag != 0:
+                # Not TAG_INTERNET_IOP
+                offset += length
+                continue
+            # The profile body is an encapsulation, aligned from its start.
+            body = data[offset:offset + length]
+            body_endian = '<' if body[0] else '>'
+            length, pos = _read_ulong(body, 3, body_endian)
+            host = body[pos:pos + length - 1].decode('ascii')
+            pos = _align(pos + length, 2)
+            port = struct.unpack_from(body_endian + 'H', body, pos)[0]
+            return '{0}:{1}'.format(host, port)
+    except (binascii.Error, struct.error, IndexError, UnicodeDecodeError):
+        pass
+    return UNKNOWN_ENDPOINT
+
+
+##############################################################################
+## Statistics
+
+class _Record(object):
+    # Statistics for one operation or end point.
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.error_types = {}
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, duration, error):
+        self.count += 1
+        self.total += duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+        self.buckets[bisect.bisect_left(BUCKETS, duration)] += 1
+        if error is not None:
+            self.errors += 1
+            name = type(error).__name__
+            self.error_types[name] = self.error_types.get(name, 0) + 1
+
+    def as_dict(self):
+        histogram = dict([(str(b), c) for b, c in zip(BUCKETS,
+            self.buckets)])
+        histogram['inf'] = self.buckets[-1]
+        return {'count': self.count, 'errors': self.errors,
+                'error_types': dict(self.error_types), 'total': self.total,
+                'mean': self.total / self.count if self.count else None,
+                'min': self.min, 'max': self.max, 'histogram': histogram}
+
+
+class CallStats(object):
+    '''Statistics of remote calls made by the nodes of a tree.
+
+    Calls are only recorded on object references wrapped by @ref wrap with
+    this object, while it is enabled. References are wrapped when nodes are
+    created, so the object must be given to a tree when it is built.
+
+    >>> s = CallStats()
+    >>> s.enable()
+    >>> s.record('RTObject.get_ports', '127.0.0.1:2809', 0.003)
+    >>> s.record('RTObject.get_ports', '127.0.0.1:2809', 0.2, ValueError())
+    >>> ops = s.operations
+    >>> ops['RTObject.get_ports']['count'], ops['RTObject.get_ports']['errors']
+    (2, 1)
+    >>> ops['RTObject.get_ports']['histogram']['0.005']
+    1
+    >>> s.disable()
+
+    '''
+    def __init__(self):
+        '''Constructor. Calls are not recorded until enable() is called.'''
+        self._enabled = False
+        self._ops = {}
+        self._endpoints = {}
+        self._mutex = threading.Lock()
+
+    def disable(self):
+        '''Stop recording calls. Recorded statistics are kept.'''
+        self._enabled = False
+
+    def dump(self, f):
+        '''Write the statistics as JSON to a file object.'''
+        json.dump(self.as_dict(), f, indent=2, sort_keys=True)
+
+    def enable(self):
+        '''Start recording calls.'''
+        self._enabled = True
+
+    def record(self, operation, endpoint, duration, error=None):
+        '''Record a call.
+
+        @param operation The operation name, as 'Interface.operation'.
+        @param endpoint The remote end point the call was made to.
+        @param duration The time the call took, in seconds.
+        @param error The exception raised by the call, if any.
+
+        '''
+        if not self._enabled:
+            return
+        with self._mutex:
+            if operation not in self._ops:
+                self._ops[operation] = _Record()
+            self._ops[operation].add(duration, error)
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = _Record()
+            self._endpoints[endpoint].add(duration, error)
+
+    def reset(self):
+        '''Remove all recorded statistics.'''
+        with self._mutex:
+            self._ops = {}
+            self._endpoints = {}
+
+    def as_dict(self):
+        '''Get all statistics as a dictionary.'''
+        return {'operations': self.operations, 'endpoints': self.endpoints}
+
+    def to_json(self):
+        '''Get all statistics as a JSON string.'''
+        return json.dumps(self.as_dict(), indent=2, sort_keys=True)
+
+    @property
+    def enabled(self):
+        '''Are calls being recorded?'''
+        return self._enabled
+
+    @property
+    def endpoints(self):
+        '''Statistics of the calls to each remote end point.'''
+        with self._mutex:
+            return dict([(e, r.as_dict()) for e, r in \
+                    self._endpoints.items()])
+
+    @property
+    def operations(self):
+        '''Statistics of the calls to each operation.'''
+        with self._mutex:
+            return dict([(o, r.as_dict()) for o, r in self._ops.items()])
+
+
+##############################################################################
+## Object reference wrapping
+
+_classes = {}
+_classes_lock = threading.Lock()
+
+
+def _interface_name(cls):
+    # Get the short interface name from a stub class's repository ID, e.g.
+    # 'IDL:omg.org/RTC/RTObject:1.0' -> 'RTObject'.
+    repo_id = getattr(cls, '_NP_RepositoryId', '')
+    if repo_id.count(':') == 2:
+        return repo_id.split(':')[1].rsplit('/', 1)[-1]
+    return cls.__name__
+
+
+def _make_method(base, operation):
+    def method(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = base(self, *args, **kwargs)
+        except Exception as e:
+            self._rtctree_stats.record(operation, self._rtctree_endpoint,
+                    time.perf_counter() - start, e)
+            raise
+        self._rtctree_stats.record(operation, self._rtctree_endpoint,
+                time.perf_counter() - start)
+        return result
+    method.__name__ = base.__name__
+    method.__doc__ = base.__doc__
+    return method
+
+
+def _instrumented_class(cls):
+    # Get the instrumented subclass of an object reference stub class.
+    with _classes_lock:
+        if cls not in _classes:
+            intf = _interface_name(cls)
+            attrs = {'_rtctree_instrumented': True}
+            for name in dir(cls):
+                if name.startswith('_'):
+                    continue
+                attr = getattr(cls, name, None)
+                if callable(attr):
+                    attrs[name] = _make_method(attr, intf + '.' + name)
+            _classes[cls] = type(cls.__name__, (cls,), attrs)
+        return _classes[cls]
+
+
+def is_instrumented(obj):
+    '''Are calls on an object reference recorded?'''
+    return getattr(type(obj), '_rtctree_instrumented', False)
+
+
+def wrap(obj, stats=None):
+    '''Get an instrumented copy of an object reference.
+
+    The copy is a new reference to the same object, whose class is a
+    subclass of the original's that times every operation, so it can still
+    be passed to other remote calls. The calls are recorded in @ref stats
+    while it is enabled. The original reference, which may be shared with
+    other trees, is not changed. References that are nil, already recording
+    to @ref stats or cannot be instrumented are returned unchanged, as are
+    all references if @ref stats is None.
+
+    @param obj The object reference.
+    @param stats The CallStats object to record calls in, or None.
+    @return The instrumented copy, or @ref obj.
+
+    '''
+    if obj is None or stats is None:
+        return obj
+    cls = type(obj)
+    if is_instrumented(obj):
+        if obj._rtctree_stats is stats:
+            return obj
+        # Copy the original reference rather than another tree's copy
+        cls = cls.__bases__[0]
+    try:
+        if CORBA.is_nil(obj):
+            return obj
+        orb = CORBA.ORB_init()
+        ior = orb.object_to_string(obj)
+        ref = orb.string_to_object(ior)
+        ref._rtctree_endpoint = ior_endpoint(ior)
+        ref._rtctree_stats = stats
+        ref.__class__ = _instrumented_class(cls)
+    except (AttributeError, TypeError, CORBA.BAD_PARAM):
+        # Not a stub object reference
+        return obj
+    return ref
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
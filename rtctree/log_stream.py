@@ -0,0 +1,535 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Buffered delivery of log records from components.
+
+Log records from a logger added with Component.add_logger() are delivered by
+calling the callback in the ORB thread that received them. A LogPipeline can
+be given as the callback instead: it only stores each record in a bounded
+buffer, and a separate thread delivers the records to a consumer in batches.
+A RotatingFileSink is a consumer that writes the records to a file.
+
+A LogAggregator adds loggers to many components and merges their records
+into one stream, ordered by time stamp.
+
+    sink = RotatingFileSink('comp0.log', max_bytes=1000000)
+    pipeline = LogPipeline(sink)
+    id = comp.add_logger(pipeline, level='DEBUG')
+
+'''
+
+
+import collections
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from rtctree import utils
+from rtctree.options import Options
+
+
+LogRecord = collections.namedtuple('LogRecord',
+        ['name', 'time', 'source', 'level', 'message'])
+'''A log record: the name of the component it came from, its time stamp as
+a floating-point number, the name of the logger that provided it, its level
+and its message.'''
+
+
+# What to do with a new record when the buffer is full
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+BLOCK = 'block'
+POLICIES = [DROP_OLDEST, DROP_NEWEST, BLOCK]
+
+
+##############################################################################
+## Pipeline object
+
+class LogPipeline(object):
+    '''Buffers log records and delivers them to a consumer in batches.
+
+    The pipeline is called with the same arguments as the callback of
+    Component.add_logger(), so it can be passed to it directly. Each call
+    adds a record to the buffer; a background thread takes the records from
+    the buffer and calls the consumer with a list of up to @ref batch_size
+    records at a time.
+
+    When the buffer is full, the policy decides what happens to a new record:
+
+      - DROP_OLDEST: the oldest record in the buffer is dropped.
+      - DROP_NEWEST: the new record is dropped.
+      - BLOCK: the caller waits for space, for up to @ref block_timeout
+        seconds, after which the new record is dropped.
+
+    Dropped records are counted in @ref lost.
+
+    >>> records = []
+    >>> pipeline = LogPipeline(records.extend)
+    >>> pipeline('comp0.rtc', 1.5, 'comp0', 'INFO', 'Started')
+    >>> pipeline.close()
+    >>> records
+    [LogRecord(name='comp0.rtc', time=1.5, source='comp0', level='INFO', message='Started')]
+
+    '''
+    def __init__(self, consumer, capacity=None, policy=DROP_OLDEST,
+            batch_size=None, flush_interval=None, block_timeout=None):
+        '''Constructor.
+
+        The delivery thread is started immediately.
+
+        @param consumer The function to call with each batch, a list of
+                        LogRecord objects. It is called in the delivery
+                        thread. Exceptions it raises are ignored.
+        @param capacity The most records the buffer can hold. If None, the
+                        'log_buffer_size' option is used.
+        @param policy What to do with a new record when the buffer is full;
+                      one of DROP_OLDEST, DROP_NEWEST and BLOCK.
+        @param batch_size The most records to deliver in one call to the
+                          consumer. If None, the 'log_batch_size' option is
+                          used.
+        @param flush_interval The longest time, in seconds, a record waits in
+                              the buffer for a batch to fill before it is
+                              delivered. If None, the 'log_flush_interval'
+                              option is used.
+        @param block_timeout With the BLOCK policy, the longest time to wait
+                             for space in the buffer, in seconds. If None,
+                             wait for as long as it takes.
+        @raises ValueError if the policy is unknown.
+
+        '''
+        if policy not in POLICIES:
+            raise ValueError('Unknown log buffer policy: {0}'.format(policy))
+        if capacity is None:
+            capacity = Options().get_option('log_buffer_size')
+        if batch_size is None:
+            batch_size = Options().get_option('log_batch_size')
+        if flush_interval is None:
+            flush_interval = Options().get_option('log_flush_interval')
+        self._consumer = consumer
+        self._capacity = max(1, capacity)
+        self._policy = policy
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+        self._block_timeout = block_timeout
+        self._buffer = collections.deque()
+        self._lost = 0
+        self._delivered = 0
+        self._busy = False
+        self._flushing = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = threading.Thread(target=self._run,
+                name='rtctree-log-pipeline')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __call__(self, name, time, source, level, message):
+        '''Add a record to the buffer.'''
+        self.push(LogRecord(name, time, source, level, message))
+
+    def push(self, record):
+        '''Add a LogRecord to the buffer.
+
+        @return True if the record was added, False if it was dropped.
+
+        '''
+        with self._cond:
+            if self._closed:
+                self._lost += 1
+                return False
+            if len(self._buffer) >= self._capacity:
+                if self._policy == DROP_NEWEST:
+                    self._lost += 1
+                    return False
+                elif self._policy == DROP_OLDEST:
+                    self._buffer.popleft()
+                    self._lost += 1
+                elif not self._wait_for_space():
+                    self._lost += 1
+                    return False
+            self._buffer.append(record)
+            if len(self._buffer) >= self._batch_size:
+                self._cond.notify_all()
+            return True
+
+    def flush(self, timeout=None):
+        '''Wait until all the records in the buffer have been delivered.
+
+        @param timeout The longest time to wait, in seconds. If None, wait
+                       for as long as it takes.
+        @return True if the buffer was emptied, False if the time ran out.
+
+        '''
+        end = None if timeout is None else time.time() + timeout
+        with self._cond:
+            # Deliver the records now instead of waiting for a full batch
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._buffer or self._busy:
+                    if not self._wait_until(end):
+                        return False
+                return True
+            finally:
+                self._flushing -= 1
+
+    def close(self):
+        '''Deliver the remaining records and stop the delivery thread.
+
+        Records added after the pipeline is closed are counted as lost.
+
+        '''
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def capacity(self):
+        '''The most records the buffer can hold.'''
+        return self._capacity
+
+    @property
+    def closed(self):
+        '''Has the pipeline been closed?'''
+        with self._cond:
+            return self._closed
+
+    @property
+    def delivered(self):
+        '''The number of records given to the consumer.'''
+        with self._cond:
+            return self._delivered
+
+    @property
+    def lost(self):
+        '''The number of records dropped because the buffer was full or the
+        pipeline was closed.'''
+        with self._cond:
+            return self._lost
+
+    @property
+    def pending(self):
+        '''The number of records in the buffer.'''
+        with self._cond:
+            return len(self._buffer)
+
+    @property
+    def policy(self):
+        '''What is done with a new record when the buffer is full.'''
+        return self._policy
+
+    def _run(self):
+        while True:
+            with self._cond:
+                # Wait for a full batch, or for the oldest record to have
+                # waited long enough
+                end = time.time() + self._flush_interval
+                while not self._closed and not self._flushing and \
+                        len(self._buffer) < self._batch_size:
+                    if not self._buffer:
+                        self._cond.wait()
+                        end = time.time() + self._flush_interval
+                    elif not self._wait_until(end):
+                        break
+                if not self._buffer:
+                    if self._closed:
+                        return
+                    continue
+                count = min(len(self._buffer), self._batch_size)
+                batch = [self._buffer.popleft() for ii in range(count)]
+                self._busy = True
+                # Wake up callers waiting for space
+                self._cond.notify_all()
+            try:
+                self._consumer(batch)
+            except Exception:
+                # A broken consumer must not stop delivery
+                pass
+            with self._cond:
+                self._busy = False
+                self._delivered += len(batch)
+                self._cond.notify_all()
+
+    def _wait_for_space(self):
+        # Wait, holding the condition, until the buffer has space or the
+        # block timeout passes.
+        end = None
+        if self._block_timeout is not None:
+            end = time.time() + self._block_timeout
+        while len(self._buffer) >= self._capacity:
+            if self._closed or not self._wait_until(end):
+                return False
+        return True
+
+    def _wait_until(self, end):
+        # Wait on the condition until notified or the end time. Returns False
+        # if the end time has passed.
+        if end is None:
+            self._cond.wait()
+            return True
+        remaining = end - time.time()
+        if remaining <= 0:
+            return False
+        self._cond.wait(remaining)
+        return True
+
+
+##############################################################################
+## File sink object
+
+class RotatingFileSink(object):
+    '''Writes log records to a file, rotating it when it becomes too large.
+
+    Each record is written as one line. When writing a batch would make the
+    file larger than @ref max_bytes, the file is renamed to filename.1, any
+    existing filename.1 to filename.2 and so on, keeping up to
+    @ref backup_count old files, and a new file is started.
+
+    The sink is called with a list of LogRecord objects, so it can be used as
+    the consumer of a LogPipeline.
+
+    '''
+    def __init__(self, filename, max_bytes=0, backup_count=5, fmt=None):
+        '''Constructor.
+
+        @param filename The name of the file to write.
+        @param max_bytes The size, in bytes, above which the file is rotated.
+                         If 0, the file is never rotated.
+        @param backup_count The number of old files to keep.
+        @param fmt The format of each line, used with str.format() and the
+                   fields of LogRecord as keywords. If None, the time, name,
+                   source, level and message are written separated by
+                   spaces.
+
+        '''
+        self._filename = filename
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        if fmt is None:
+            fmt = '{time:.6f} {name} {source} {level} {message}'
+        self._fmt = fmt
+        self._mutex = threading.Lock()
+        self._f = open(filename, 'a', encoding='utf-8')
+        self._size = self._f.tell()
+
+    def __call__(self, records):
+        '''Write a batch of records.'''
+        text = ''.join([self._fmt.format(**r._asdict()) + '\n' \
+                for r in records])
+        size = len(text.encode('utf-8'))
+        with self._mutex:
+            if self._max_bytes and self._size and \
+                    self._size + size > self._max_bytes:
+                self._rotate()
+            self._f.write(text)
+            self._f.flush()
+            self._size += size
+
+    def close(self):
+        '''Close the file.'''
+        with self._mutex:
+            self._f.close()
+
+    @property
+    def filename(self):
+        '''The name of the file being written.'''
+        return self._filename
+
+    def _rotate(self):
+        # Move each old file up one place and start a new file.
+        self._f.close()
+        if self._backup_count > 0:
+            for ii in range(self._backup_count - 1, 0, -1):
+                src = '{0}.{1}'.format(self._filename, ii)
+                if os.path.exists(src):
+                    os.replace(src, '{0}.{1}'.format(self._filename, ii + 1))
+            os.replace(self._filename, self._filename + '.1')
+        else:
+            os.remove(self._filename)
+        self._f = open(self._filename, 'a', encoding='utf-8')
+        self._size = 0
+
+
+##############################################################################
+## Aggregator object
+
+class LogAggregator(object):
+    '''Merges the log records of many components into one stream.
+
+    Loggers are added to all the components in parallel. Records from
+    different components arrive in no particular order, so they are held
+    in a heap ordered by time stamp and given out once they can no longer be
+    overtaken: when a record newer by more than the reorder window has
+    arrived, or when the record has waited for the reorder window. Records
+    that arrive later than that are still given out, and are counted in
+    @ref late.
+
+        aggregator = LogAggregator(comps, level='DEBUG')
+        for record in aggregator.records(timeout=10):
+            print(record.time, record.name, record.message)
+        aggregator.close()
+
+    '''
+    def __init__(self, components, level='NORMAL', filters='ALL',
+            window=None, capacity=None):
+        '''Constructor.
+
+        @param components The list of Component nodes to receive logs from.
+        @param level The maximum level of log records to receive.
+        @param filters Filter the objects from which to receive log messages.
+        @param window The reorder window, in seconds. If None, the
+                      'log_reorder_window' option is used.
+        @param capacity The most records to hold. When there are more, the
+                        oldest record is dropped and counted in @ref lost.
+                        If None, the 'log_buffer_size' option is used.
+        @raises AddLoggerError, or the error raised while adding a logger.
+                If any logger cannot be added, the loggers that were added are
+                removed.
+
+        '''
+        if window is None:
+            window = Options().get_option('log_reorder_window')
+        if capacity is None:
+            capacity = Options().get_option('log_buffer_size')
+        self._window = window
+        self._capacity = max(1, capacity)
+        self._heap = []
+        self._seq = itertools.count()
+        self._newest = None
+        self._released = None
+        self._lost = 0
+        self._late = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+        components = list(components)
+        results = utils.call_concurrently(
+                lambda c: c.add_logger(self._receive, level, filters),
+                components)
+        self._loggers = [(c, id) for c, (id, e) in zip(components, results) \
+                if not e]
+        for id, e in results:
+            if e:
+                self.close()
+                raise e
+
+    def __iter__(self):
+        return self.records()
+
+    def close(self):
+        '''Remove the loggers from the components.
+
+        The loggers are removed in parallel. Records already received can
+        still be read; records() ends once they have all been given out.
+
+        '''
+        with self._cond:
+            loggers = self._loggers
+            self._loggers = []
+        # Components that have gone cannot have their loggers removed; the
+        # records they send are ignored.
+        utils.call_concurrently(lambda cl: cl[0].remove_logger(cl[1]),
+                loggers)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def records(self, timeout=None):
+        '''Get the merged records as they become available.
+
+        @param timeout If given, stop when no record has been available for
+                       this many seconds. Otherwise, stop only after the
+                       aggregator is closed and all the records received
+                       have been given out.
+        @return A generator of LogRecord objects, in time stamp order.
+
+        '''
+        while True:
+            end = None if timeout is None else time.time() + timeout
+            with self._cond:
+                while True:
+                    now = time.time()
+                    wait = None
+                    if self._heap:
+                        stamp, seq, arrived, record = self._heap[0]
+                        if self._closed or \
+                                stamp <= self._newest - self._window or \
+                                now - arrived >= self._window:
+                            heapq.heappop(self._heap)
+                            break
+                        wait = arrived + self._window - now
+                    elif self._closed:
+                        return
+                    if end is not None:
+                        if now >= end:
+                            return
+                        wait = end - now if wait is None else \
+                                min(wait, end - now)
+                    self._cond.wait(wait)
+                if self._released is not None and stamp < self._released:
+                    self._late += 1
+                else:
+                    self._released = stamp
+            yield record
+
+    @property
+    def components(self):
+        '''The components that loggers have been added to.'''
+        with self._cond:
+            return [c for c, id in self._loggers]
+
+    @property
+    def late(self):
+        '''The number of records given out after a newer record.'''
+        with self._cond:
+            return self._late
+
+    @property
+    def lost(self):
+        '''The number of records dropped because too many were held.'''
+        with self._cond:
+            return self._lost
+
+    @property
+    def pending(self):
+        '''The number of records received but not yet given out.'''
+        with self._cond:
+            return len(self._heap)
+
+    @property
+    def window(self):
+        '''The reorder window, in seconds.'''
+        return self._window
+
+    def _receive(self, name, stamp, source, level, message):
+        # Logger callback, called in the ORB thread.
+        record = LogRecord(name, stamp, source, level, message)
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._heap) >= self._capacity:
+                heapq.heappop(self._heap)
+                self._lost += 1
+            heapq.heappush(self._heap,
+                    (stamp, next(self._seq), time.time(), record))
+            if self._newest is None or stamp > self._newest:
+                self._newest = stamp
+            self._cond.notify_all()
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -22,13 +22,18 @@ from __future__ import print_function
 
 import os.path
 import sys
+import time
 
 from omniORB import CORBA, TRANSIENT_ConnectFailed, UNKNOWN_UserException
 
 from rtctree import exceptions
+from rtctree import instrument
+from rtctree import tracing
 from rtctree import utils
 from rtctree.component import Component
+from rtctree.name_cache import InstanceNameCache
 from rtctree.node import TreeNode
+from rtctree.options import Options
 from rtctree.rtc import RTC
 
 
@@ -165,7 +170,7 @@ class Manager(TreeNode):
         '''Constructor. Calls the TreeNode constructor.'''
         super(Manager, self).__init__(name=name, parent=parent, *args,
                                       **kwargs)
-        self._obj = obj
+        self._obj = instrument.wrap(obj, self._call_stats)
         self._parse()
 
     ##########################################################################
@@ -175,8 +180,8 @@ class Manager(TreeNode):
         '''Create a component out of a loaded module.
 
         Turns a previously-loaded shared module into a component in the
-        manager. This will invalidate any objects that are children of this
-        node.
+        manager. A node for the new component is added to the children of
+        this node; the nodes of the other components are kept.
 
         The @ref module_name argument can contain options that set various
         properties of the new component. These must be appended to the module
@@ -188,28 +193,68 @@ class Manager(TreeNode):
         @raises FailedToCreateComponentError
 
         '''
-        with self._mutex:
-            if not self._obj.create_component(module_name):
+        with tracing.span('Manager.create_component', node=self,
+                obj=self._obj, operation='create_component',
+                module_name=module_name):
+            with self._mutex:
+                if not self._obj.create_component(module_name):
+                    raise exceptions.FailedToCreateComponentError(module_name)
+            # The list of child components will have changed now, so it must
+            # be reparsed.
+            self._parse_component_children()
+
+    def create_components(self, module_names):
+        '''Create several components out of loaded modules.
+
+        The components are created in parallel, and the children of this node
+        are reparsed once, after all of them have been created. Each module
+        name can contain options, as for create_component().
+
+        @param module_names A list of names of the modules to turn into
+                            components.
+        @return A list of (component, error) tuples, one per module name in
+                the same order. If the component was created, component is
+                its new node (or None if the manager does not list it) and
+                error is None. Otherwise component is None and error is the
+                exception, such as FailedToCreateComponentError.
+
+        '''
+        def create(module_name):
+            obj = self._obj.create_component(module_name)
+            if not obj:
                 raise exceptions.FailedToCreateComponentError(module_name)
-            # The list of child components will have changed now, so it must be
-            # reparsed.
+            return obj
+        with tracing.span('Manager.create_components', node=self,
+                obj=self._obj, operation='create_component',
+                count=len(module_names)):
+            results = utils.call_concurrently(create, module_names)
             self._parse_component_children()
+            with self._mutex:
+                nodes = dict([(utils.object_key(c.object), c) \
+                        for c in self._children.values() if c.is_component])
+        return [(None, e) if e else (nodes.get(utils.object_key(obj), None),
+            None) for obj, e in results]
 
     def delete_component(self, instance_name):
         '''Delete a component.
 
         Deletes the component specified by @ref instance_name from the manager.
-        This will invalidate any objects that are children of this node.
+        Its node is removed from the children of this node; the nodes of the
+        other components are kept.
 
         @param instance_name The instance name of the component to delete.
         @raises FailedToDeleteComponentError
 
         '''
-        with self._mutex:
-            if self._obj.delete_component(instance_name) != RTC.RTC_OK:
-                raise exceptions.FailedToDeleteComponentError(instance_name)
-            # The list of child components will have changed now, so it must be
-            # reparsed.
+        with tracing.span('Manager.delete_component', node=self,
+                obj=self._obj, operation='delete_component',
+                instance_name=instance_name):
+            with self._mutex:
+                if self._obj.delete_component(instance_name) != RTC.RTC_OK:
+                    raise exceptions.FailedToDeleteComponentError(
+                            instance_name)
+            # The list of child components will have changed now, so it must
+            # be reparsed.
             self._parse_component_children()
 
     def load_module(self, path, init_func):
@@ -227,6 +272,7 @@ class Manager(TreeNode):
             with self._mutex:
                 if self._obj.load_module(path, init_func) != RTC.RTC_OK:
                     raise exceptions.FailedToLoadModuleError(path)
+                self._metadata_time = None
         except CORBA.UNKNOWN as e:
             if e.args[0] == UNKNOWN_UserException:
                 raise exceptions.FailedToLoadModuleError(path, 'CORBA User Exception')
@@ -246,6 +292,7 @@ class Manager(TreeNode):
         with self._mutex:
             if self._obj.unload_module(path) != RTC.RTC_OK:
                 raise exceptions.FailedToUnloadModuleError(path)
+            self._metadata_time = None
 
     def loadable_modules(self):
         '''Show loadable RTC modules on the manager.
@@ -299,6 +346,7 @@ class Manager(TreeNode):
                 raise exceptions.FailedToSetConfigurationError(param, value)
             # Force a reparse of the configuration
             self._configuration = None
+            self._metadata_time = None
 
     @property
     def configuration(self):
@@ -317,6 +365,31 @@ class Manager(TreeNode):
                 self._profile = utils.nvlist_to_dict(profile.properties)
         return self._profile
 
+    def fetch_metadata(self, ttl=None):
+        '''Get all the metadata of the manager at once.
+
+        The profile, configuration, factory profiles, loadable and loaded
+        modules and master status of the manager are retrieved in parallel
+        and cached, so reading the properties that give them does not make
+        remote calls. Later calls retrieve them again once they are older than
+        @ref ttl.
+
+        @param ttl The age in seconds after which the cached metadata is
+                   retrieved again. If None, the 'manager_metadata_ttl'
+                   option is used.
+        @return A dictionary with the keys 'profile', 'configuration',
+                'factory_profiles', 'loadable_modules', 'loaded_modules' and
+                'is_master'.
+
+        '''
+        if ttl is None:
+            ttl = Options().get_option('manager_metadata_ttl')
+        with self._mutex:
+            if self._metadata_time is None or \
+                    time.time() - self._metadata_time >= ttl:
+                self._fetch_metadata()
+            return self._metadata()
+
     ##########################################################################
     # Undocumented functions
 
@@ -360,11 +433,17 @@ class Manager(TreeNode):
         '''Is this manager node a master manager?
 
         Master managers have a direct presence on the name server. Slave
-        managers are only present as children of other managers.
+        managers are only present as children of other managers. The result
+        is cached for the time given by the 'manager_metadata_ttl' option.
 
         '''
         with self._mutex:
-            return self._obj.is_master()
+            if self._is_master is None or \
+                    time.time() - self._is_master_time >= \
+                    Options().get_option('manager_metadata_ttl'):
+                self._is_master = self._obj.is_master()
+                self._is_master_time = time.time()
+            return self._is_master
 
     @property
     def loadable_modules(self):
@@ -430,6 +509,42 @@ class Manager(TreeNode):
             if self._obj.add_save_manager(new_slave.object) != RTC.RTC_OK:
                 raise exceptions.FailedToAddSlaveManagerError(self.name, new_slave.name)
 
+    def _fetch_metadata(self):
+        # Retrieve all the metadata in parallel and store it in the caches.
+        def profiles(ps):
+            return [utils.nvlist_to_dict(p.properties) for p in ps]
+        fetches = [
+            ('_profile', lambda: utils.nvlist_to_dict(
+                self._obj.get_profile().properties)),
+            ('_configuration', lambda: utils.nvlist_to_dict(
+                self._obj.get_configuration())),
+            ('_factory_profiles', lambda: profiles(
+                self._obj.get_factory_profiles())),
+            ('_loadable_modules', lambda: profiles(
+                self._obj.get_loadable_modules())),
+            ('_loaded_modules', lambda: profiles(
+                self._obj.get_loaded_modules())),
+            ('_is_master', lambda: self._obj.is_master())]
+        results = utils.call_concurrently(lambda f: f[1](), fetches)
+        with self._mutex:
+            for (attr, fetch), (value, e) in zip(fetches, results):
+                if e:
+                    raise e
+            for (attr, fetch), (value, e) in zip(fetches, results):
+                setattr(self, attr, value)
+            self._metadata_time = time.time()
+            self._is_master_time = self._metadata_time
+
+    def _metadata(self):
+        # Get the cached metadata as a dictionary.
+        with self._mutex:
+            return {'profile': self._profile,
+                    'configuration': self._configuration,
+                    'factory_profiles': self._factory_profiles,
+                    'loadable_modules': self._loadable_modules,
+                    'loaded_modules': self._loaded_modules,
+                    'is_master': self._is_master}
+
     def _parse(self):
         # Nearly everything is delay-parsed when it is first accessed.
         with self._mutex:
@@ -441,16 +556,20 @@ class Manager(TreeNode):
             self._loaded_modules = None
             self._masters = None
             self._slaves = None
-            self._parse_children()
+            self._is_master = None
+            self._is_master_time = None
+            self._metadata_time = None
+        self._parse_children()
 
     def _parse_children(self):
         # Parses child managers and components.
-        with self._mutex:
-            self._parse_component_children()
-            self._parse_manager_children()
+        self._parse_component_children()
+        self._parse_manager_children()
 
     def _parse_component_children(self):
         # Parses the list returned by _obj.get_components into child nodes.
+        # Child components whose objects are still in the list are kept as
+        # they are, so only new components are asked for their profiles.
         with self._mutex:
             try:
                 comps = self._obj.get_components()
@@ -458,13 +577,39 @@ class Manager(TreeNode):
                 print('{0}: {1}'.format(os.path.basename(sys.argv[0]), e),
                         file=sys.stderr)
                 return
-            for c in comps:
-                # Get the instance profile - this will be the node's name
-                profile = c.get_component_profile()
-                instance_name = profile.instance_name
-                # Create and store the new leaf node
-                leaf = Component(instance_name + '.rtc', self, c)
-                self._add_child(leaf)
+            keys = [utils.object_key(c) for c in comps]
+            existing = dict([(utils.object_key(c.object), c) \
+                    for c in self._children.values() if c.is_component])
+            # Remove the children of components that have gone
+            current = set(keys)
+            dropped = []
+            for key, child in existing.items():
+                if key not in current:
+                    del self._children[child.name]
+                    InstanceNameCache().remove(child.object)
+                    dropped.append(child)
+            new = [c for c, k in zip(comps, keys) if k not in existing]
+            prefix = self._child_path_prefix()
+        # Build the nodes of the new components in parallel. Each node is
+        # given its path, so the worker threads do not lock this node or its
+        # parents, which the calling thread may hold.
+        def build(obj):
+            profile = obj.get_component_profile()
+            name = profile.instance_name + '.rtc'
+            return Component(name, self, obj, profile=profile,
+                    path=prefix + name)
+        results = utils.call_concurrently(build, new)
+        with self._mutex:
+            # Add the nodes in the order of the list from the manager
+            for leaf, e in results:
+                if not e:
+                    self._add_child(leaf)
+            self._components = None
+        for child in dropped:
+            child._discard()
+        for leaf, e in results:
+            if e:
+                raise e
 
     def _parse_manager_children(self):
         # Parses the list returned by _obj.get_slave_managers into child nodes.
@@ -474,26 +619,41 @@ class Manager(TreeNode):
             except CORBA.BAD_OPERATION:
                 # This manager does not support slave managers; ignore
                 return
-            index = 0
-            for m in mgrs:
-                # Add each slave manager as a child node.
-                try:
-                    props = utils.nvlist_to_dict(m.get_profile().properties)
-                except CORBA.TRANSIENT as e:
-                    if e.args[0] == TRANSIENT_ConnectFailed:
-                        print('{0}: Warning: zombie slave of '\
-                                'manager {1} found'.format(sys.argv[0],
-                                        self.name), file=sys.stderr)
-                        continue
-                    else:
-                        raise
-                if 'name' in props:
-                    name = props['name']
+            prefix = self._child_path_prefix()
+        # Get the profiles of all the slave managers in parallel
+        profiles = utils.call_concurrently(
+                lambda m: utils.nvlist_to_dict(m.get_profile().properties),
+                mgrs)
+        index = 0
+        slaves = []
+        for m, (props, e) in zip(mgrs, profiles):
+            if e:
+                if isinstance(e, CORBA.TRANSIENT) and \
+                        e.args[0] == TRANSIENT_ConnectFailed:
+                    print('{0}: Warning: zombie slave of '\
+                            'manager {1} found'.format(sys.argv[0],
+                                    self.name), file=sys.stderr)
+                    continue
                 else:
-                    name = 'slave{0}'.format(index)
-                    index += 1
-                leaf = Manager(name, self, m)
-                self._add_child(leaf)
+                    raise e
+            if 'name' in props:
+                name = props['name']
+            else:
+                name = 'slave{0}'.format(index)
+                index += 1
+            slaves.append((name, m))
+        # Build the nodes in parallel, as for components, then add them in
+        # the order of the list from the manager
+        results = utils.call_concurrently(
+                lambda s: Manager(s[0], self, s[1], path=prefix + s[0]),
+                slaves)
+        with self._mutex:
+            for leaf, e in results:
+                if not e:
+                    self._add_child(leaf)
+        for leaf, e in results:
+            if e:
+                raise e
 
     def _remove_master(self, master):
         # Remove a new master from this manager. A slave manager can have multiple
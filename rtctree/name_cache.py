@@ -0,0 +1,123 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Singleton caching the instance names of components.
+
+'''
+
+
+import threading
+import time
+
+from rtctree import utils
+from rtctree.options import Options
+
+
+_init_lock = threading.Lock()
+
+
+##############################################################################
+## Instance name cache object
+
+class InstanceNameCache(object):
+    '''Process-wide cache of component instance names.
+
+    Names are stored by the object reference of the component. Components
+    in a tree add their names when they parse their profiles, so looking up
+    a component that is in any tree in the process does not need a remote
+    call. Other components are asked for their profiles, concurrently.
+
+    Names are kept for the time given by the 'name_cache_ttl' option (in
+    seconds), after which they are retrieved again, so a component that is
+    replaced by another at the same reference is not given a stale name.
+
+    '''
+    def __new__(cls, *p, **k):
+        with _init_lock:
+            if not '_the_instance' in cls.__dict__:
+                cls._the_instance = object.__new__(cls)
+                cls._the_instance._names = {}
+                cls._the_instance._mutex = threading.RLock()
+        return cls._the_instance
+
+    def add(self, obj, name):
+        '''Store the instance name of a component.
+
+        @param obj The component's object reference.
+        @param name The component's instance name.
+
+        '''
+        key = utils.object_key(obj)
+        with self._mutex:
+            self._names[key] = (name, time.time())
+
+    def clear(self):
+        '''Remove all names from the cache.'''
+        with self._mutex:
+            self._names = {}
+
+    def get(self, obj):
+        '''Get the cached instance name of a component, or None.'''
+        key = utils.object_key(obj)
+        with self._mutex:
+            return self._get_cached(key)
+
+    def remove(self, obj):
+        '''Remove a component from the cache.'''
+        key = utils.object_key(obj)
+        with self._mutex:
+            if key in self._names:
+                del self._names[key]
+
+    def resolve(self, objs):
+        '''Get the instance names of a list of components.
+
+        Names that are not cached are retrieved from the components in
+        parallel and added to the cache.
+
+        @param objs A list of component object references.
+        @return The list of instance names, in the same order as @ref objs.
+
+        '''
+        keys = [utils.object_key(o) for o in objs]
+        with self._mutex:
+            names = [self._get_cached(k) for k in keys]
+        missing = [ii for ii, n in enumerate(names) if n is None]
+        results = utils.call_concurrently(
+                lambda ii: objs[ii].get_component_profile().instance_name,
+                missing)
+        for ii, (name, e) in zip(missing, results):
+            if e:
+                raise e
+            names[ii] = name
+        now = time.time()
+        with self._mutex:
+            for ii in missing:
+                self._names[keys[ii]] = (names[ii], now)
+        return names
+
+    def _get_cached(self, key):
+        # Get a cached name, or None if it is not cached or has expired.
+        if key not in self._names:
+            return None
+        name, cached_at = self._names[key]
+        if time.time() - cached_at >= \
+                Options().get_option('name_cache_ttl'):
+            del self._names[key]
+            return None
+        return name
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -18,11 +18,57 @@ Object representing a name server node in the tree.
 '''
 
 
+import threading
+import time
+
 import CosNaming
 from omniORB import CORBA, TRANSIENT_ConnectFailed
 
 from rtctree import exceptions
+from rtctree import instrument
+from rtctree import tracing
+from rtctree import utils
 from rtctree.directory import Directory
+from rtctree.options import Options
+from rtctree.sweeper import probe
+
+
+##############################################################################
+## Root context cache
+
+## The name service objects and root naming contexts of all name servers
+## connected to in this process, by (id(ORB), full address). Shared by all
+## trees so that each name server is only resolved once.
+_root_contexts = {}
+_root_contexts_lock = threading.Lock()
+## Locks serialising connection to each name server, by the same key.
+_connect_locks = {}
+
+
+def _connect_lock(key):
+    with _root_contexts_lock:
+        if key not in _connect_locks:
+            _connect_locks[key] = threading.Lock()
+        return _connect_locks[key]
+
+
+def _cached_root_context(key):
+    with _root_contexts_lock:
+        return _root_contexts.get(key, (None, None))
+
+
+def clear_root_contexts(orb=None):
+    '''Forget cached root naming contexts.
+
+    Name servers connected to after this will be resolved again.
+
+    @param orb If not None, only forget the contexts obtained using this ORB.
+
+    '''
+    with _root_contexts_lock:
+        for key in list(_root_contexts.keys()):
+            if orb is None or key[0] == id(orb):
+                del _root_contexts[key]
 
 
 ##############################################################################
@@ -53,6 +99,51 @@ class NameServer(Directory):
                 filter=filter, *args, **kwargs)
         self._parse_server(address, orb, filter)
 
+    def reconnect(self, force=False):
+        '''Reconnect to the name server if the connection is stale.
+
+        The root naming context is checked with a short timeout. If it no
+        longer exists or cannot be reached, for example because the name
+        server was restarted, it is resolved again, retrying with an
+        increasing delay, and the contents of the name server are reparsed.
+        The new root context is shared with other trees in the process.
+
+        @param force Reconnect even if the root context seems to be alive.
+        @return True if the name server was reconnected to.
+        @raises InvalidServiceError
+
+        '''
+        with self._mutex:
+            if not self._refresh_root_context(force):
+                return False
+            super(NameServer, self).reparse()
+            return True
+
+    def relist(self, recursive=True):
+        '''Update the children of this name server from its root context.
+
+        See Directory.relist(). If the root context is stale, it is
+        resolved again first. See reconnect().
+
+        '''
+        try:
+            return super(NameServer, self).relist(recursive)
+        except (CORBA.TRANSIENT, CORBA.COMM_FAILURE, CORBA.OBJECT_NOT_EXIST):
+            if not self._refresh_root_context():
+                raise
+            return super(NameServer, self).relist(recursive)
+
+    def reparse(self):
+        '''Reparse all children of this name server.
+
+        The connection to the name server is checked first and remade if it
+        is stale. See reconnect().
+
+        '''
+        with self._mutex:
+            self._refresh_root_context()
+            super(NameServer, self).reparse()
+
     @property
     def is_nameserver(self):
         '''Is this node a name server (specialisation of directory nodes)?'''
@@ -72,11 +163,25 @@ class NameServer(Directory):
 
     def _parse_server(self, address, orb, filter=[]):
         # Parse the name server.
-        with self._mutex:
-            self._address = address
-            self._orb = orb
-            root_context = self._connect_to_naming_service(address)
-            self._parse_context(root_context, orb, filter)
+        filter = utils.compile_filter(filter)
+        with tracing.span('NameServer.parse_server', node=self,
+                operation='list', address=address) as span:
+            with self._mutex:
+                self._address = address
+                self._orb = orb
+                root_context = self._connect_to_naming_service(address)
+                if span:
+                    span.set_attribute('endpoint', instrument.ior_endpoint(
+                        utils.object_key(root_context)))
+                try:
+                    self._parse_context(root_context, orb, filter)
+                except (CORBA.TRANSIENT, CORBA.COMM_FAILURE,
+                        CORBA.OBJECT_NOT_EXIST):
+                    # The cached root context may be stale
+                    if not self._refresh_root_context():
+                        raise
+                    self._remove_all_children()
+                    self._parse_context(self._context, orb, filter)
 
     @staticmethod
     def _parse_address(address):
@@ -102,15 +207,72 @@ class NameServer(Directory):
         return 'corbaloc::{0}/NameService'.format(address)
 
     def _connect_to_naming_service(self, address):
-        # Try to connect to a name server and get the root naming context.
+        # Get the root naming context of a name server, reusing a context
+        # already resolved in this process if there is one.
         with self._mutex:
             self._full_address = self._parse_address(address)
+            key = (id(self._orb), self._full_address)
+            with _connect_lock(key):
+                ns_obj, root_context = _cached_root_context(key)
+                if not root_context:
+                    ns_obj, root_context = self._resolve_root_context(address)
+                    with _root_contexts_lock:
+                        _root_contexts[key] = (ns_obj, root_context)
+            self._ns_obj = ns_obj
+            return root_context
+
+    def _refresh_root_context(self, force=False):
+        # Resolve the root context again if it is stale, retrying with
+        # backoff. Returns True if the context was replaced.
+        with self._mutex:
+            timeout = Options().get_option('ns_probe_timeout')
+            if not force and probe(self._context, timeout):
+                return False
+            key = (id(self._orb), self._full_address)
+            with _connect_lock(key):
+                ns_obj, root_context = _cached_root_context(key)
+                if root_context is not None and \
+                        not root_context._is_equivalent(self._context) and \
+                        probe(root_context, timeout):
+                    # Another node has already reconnected
+                    pass
+                else:
+                    ns_obj, root_context = self._resolve_with_backoff(
+                            timeout)
+                    with _root_contexts_lock:
+                        _root_contexts[key] = (ns_obj, root_context)
+            self._ns_obj = ns_obj
+            self._context = instrument.wrap(root_context, self._call_stats)
+            return True
+
+    def _resolve_with_backoff(self, timeout):
+        # Resolve the root context until it can be reached or the attempts
+        # run out.
+        delay = Options().get_option('ns_reconnect_backoff')
+        attempts = Options().get_option('ns_reconnect_attempts')
+        for ii in range(attempts):
+            if ii > 0:
+                time.sleep(delay)
+                delay *= 2
             try:
-                self._ns_obj = self._orb.string_to_object(self._full_address)
+                ns_obj, root_context = self._resolve_root_context(
+                        self._address)
+            except (exceptions.InvalidServiceError, CORBA.TRANSIENT,
+                    CORBA.COMM_FAILURE, CORBA.OBJECT_NOT_EXIST):
+                continue
+            if probe(root_context, timeout):
+                return ns_obj, root_context
+        raise exceptions.InvalidServiceError(self._address)
+
+    def _resolve_root_context(self, address):
+        # Connect to a name server and get the root naming context.
+        with self._mutex:
+            try:
+                ns_obj = self._orb.string_to_object(self._full_address)
             except CORBA.ORB.InvalidName:
                 raise exceptions.InvalidServiceError(address)
             try:
-                root_context = self._ns_obj._narrow(CosNaming.NamingContext)
+                root_context = ns_obj._narrow(CosNaming.NamingContext)
             except CORBA.TRANSIENT as e:
                 if e.args[0] == TRANSIENT_ConnectFailed:
                     raise exceptions.InvalidServiceError(address)
@@ -118,7 +280,7 @@ class NameServer(Directory):
                     raise
             if CORBA.is_nil(root_context):
                 raise exceptions.FailedToNarrowRootNamingError(address)
-            return root_context
+            return ns_obj, root_context
 
 
 # vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
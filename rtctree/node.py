@@ -34,7 +34,7 @@ class TreeNode(object):
 
     '''
     def __init__(self, name=None, parent=None, children=None, filter=[],
-            dynamic=False, *args, **kwargs):
+            dynamic=False, path=None, call_stats=None, *args, **kwargs):
         '''Constructor.
 
         @param name Name of this node (i.e. its entry in the path).
@@ -43,6 +43,13 @@ class TreeNode(object):
         @param filter A list of paths to filter by.
         @param dynamic Enable dynamic features such as observers on this node
                        and any children it creates.
+        @param path The full path of this node as a string, if it is already
+                    known. Nodes built in parallel are given their paths, so
+                    that they do not need to lock their parents, which may be
+                    held by the thread building them.
+        @param call_stats The rtctree.instrument.CallStats object to record
+                          the remote calls made by this node and its children
+                          in. If None, the parent's is used.
 
         Example:
         >>> c1 = TreeNode(name='c1')
@@ -57,11 +64,16 @@ class TreeNode(object):
         self._mutex = threading.RLock()
         self._name = name
         self._parent = parent
+        self._path_str = path
+        if call_stats is None and parent is not None:
+            call_stats = parent._call_stats
+        self._call_stats = call_stats
         if children:
             self._children = children
         else:
             self._children = {}
         self._cbs = {}
+        self._listeners = {}
         self._dynamic = dynamic
         if dynamic:
             self._enable_dynamic(dynamic)
@@ -89,9 +101,12 @@ class TreeNode(object):
         relevant information for the event, and cb_args are the arguments you
         registered with the callback.
 
+        Only one callback can be added for each event; adding another replaces
+        it.
+
         '''
         if event not in self._cbs:
-            raise exceptions.NoSuchEventError
+            raise exceptions.NoSuchEventError(self.name, event)
         self._cbs[event] = [(cb, args)]
 
     def get_node(self, path):
@@ -227,7 +242,7 @@ class TreeNode(object):
         '''
         if event not in self._cbs:
             raise exceptions.NoSuchEventError(self.name, event)
-        c = [(x[0], x[1]) for x in self._cbs[event]]
+        c = [(x[0], x[1]) for x in self._cbs[event] if x[0] == cb]
         if not c:
             raise exceptions.NoCBError(self.name, event, cb)
         self._cbs[event].remove(c[0])
@@ -381,6 +396,7 @@ class TreeNode(object):
                 # Make sure to unlink the tree as well
                 self._parent.remove_child(self)
             self._parent = new_parent
+            self._path_str = None
 
     @property
     def parent_name(self):
@@ -405,22 +421,75 @@ class TreeNode(object):
         with self._mutex:
             self._children[new_child._name] = new_child
 
+    def _add_listener(self, event, cb, args=None):
+        # Add a callback used within rtctree, such as by a DataflowGraph, for
+        # an event. Any number of listeners can be added, and they do not
+        # replace the callback added with add_callback().
+        if event not in self._cbs:
+            raise exceptions.NoSuchEventError(self.name, event)
+        with self._mutex:
+            self._listeners[event] = self._listeners.get(event, []) + \
+                    [(cb, args)]
+
     def _call_cb(self, event, value):
         if event not in self._cbs:
             raise exceptions.NoSuchEventError(self.name, event)
         for (cb, args) in self._cbs[event]:
             cb(self, value, args)
+        for (cb, args) in self._listeners.get(event, []):
+            cb(self, value, args)
+
+    def _call_tree_cb(self, event, value):
+        # Call the callbacks for a change below this node on this node, if it
+        # has the event, and on the root node of the tree.
+        if event in self._cbs:
+            self._call_cb(event, value)
+        root = self.root
+        if root is not self and event in root._cbs:
+            root._call_cb(event, value)
+
+    def _child_path_prefix(self):
+        # Get the string that the full paths of the children of this node start
+        # with. The path given when this node was built is used if there is
+        # one, so the parents of this node are not locked.
+        with self._mutex:
+            if self._path_str is not None:
+                path = self._path_str
+            else:
+                path = self.full_path_str
+            if self._name == '/':
+                return path
+            elif self._name.find('/') < 0:
+                return path + '/'
+            else:
+                return path + '#'
+
+    def _discard(self):
+        # Release the remote resources, such as observers, held by this node
+        # and its children when it is removed from the tree. Errors are
+        # ignored, as the remote objects may be gone.
+        with self._mutex:
+            children = list(self._children.values())
+        for c in children:
+            c._discard()
 
     def _enable_dynamic(self, enable=True):
         # Enable or disable dynamic features.
         # By default, do nothing.
         pass
 
+    def _rem_listener(self, event, cb):
+        # Remove a callback added with _add_listener(), if it is there.
+        with self._mutex:
+            self._listeners[event] = [l for l in \
+                    self._listeners.get(event, []) if l[0] != cb]
+
     def _remove_all_children(self):
         # Remove all children from this node.
         self._children = {}
 
     def _set_events(self, events):
+        self._listeners = {}
         self._cbs = {}
         for e in events:
             self._cbs[e] = []
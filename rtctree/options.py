@@ -23,6 +23,99 @@ import sys
 from rtctree import exceptions
 
 
+##############################################################################
+## ORB tuning
+
+## The ORB tuning options and the omniORB parameters each one sets.
+##
+## - orb_call_timeout: Time, in milliseconds, to wait for a remote call to
+##   complete before it fails.
+## - orb_connect_timeout: Time, in milliseconds, to wait for a connection to
+##   a remote object to be made before calls on it fail.
+## - orb_max_connections_per_server: The maximum number of GIOP connections
+##   to open to each server. More connections allow more concurrent calls.
+## - orb_thread_pool: If True, incoming calls are handled by a thread pool
+##   rather than a thread per connection.
+## - orb_max_threads: The maximum number of threads in the thread pool.
+## - orb_scan_granularity: How often, in seconds, connections are scanned
+##   for being idle or timed out.
+## - orb_idle_close_period: Time, in seconds, after which idle connections
+##   are closed.
+ORB_TUNING_PARAMS = {
+        'orb_call_timeout': ['clientCallTimeOutPeriod'],
+        'orb_connect_timeout': ['clientConnectTimeOutPeriod'],
+        'orb_max_connections_per_server': ['maxGIOPConnectionPerServer'],
+        'orb_thread_pool': ['threadPerConnectionPolicy'],
+        'orb_max_threads': ['maxServerThreadPoolSize'],
+        'orb_scan_granularity': ['scanGranularity'],
+        'orb_idle_close_period': ['outConScanPeriod', 'inConScanPeriod'],
+        }
+
+## Named sets of ORB tuning option values.
+##
+## - high_throughput: Many concurrent connections per server and a thread
+##   pool, for tools that make many parallel calls (e.g. using the bulk
+##   operations of RTCTree).
+## - fast_fail: Short timeouts, so that unreachable objects are found quickly
+##   when discovering large systems.
+ORB_TUNING_PRESETS = {
+        'high_throughput': {'orb_max_connections_per_server': 16,
+                            'orb_thread_pool': True,
+                            'orb_max_threads': 64,
+                            'orb_call_timeout': 10000,
+                            'orb_connect_timeout': 3000,
+                            'orb_scan_granularity': 1,
+                            'orb_idle_close_period': 60},
+        'fast_fail': {'orb_call_timeout': 3000,
+                      'orb_connect_timeout': 1000,
+                      'orb_scan_granularity': 1},
+        }
+
+
+def orb_tuning_args(tuning=None):
+    '''Get the arguments to pass to the ORB to apply tuning options.
+
+    The values of the ORB tuning options are taken from the Options object,
+    overridden by @ref tuning. Options with a value of None are left at the
+    ORB's default.
+
+    @param tuning A dictionary of ORB tuning option values, or the name of one
+                  of the presets in ORB_TUNING_PRESETS.
+    @return A list of ORB arguments.
+    @raises NoSuchOptionError
+
+    Example:
+    >>> orb_tuning_args({'orb_call_timeout': 2000})
+    ['-ORBclientCallTimeOutPeriod', '2000']
+    >>> orb_tuning_args({'orb_thread_pool': True})
+    ['-ORBthreadPerConnectionPolicy', '0']
+
+    '''
+    if tuning is None:
+        tuning = {}
+    elif type(tuning) is str:
+        if tuning not in ORB_TUNING_PRESETS:
+            raise exceptions.NoSuchOptionError(tuning)
+        tuning = ORB_TUNING_PRESETS[tuning]
+    for opt in tuning:
+        if opt not in ORB_TUNING_PARAMS:
+            raise exceptions.NoSuchOptionError(opt)
+    args = []
+    for opt in sorted(ORB_TUNING_PARAMS.keys()):
+        if opt in tuning:
+            value = tuning[opt]
+        else:
+            value = Options().get_option(opt)
+        if value is None:
+            continue
+        if opt == 'orb_thread_pool':
+            # The ORB parameter is the opposite of the option
+            value = 0 if value else 1
+        for param in ORB_TUNING_PARAMS[opt]:
+            args += ['-ORB' + param, str(value)]
+    return args
+
+
 ##############################################################################
 ## Options object
 
@@ -33,7 +126,24 @@ class Options(object):
         return cls._the_instance
 
     def init_options(self):
-        self.options = {'max_bindings': 100}
+        self.options = {'max_bindings': 100,
+                        'max_workers': 16,
+                        'ec_cache_ttl': 1.0,
+                        'sweep_interval': 5.0,
+                        'sweep_timeout': 1000,
+                        'ns_probe_timeout': 1000,
+                        'ns_reconnect_attempts': 5,
+                        'ns_reconnect_backoff': 0.1,
+                        'watch_min_interval': 1.0,
+                        'watch_max_interval': 30.0,
+                        'manager_metadata_ttl': 10.0,
+                        'name_cache_ttl': 60.0,
+                        'log_buffer_size': 10000,
+                        'log_batch_size': 100,
+                        'log_flush_interval': 0.1,
+                        'log_reorder_window': 0.5}
+        for opt in ORB_TUNING_PARAMS:
+            self.options[opt] = None
 
     def set_option(self, option, value):
         if not hasattr(self, 'options'):
@@ -19,9 +19,145 @@ etc.
 '''
 
 
+import functools
+
 from rtctree import exceptions
 
 
+## The number of parsed path strings to remember.
+PARSE_CACHE_SIZE = 4096
+
+
+##############################################################################
+## Path object
+
+class Path(object):
+    '''An immutable, hashable path to a node or port in the tree.
+
+    A Path holds the same information as the result of parse_path(): the
+    directory parts and an optional port name. Its string form and parent
+    are calculated once and kept.
+
+    Examples:
+
+    >>> p = Path.parse('/localhost/manager/comp0.rtc:in')
+    >>> p.parts
+    ('/', 'localhost', 'manager', 'comp0.rtc')
+    >>> p.port
+    'in'
+    >>> str(p)
+    '/localhost/manager/comp0.rtc:in'
+    >>> p.parent
+    Path('/localhost/manager/comp0.rtc')
+    >>> p.parent.parent
+    Path('/localhost/manager')
+    >>> p.name
+    'comp0.rtc'
+    >>> p == Path(['/', 'localhost', 'manager', 'comp0.rtc'], 'in')
+    True
+    >>> Path.parse('/localhost/manager/comp0.rtc:in') is p
+    True
+    >>> Path(['/']).parent is None
+    True
+
+    '''
+    __slots__ = ('_parts', '_port', '_str', '_parent')
+
+    def __init__(self, parts, port=None):
+        '''Constructor.
+
+        @param parts The directory parts of the path, as a list or tuple of
+                     strings. An absolute path starts with '/'.
+        @param port The name of the port, or None.
+
+        '''
+        self._parts = tuple(parts)
+        self._port = port
+        self._str = None
+        self._parent = None
+
+    @classmethod
+    def parse(cls, path):
+        '''Parse a path string into a Path. Results are cached.
+
+        @raises BadPathError
+
+        '''
+        return _parse_path_object(path)
+
+    def __eq__(self, other):
+        if not isinstance(other, Path):
+            return NotImplemented
+        return self._parts == other._parts and self._port == other._port
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __hash__(self):
+        return hash((self._parts, self._port))
+
+    def __getitem__(self, index):
+        return self._parts[index]
+
+    def __iter__(self):
+        return iter(self._parts)
+
+    def __len__(self):
+        return len(self._parts)
+
+    def __repr__(self):
+        return 'Path({0!r})'.format(str(self))
+
+    def __str__(self):
+        if self._str is None:
+            self._str = format_path((list(self._parts), self._port))
+        return self._str
+
+    def child(self, name):
+        '''Get the path of a child of the node this path points to.'''
+        return Path(self._parts + (name,))
+
+    @property
+    def is_absolute(self):
+        '''Does this path start at the root of the tree?'''
+        return bool(self._parts) and self._parts[0] == '/'
+
+    @property
+    def name(self):
+        '''The last directory part of the path.'''
+        return self._parts[-1]
+
+    @property
+    def parent(self):
+        '''The path of the parent of the node this path points to, or None.
+
+        The parent of a path to a port is the path to the port's owner.
+
+        '''
+        if self._port is not None:
+            if self._parent is None:
+                self._parent = Path(self._parts)
+            return self._parent
+        if len(self._parts) <= 1:
+            return None
+        if self._parent is None:
+            self._parent = Path(self._parts[:-1])
+        return self._parent
+
+    @property
+    def parts(self):
+        '''The directory parts of the path, as a tuple.'''
+        return self._parts
+
+    @property
+    def port(self):
+        '''The name of the port the path points to, or None.'''
+        return self._port
+
+
 ##############################################################################
 ## API functions
 
@@ -64,6 +200,14 @@ def parse_path(path):
     (['comp0.rtc'], None)
 
     '''
+    # The cached result is shared, so return a copy of the parts
+    parts, port = _parse_path(path)
+    return list(parts), port
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_path(path):
+    # Parse a path string into a tuple of parts and the port.
     if path.find("#") < 0:
         bits = path.lstrip('/').split('/')
     else:
@@ -90,7 +234,12 @@ def parse_path(path):
         condensed_bits.append(bit)
     if not condensed_bits:
         condensed_bits = ['/']
-    return condensed_bits, port
+    return tuple(condensed_bits), port
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_path_object(path):
+    return Path(*_parse_path(path))
 
 
 def get_port(path):
@@ -130,6 +279,8 @@ def format_path(path):
     'comp0.rtc'
 
     '''
+    if isinstance(path, Path):
+        return str(path)
     if path[1]:
         port = ':' + path[1]
     else:
@@ -26,6 +26,8 @@ create the correct type of port object automatically.
 import threading
 
 from rtctree import exceptions
+from rtctree import instrument
+from rtctree import tracing
 from rtctree import utils
 from rtctree.rtc import RTC
 
@@ -56,6 +58,50 @@ def parse_port(port_obj, owner):
         return Port(port_obj, owner)
 
 
+def parse_capabilities(properties):
+    '''Parse the properties of a port into sets of values.
+
+    Every property the port advertises is a capability: a comma-separated
+    list of the values the port supports. If the list contains 'any', the
+    port accepts any value, and @ref ANY is used in place of the set. A
+    property whose value is not a string only accepts that value, unless it
+    is a sequence, which is not checked.
+
+    @param properties The port's properties dictionary.
+    @return A dictionary of property names to frozensets of values or ANY.
+
+    Example:
+    >>> caps = parse_capabilities({'dataport.dataflow_type': 'push, pull',
+    ...                            'dataport.subscription_type': 'Any',
+    ...                            'port.port_type': 'DataInPort'})
+    >>> sorted(caps['dataport.dataflow_type'])
+    ['pull', 'push']
+    >>> caps['dataport.subscription_type'] is ANY
+    True
+    >>> sorted(caps['port.port_type'])
+    ['DataInPort']
+
+    '''
+    result = {}
+    for prop in properties:
+        value = properties[prop]
+        if type(value) is not str:
+            try:
+                result[prop] = frozenset([value])
+            except TypeError:
+                # Sequences and other unhashable values are not checked
+                pass
+        elif 'any' in value.lower():
+            result[prop] = ANY
+        else:
+            result[prop] = frozenset([x.strip() for x in value.split(',')])
+    return result
+
+
+## Capability value indicating that a port accepts any value for a property.
+ANY = object()
+
+
 ##############################################################################
 ## Base port object
 
@@ -74,7 +120,8 @@ class Port(object):
 
         '''
         super(Port, self).__init__(*args, **kwargs)
-        self._obj = port_obj
+        self._obj = instrument.wrap(port_obj,
+                owner._call_stats if owner else None)
         self._connections = None
         self._owner = owner
         self._mutex = threading.RLock()
@@ -98,24 +145,18 @@ class Port(object):
         '''
         with self._mutex:
             if self.porttype == 'DataInPort' or self.porttype == 'DataOutPort':
-                for prop in props:
-                    if prop in self.properties:
-                        if props[prop] not in [x.strip() for x in self.properties[prop].split(',')] and \
-                                'any' not in self.properties[prop].lower():
-                            # Invalid property selected
-                            raise exceptions.IncompatibleDataPortConnectionPropsError
-                    for d in dests:
-                        if prop in d.properties:
-                            if props[prop] not in [x.strip() for x in d.properties[prop].split(',')] and \
-                                    'any' not in d.properties[prop].lower():
-                                # Invalid property selected
-                                raise exceptions.IncompatibleDataPortConnectionPropsError
+                for d in dests:
+                    if not self.is_compatible(d, props):
+                        # Invalid property selected
+                        raise exceptions.IncompatibleDataPortConnectionPropsError
             if not name:
                 name = self.name + '_'.join([d.name for d in dests])
             props = utils.dict_to_nvlist(props)
             profile = RTC.ConnectorProfile(name, id,
                     [self._obj] + [d._obj for d in dests], props)
-            return_code, profile = self._obj.connect(profile)
+            with tracing.span('Port.connect', obj=self._obj,
+                    operation='connect', port=self.name, connection=name):
+                return_code, profile = self._obj.connect(profile)
             if return_code != RTC.RTC_OK:
                 raise exceptions.FailedToConnectError(return_code)
             self.reparse_connections()
@@ -124,10 +165,12 @@ class Port(object):
 
     def disconnect_all(self):
         '''Disconnect all connections to this port.'''
-        with self._mutex:
-            for conn in self.connections:
-                self.object.disconnect(conn.id)
-            self.reparse_connections()
+        with tracing.span('Port.disconnect_all', obj=self._obj,
+                operation='disconnect', port=self.name):
+            with self._mutex:
+                for conn in self.connections:
+                    self.object.disconnect(conn.id)
+                self.reparse_connections()
 
     def get_connection_by_dest(self, dest):
         '''DEPRECATED. Search for a connection between this and another port.'''
@@ -178,6 +221,20 @@ class Port(object):
                     return conn
             return None
 
+    def is_compatible(self, other, props):
+        '''Check if connection properties are acceptable to two ports.
+
+        Each property in @ref props that a port also advertises must have
+        one of the values that port lists, unless the port accepts any value
+        for it. No remote calls are made.
+
+        @param other The other Port object of the connection.
+        @param props The connection properties to check, as a dictionary.
+        @return True if both ports accept the properties, False otherwise.
+
+        '''
+        return self._accepts(props) and other._accepts(props)
+
     def reparse(self):
         '''Reparse the port.'''
         self._parse()
@@ -245,12 +302,24 @@ class Port(object):
         with self._mutex:
             return self._properties
 
+    def _accepts(self, props):
+        # Check if the port's capabilities allow the connection properties.
+        with self._mutex:
+            for prop in props:
+                if prop not in self._capabilities:
+                    continue
+                values = self._capabilities[prop]
+                if values is not ANY and props[prop] not in values:
+                    return False
+            return True
+
     def _parse(self):
         # Parse the PortService object to build a port profile.
         with self._mutex:
             profile = self._obj.get_port_profile()
             self._name = profile.name
             self._properties = utils.nvlist_to_dict(profile.properties)
+            self._capabilities = parse_capabilities(self._properties)
             if self.owner:
                 prefix = self.owner.instance_name + '.'
                 if self._name.startswith(prefix):
@@ -0,0 +1,877 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Compact binary snapshots of a tree.
+
+A snapshot holds the nodes of a tree with the information parsed from the
+remote objects: component profiles, ports, connections, execution contexts
+and the component's state in each, configuration sets, manager profiles and
+the stringified IORs of the objects. It can be written to a file and read
+back in another process, giving a tree that can be browsed without any
+network access.
+
+The format is a header followed by one record per node, depth first. Each
+record holds the node's kind, its name, a dictionary of its information and
+the number of its children. Strings are interned: each distinct string is
+written once and referred to by its index after that. Records are written
+and read one at a time, so a snapshot can be streamed.
+
+Nodes read from a snapshot are instances of subclasses of the normal node
+classes. Their information can be read as usual, but operations that need
+the remote object raise SnapshotError.
+
+'''
+
+
+import struct
+import threading
+import time
+
+from rtctree import exceptions
+from rtctree import ports
+from rtctree import utils
+from rtctree.component import Component
+from rtctree.config_set import ConfigurationSet
+from rtctree.directory import Directory
+from rtctree.exec_context import ExecutionContext
+from rtctree.manager import Manager
+from rtctree.nameserver import NameServer
+from rtctree.node import TreeNode
+from rtctree.unknown import Unknown
+from rtctree.zombie import Zombie
+
+
+## Bytes at the start of every snapshot.
+MAGIC = b'RTCTSNAP'
+## Version of the snapshot format.
+VERSION = 1
+
+# Node kinds
+_ROOT = 0
+_NAMESERVER = 1
+_DIRECTORY = 2
+_MANAGER = 3
+_COMPONENT = 4
+_ZOMBIE = 5
+_UNKNOWN = 6
+
+# Value types
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_BYTES = 6
+_LIST = 7
+_DICT = 8
+
+
+##############################################################################
+## API functions
+
+def dump(node, f):
+    '''Write a snapshot of a node and everything below it to a file.
+
+    @param node The node to write. If it is not the root node, the nodes
+                above it are written too, without their other children, so
+                that paths are the same when the snapshot is read.
+    @param f A file object opened for writing bytes.
+
+    '''
+    SnapshotWriter(f).write(node)
+
+
+def load(f):
+    '''Read a snapshot from a file.
+
+    @param f A file object opened for reading bytes.
+    @return The root node of the tree read from the snapshot.
+    @raises BadSnapshotError
+
+    '''
+    return SnapshotReader(f).read()
+
+
+##############################################################################
+## Writer
+
+def _ior(obj):
+    if obj is None:
+        return None
+    return utils.object_key(obj)
+
+
+def _kind(node):
+    if node.is_nameserver:
+        return _NAMESERVER
+    elif node.is_manager:
+        return _MANAGER
+    elif node.is_component:
+        return _COMPONENT
+    elif node.is_zombie:
+        return _ZOMBIE
+    elif node.is_unknown:
+        return _UNKNOWN
+    elif node.parent is None:
+        return _ROOT
+    return _DIRECTORY
+
+
+def _ec_info(ec):
+    return {'ior': _ior(ec._obj), 'handle': ec.handle, 'kind': ec.kind,
+            'rate': ec.rate, 'running': ec.running, 'owner': ec.owner_name,
+            'participants': ec.participant_names,
+            'properties': ec.properties}
+
+
+def _port_info(port):
+    info = {'ior': _ior(port.object), 'name': port.name,
+            'type': port.porttype, 'properties': port.properties,
+            'connections': [{'id': c.id, 'name': c.name,
+                'properties': c.properties,
+                'ports': [_ior(p) for p in c._obj.ports]} \
+                        for c in port.connections],
+            'interfaces': []}
+    if port.porttype == 'CorbaPort':
+        info['interfaces'] = [{'instance_name': i.instance_name,
+            'type_name': i.type_name, 'polarity': i.polarity} \
+                    for i in port.interfaces]
+    return info
+
+
+def _component_info(comp):
+    return {'ior': _ior(comp.object),
+            'instance_name': comp.instance_name,
+            'type_name': comp.type_name,
+            'description': comp.description,
+            'version': comp.version,
+            'vendor': comp.vendor,
+            'category': comp.category,
+            'parent_object': comp.parent_object,
+            'properties': comp.properties,
+            'owned_ecs': [_ec_info(ec) for ec in comp.owned_ecs],
+            'owned_ec_states': comp.owned_ec_states,
+            'participating_ecs': [_ec_info(ec) for ec in \
+                    comp.participating_ecs],
+            'participating_ec_states': comp.participating_ec_states,
+            'ports': [_port_info(p) for p in comp.ports],
+            'conf_sets': [{'name': name, 'description': cs.description,
+                'data': cs.data} for name, cs in \
+                        sorted(comp.conf_sets.items())],
+            'active_conf_set': comp.active_conf_set_name,
+            'is_composite': comp.is_composite,
+            'is_composite_member': comp.is_composite_member}
+
+
+def _manager_info(mgr):
+    return {'ior': _ior(mgr.object),
+            'profile': mgr.profile,
+            'configuration': mgr.configuration,
+            'is_master': mgr.is_master,
+            'factory_profiles': mgr.factory_profiles,
+            'loadable_modules': mgr.loadable_modules,
+            'loaded_modules': mgr.loaded_modules}
+
+
+def _node_info(node):
+    # Get the information to write for a node. This makes remote calls.
+    kind = _kind(node)
+    if kind == _COMPONENT:
+        return _component_info(node)
+    elif kind == _MANAGER:
+        return _manager_info(node)
+    elif kind == _NAMESERVER or kind == _DIRECTORY:
+        return {'ior': _ior(getattr(node, '_context', None))}
+    elif kind == _UNKNOWN:
+        return {'ior': _ior(node.object)}
+    return {}
+
+
+class SnapshotWriter(object):
+    '''Writes snapshots to a file.
+
+    Each node is written as soon as its information has been collected. The
+    information of the children of each node is collected in parallel.
+
+    '''
+    def __init__(self, f):
+        '''Constructor. Writes the snapshot header.
+
+        @param f A file object opened for writing bytes.
+
+        '''
+        self._f = f
+        self._strings = {}
+        self._buf = bytearray()
+        self._f.write(MAGIC + struct.pack('<H', VERSION))
+
+    def write(self, node):
+        '''Write a node and everything below it.
+
+        See dump().
+
+        '''
+        ancestors = []
+        parent = node.parent
+        while parent:
+            ancestors.insert(0, parent)
+            parent = parent.parent
+        for a in ancestors:
+            self._write_record(a, _node_info(a), 1)
+        self._write_record(node, _node_info(node), len(node.children))
+        self._write_children(node)
+
+    def _write_children(self, node):
+        children = sorted(node.children, key=lambda n: n.name)
+        for child, (info, e) in zip(children,
+                utils.call_concurrently(_node_info, children)):
+            if e:
+                raise e
+            self._write_record(child, info, len(child.children))
+            self._write_children(child)
+
+    def _write_record(self, node, info, num_children):
+        self._varint(_kind(node))
+        self._str(node.name)
+        self._value(info)
+        self._varint(num_children)
+        self._f.write(bytes(self._buf))
+        self._buf = bytearray()
+
+    def _str(self, s):
+        index = self._strings.get(s)
+        if index is not None:
+            self._varint(index + 1)
+            return
+        self._strings[s] = len(self._strings)
+        data = s.encode('utf-8')
+        self._varint(0)
+        self._varint(len(data))
+        self._buf += data
+
+    def _value(self, v):
+        if v is None:
+            self._buf.append(_NONE)
+        elif v is True:
+            self._buf.append(_TRUE)
+        elif v is False:
+            self._buf.append(_FALSE)
+        elif isinstance(v, int):
+            self._buf.append(_INT)
+            # Zig-zag encode so small negative numbers stay small
+            self._varint(v * 2 if v >= 0 else -v * 2 - 1)
+        elif isinstance(v, float):
+            self._buf.append(_FLOAT)
+            self._buf += struct.pack('<d', v)
+        elif isinstance(v, bytes):
+            self._buf.append(_BYTES)
+            self._varint(len(v))
+            self._buf += v
+        elif isinstance(v, (list, tuple)):
+            self._buf.append(_LIST)
+            self._varint(len(v))
+            for item in v:
+                self._value(item)
+        elif isinstance(v, dict):
+            self._buf.append(_DICT)
+            self._varint(len(v))
+            for key in sorted(v.keys(), key=str):
+                self._str(str(key))
+                self._value(v[key])
+        else:
+            # Strings, and anything else as a string
+            self._buf.append(_STR)
+            self._str(str(v))
+
+    def _varint(self, n):
+        while n >= 0x80:
+            self._buf.append((n & 0x7f) | 0x80)
+            n >>= 7
+        self._buf.append(n)
+
+
+##############################################################################
+## Reader
+
+class SnapshotReader(object):
+    '''Reads snapshots from a file.'''
+    def __init__(self, f):
+        '''Constructor. Reads and checks the snapshot header.
+
+        @param f A file object opened for reading bytes.
+        @raises BadSnapshotError
+
+        '''
+        self._f = f
+        self._strings = []
+        # Ports by IOR, used to find the ports of connections
+        self._ports = {}
+        self._root = None
+        header = self._read(len(MAGIC) + 2)
+        if header[:len(MAGIC)] != MAGIC:
+            raise exceptions.BadSnapshotError('not a snapshot')
+        version = struct.unpack('<H', header[len(MAGIC):])[0]
+        if version != VERSION:
+            raise exceptions.BadSnapshotError(
+                    'unsupported version {0}'.format(version))
+
+    def nodes(self):
+        '''Read the nodes of the snapshot one at a time.
+
+        Each node is added to its parent before it is given. The ports of a
+        connection to a component that has not been read yet are given as
+        ('Unknown', None) until that component has been read.
+
+        @return A generator giving each node, depth first, starting with the
+                root node.
+        @raises BadSnapshotError
+
+        '''
+        # The nodes whose children are being read, and the number of their
+        # children still to be read
+        stack = []
+        while True:
+            parent = stack[-1][0] if stack else None
+            node, num_children = self._read_record(parent)
+            if parent:
+                parent._add_child(node)
+                stack[-1][1] -= 1
+            else:
+                self._root = node
+            yield node
+            if num_children:
+                stack.append([node, num_children])
+            while stack and not stack[-1][1]:
+                stack.pop()
+            if not stack:
+                return
+
+    def read(self):
+        '''Read the whole snapshot.
+
+        @return The root node of the tree.
+        @raises BadSnapshotError
+
+        '''
+        for node in self.nodes():
+            pass
+        return self._root
+
+    def _read(self, n):
+        data = self._f.read(n)
+        if len(data) != n:
+            raise exceptions.BadSnapshotError('unexpected end of file')
+        return data
+
+    def _read_record(self, parent):
+        kind = self._varint()
+        name = self._str()
+        info = self._value()
+        num_children = self._varint()
+        if kind == _ROOT:
+            node = TreeNode(name, parent)
+        elif kind == _NAMESERVER:
+            node = SnapshotNameServer(name, parent, info)
+        elif kind == _DIRECTORY:
+            node = SnapshotDirectory(name, parent, info)
+        elif kind == _MANAGER:
+            node = SnapshotManager(name, parent, info)
+        elif kind == _COMPONENT:
+            node = SnapshotComponent(name, parent, info, self._ports)
+        elif kind == _ZOMBIE:
+            node = Zombie(name, parent)
+        elif kind == _UNKNOWN:
+            node = Unknown(name, parent, None)
+        else:
+            raise exceptions.BadSnapshotError(
+                    'unknown node kind {0}'.format(kind))
+        return node, num_children
+
+    def _str(self):
+        index = self._varint()
+        if index:
+            try:
+                return self._strings[index - 1]
+            except IndexError:
+                raise exceptions.BadSnapshotError('bad string index')
+        s = self._read(self._varint()).decode('utf-8')
+        self._strings.append(s)
+        return s
+
+    def _value(self):
+        t = self._read(1)[0]
+        if t == _NONE:
+            return None
+        elif t == _TRUE:
+            return True
+        elif t == _FALSE:
+            return False
+        elif t == _INT:
+            n = self._varint()
+            return n // 2 if not n & 1 else -(n + 1) // 2
+        elif t == _FLOAT:
+            return struct.unpack('<d', self._read(8))[0]
+        elif t == _STR:
+            return self._str()
+        elif t == _BYTES:
+            return self._read(self._varint())
+        elif t == _LIST:
+            return [self._value() for ii in range(self._varint())]
+        elif t == _DICT:
+            result = {}
+            for ii in range(self._varint()):
+                key = self._str()
+                result[key] = self._value()
+            return result
+        raise exceptions.BadSnapshotError('unknown value type {0}'.format(t))
+
+    def _varint(self):
+        result = 0
+        shift = 0
+        while True:
+            b = self._read(1)[0]
+            result |= (b & 0x7f) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+
+
+##############################################################################
+## Snapshot nodes
+
+def _offline(name):
+    # Make a method that cannot be used without the remote object.
+    def method(self, *args, **kwargs):
+        raise exceptions.SnapshotError(name)
+    method.__name__ = name
+    method.__doc__ = 'Not available in a snapshot. Raises SnapshotError.'
+    return method
+
+
+def _offline_property(name):
+    return property(_offline(name))
+
+
+class SnapshotNode(object):
+    '''Mix-in class for nodes read from a snapshot.'''
+    @property
+    def ior(self):
+        '''The stringified IOR of the node's object when the snapshot was
+        taken, or None.'''
+        return self._ior
+
+
+class SnapshotDirectory(SnapshotNode, Directory):
+    '''A naming context read from a snapshot.'''
+    def __init__(self, name, parent, info):
+        super(SnapshotDirectory, self).__init__(name=name, parent=parent)
+        self._context = None
+        self._ior = info.get('ior')
+
+    relist = _offline('relist')
+    reparse = _offline('reparse')
+    unbind = _offline('unbind')
+
+
+class SnapshotNameServer(SnapshotNode, NameServer):
+    '''A name server read from a snapshot.'''
+    def __init__(self, name, parent, info):
+        # Skip connecting to the name server
+        super(NameServer, self).__init__(name=name, parent=parent)
+        self._address = name
+        self._orb = None
+        self._ns_obj = None
+        self._context = None
+        self._ior = info.get('ior')
+
+    reconnect = _offline('reconnect')
+    relist = _offline('relist')
+    reparse = _offline('reparse')
+    unbind = _offline('unbind')
+
+
+class SnapshotManager(SnapshotNode, Manager):
+    '''A manager read from a snapshot.'''
+    def __init__(self, name, parent, info):
+        # Skip parsing the manager
+        super(Manager, self).__init__(name=name, parent=parent)
+        self._obj = None
+        self._ior = info.get('ior')
+        self._components = None
+        self._slaves = None
+        self._masters = None
+        self._profile = info['profile']
+        self._configuration = info['configuration']
+        self._is_master = info['is_master']
+        self._factory_profiles = info['factory_profiles']
+        self._loadable_modules = info['loadable_modules']
+        self._loaded_modules = info['loaded_modules']
+
+    @property
+    def configuration(self):
+        '''The configuration dictionary of the manager.'''
+        return self._configuration
+
+    @property
+    def factory_profiles(self):
+        '''The factory profiles of all loaded modules.'''
+        return self._factory_profiles
+
+    @property
+    def is_master(self):
+        '''Is this manager node a master manager?'''
+        return self._is_master
+
+    @property
+    def loadable_modules(self):
+        '''The list of loadable module profile dictionaries.'''
+        return self._loadable_modules
+
+    @property
+    def loaded_modules(self):
+        '''The list of loaded module profile dictionaries.'''
+        return self._loaded_modules
+
+    @property
+    def profile(self):
+        '''The manager's profile.'''
+        return self._profile
+
+    def fetch_metadata(self, ttl=None):
+        '''Get all the metadata of the manager, as held in the snapshot.'''
+        return self._metadata()
+
+    create_component = _offline('create_component')
+    create_components = _offline('create_components')
+    delete_component = _offline('delete_component')
+    load_module = _offline('load_module')
+    unload_module = _offline('unload_module')
+    set_config_parameter = _offline('set_config_parameter')
+    fork = _offline('fork')
+    shutdown = _offline('shutdown')
+    restart = _offline('restart')
+
+
+class SnapshotComponent(SnapshotNode, Component):
+    '''A component read from a snapshot.
+
+    The state of the component in each execution context is the state when
+    the snapshot was taken.
+
+    '''
+    def __init__(self, name, parent, info, port_index):
+        # Skip parsing the component
+        super(Component, self).__init__(name=name, parent=parent)
+        self._obj = None
+        self._obs = None
+        self._obs_id = None
+        self._loggers = {}
+        self._last_heartbeat = time.time()
+        self._ior = info.get('ior')
+        self._reset_data()
+        self._instance_name = info['instance_name']
+        self._type_name = info['type_name']
+        self._description = info['description']
+        self._version = info['version']
+        self._vendor = info['vendor']
+        self._category = info['category']
+        self._parent_obj = info['parent_object']
+        self._properties = info['properties']
+        self._owned_ecs = [SnapshotExecutionContext(ec) for ec in \
+                info['owned_ecs']]
+        self._owned_ec_states = info['owned_ec_states']
+        self._participating_ecs = [SnapshotExecutionContext(ec) for ec in \
+                info['participating_ecs']]
+        self._participating_ec_states = info['participating_ec_states']
+        self._ports = [_make_port(p, self, port_index) for p in info['ports']]
+        self._conf_sets = dict([(cs['name'], ConfigurationSet(self, None,
+            cs['description'], cs['data'])) for cs in info['conf_sets']])
+        self._active_conf_set = info['active_conf_set']
+        self._is_composite = info['is_composite']
+        self._is_composite_member = info['is_composite_member']
+
+    @property
+    def conf_sets(self):
+        '''The dictionary of configuration sets in this component, if any.'''
+        return self._conf_sets
+
+    @property
+    def is_composite(self):
+        '''Is the component a composite component.'''
+        return self._is_composite
+
+    @property
+    def is_composite_member(self):
+        '''Is the component a member of a composite component.'''
+        return self._is_composite_member
+
+    @property
+    def owned_ec_states(self):
+        '''The state of each execution context this component owns.'''
+        return self._owned_ec_states
+
+    @property
+    def owned_ecs(self):
+        '''A list of the execution contexts owned by this component.'''
+        return self._owned_ecs
+
+    @property
+    def participating_ec_states(self):
+        '''The state of each execution context this component is participating
+        in.'''
+        return self._participating_ec_states
+
+    @property
+    def participating_ecs(self):
+        '''A list of the execution contexts this component is participating
+        in.'''
+        return self._participating_ecs
+
+    @property
+    def ports(self):
+        '''The list of all ports belonging to this component.'''
+        return self._ports
+
+    def _enable_dynamic(self, enable=True):
+        if enable:
+            raise exceptions.SnapshotError('dynamic')
+
+    reparse = _offline('reparse')
+    reparse_conf_sets = _offline('reparse_conf_sets')
+    reparse_ecs = _offline('reparse_ecs')
+    reparse_owned_ecs = _offline('reparse_owned_ecs')
+    reparse_participating_ecs = _offline('reparse_participating_ecs')
+    reparse_ports = _offline('reparse_ports')
+    reparse_profile = _offline('reparse_profile')
+    add_members = _offline('add_members')
+    remove_members = _offline('remove_members')
+    is_member = _offline('is_member')
+    exit = _offline('exit')
+    activate_in_ec = _offline('activate_in_ec')
+    deactivate_in_ec = _offline('deactivate_in_ec')
+    reset_in_ec = _offline('reset_in_ec')
+    refresh_state_in_ec = _offline('refresh_state_in_ec')
+    get_extended_fsm_service = _offline('get_extended_fsm_service')
+    disconnect_all = _offline('disconnect_all')
+    get_port_by_ref = _offline('get_port_by_ref')
+    has_port_by_ref = _offline('has_port_by_ref')
+    add_logger = _offline('add_logger')
+    remove_logger = _offline('remove_logger')
+    activate_conf_set = _offline('activate_conf_set')
+    set_conf_set_value = _offline('set_conf_set_value')
+    set_conf_set_values = _offline('set_conf_set_values')
+    alive = _offline_property('alive')
+    members = _offline_property('members')
+    organisations = _offline_property('organisations')
+    org_ids = _offline_property('org_ids')
+    parent_org_ids = _offline_property('parent_org_ids')
+    parent_org_sdo_ids = _offline_property('parent_org_sdo_ids')
+    parent_organisations = _offline_property('parent_organisations')
+
+
+##############################################################################
+## Snapshot execution contexts, ports and connections
+
+class SnapshotExecutionContext(ExecutionContext):
+    '''An execution context read from a snapshot.'''
+    def __init__(self, info):
+        # Skip parsing the execution context
+        self._obj = None
+        self._is_service = True
+        self._handle = info['handle']
+        self._dynamic = False
+        self._cache = {}
+        self._mutex = threading.RLock()
+        self._ior = info['ior']
+        self._kind = info['kind']
+        self._rate = info['rate']
+        self._running = info['running']
+        self._owner = None
+        self._owner_name = info['owner']
+        self._participants = []
+        self._participant_names = info['participants']
+        self._properties = info['properties']
+
+    @property
+    def ior(self):
+        '''The stringified IOR of the execution context, or None.'''
+        return self._ior
+
+    @property
+    def kind(self):
+        '''The kind of this execution context.'''
+        return self._kind
+
+    @property
+    def owner_name(self):
+        '''The name of the RTObject that owns this context.'''
+        return self._owner_name
+
+    @property
+    def participant_names(self):
+        '''The names of the RTObjects participating in this context.'''
+        return self._participant_names
+
+    @property
+    def rate(self):
+        '''The execution rate of this execution context.'''
+        return self._rate
+
+    @rate.setter
+    def rate(self, new_rate):
+        raise exceptions.SnapshotError('rate')
+
+    @property
+    def running(self):
+        '''Was this execution context running?'''
+        return self._running
+
+    activate_component = _offline('activate_component')
+    deactivate_component = _offline('deactivate_component')
+    reset_component = _offline('reset_component')
+    get_component_state = _offline('get_component_state')
+    reparse = _offline('reparse')
+    start = _offline('start')
+    stop = _offline('stop')
+
+
+def _make_port(info, owner, port_index):
+    cls = _port_classes.get(info['type'], SnapshotPort)
+    port = cls(info, owner, port_index)
+    if port.ior:
+        port_index[port.ior] = port
+    return port
+
+
+class SnapshotPort(ports.Port):
+    '''A port read from a snapshot.'''
+    def __init__(self, info, owner, port_index):
+        # Skip parsing the port
+        self._obj = None
+        self._owner = owner
+        self._mutex = threading.RLock()
+        self._ior = info['ior']
+        self._name = info['name']
+        self._porttype = info['type']
+        self._properties = info['properties']
+        self._capabilities = ports.parse_capabilities(self._properties)
+        self._connections = [SnapshotConnection(c, self, port_index) \
+                for c in info['connections']]
+        self._interfaces = [SnapshotInterface(i['instance_name'],
+            i['type_name'], i['polarity']) for i in info['interfaces']]
+
+    @property
+    def connections(self):
+        '''A list of connections to or from this port.'''
+        return self._connections
+
+    @property
+    def interfaces(self):
+        '''The list of interfaces this port provides or uses.'''
+        return self._interfaces
+
+    @property
+    def ior(self):
+        '''The stringified IOR of the port, or None.'''
+        return self._ior
+
+    @property
+    def porttype(self):
+        '''The type of port this is.'''
+        return self._porttype
+
+    connect = _offline('connect')
+    disconnect_all = _offline('disconnect_all')
+    reparse = _offline('reparse')
+    reparse_connections = _offline('reparse_connections')
+
+
+class SnapshotDataInPort(SnapshotPort, ports.DataInPort):
+    '''An input port read from a snapshot.'''
+    pass
+
+
+class SnapshotDataOutPort(SnapshotPort, ports.DataOutPort):
+    '''An output port read from a snapshot.'''
+    pass
+
+
+class SnapshotCorbaPort(SnapshotPort, ports.CorbaPort):
+    '''A service port read from a snapshot.'''
+    pass
+
+
+_port_classes = {'DataInPort': SnapshotDataInPort,
+                 'DataOutPort': SnapshotDataOutPort,
+                 'CorbaPort': SnapshotCorbaPort}
+
+
+class SnapshotInterface(ports.SvcInterface):
+    '''A service port interface read from a snapshot.'''
+    def __init__(self, instance_name, type_name, polarity):
+        # Skip parsing the interface profile
+        self._obj = None
+        self._mutex = threading.RLock()
+        self._instance_name = instance_name
+        self._type_name = type_name
+        self._polarity = polarity
+
+    reparse = _offline('reparse')
+
+
+class SnapshotConnection(ports.Connection):
+    '''A connection read from a snapshot.'''
+    def __init__(self, info, owner, port_index):
+        # Skip parsing the connector profile
+        self._obj = None
+        self._owner = owner
+        self._mutex = threading.RLock()
+        self._id = info['id']
+        self._name = info['name']
+        self._properties = info['properties']
+        self._port_iors = info['ports']
+        self._port_index = port_index
+
+    def has_port(self, port):
+        '''Return True if this connection involves the given Port object.'''
+        for path, p in self.ports:
+            if p is port:
+                return True
+        return False
+
+    @property
+    def ports(self):
+        '''The list of ports involved in this connection.
+
+        The result is a list of tuples, (full path of the port, port
+        object). Ports that are not in the snapshot are ('Unknown', None).
+
+        '''
+        result = []
+        for ior in self._port_iors:
+            port = self._port_index.get(ior)
+            if port is None or port.owner is None:
+                result.append(('Unknown', None))
+            else:
+                result.append((port.owner.full_path_str + ':' + port.name,
+                    port))
+        return result
+
+    disconnect = _offline('disconnect')
+    reparse = _offline('reparse')
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
@@ -0,0 +1,207 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Background liveness checking of the components and managers in a tree.
+
+'''
+
+
+from __future__ import print_function
+
+import os.path
+import sys
+import threading
+
+import omniORB
+from omniORB import CORBA
+
+from rtctree import utils
+from rtctree.name_cache import InstanceNameCache
+from rtctree.options import Options
+from rtctree.zombie import Zombie
+
+
+##############################################################################
+## Probing
+
+def probe(obj, timeout):
+    '''Check if a remote object still exists.
+
+    The check is made on a separate reference to the object, so the call
+    timeout does not affect other calls made on @ref obj.
+
+    @param obj The object reference to check.
+    @param timeout The call timeout, in milliseconds.
+    @return True if the object exists, False if it does not or it could not
+            be reached before the timeout.
+
+    '''
+    orb = CORBA.ORB_init()
+    ref = orb.string_to_object(orb.object_to_string(obj))
+    omniORB.setClientCallTimeout(ref, int(timeout))
+    try:
+        return not ref._non_existent()
+    except (CORBA.OBJECT_NOT_EXIST, CORBA.TRANSIENT, CORBA.COMM_FAILURE,
+            CORBA.TIMEOUT):
+        return False
+
+
+##############################################################################
+## Sweeper object
+
+class LivenessSweeper(object):
+    '''Periodically checks the liveness of every component and manager.
+
+    All components and managers below a node are probed concurrently using
+    _non_existent() with a short timeout. A node that fails @ref max_failures
+    probes in a row is replaced in its parent by a Zombie node of the same
+    name, and the 'node_replaced' events of the parent node and the tree's
+    root node are called with the value (old node, zombie node).
+
+    Errors raised by sweeps made in the background thread are written to
+    standard error and kept in @ref last_error.
+
+    '''
+    def __init__(self, node, interval=None, timeout=None, max_failures=1):
+        '''Constructor.
+
+        @param node The node below which to check components and managers,
+                    usually the root node of a tree.
+        @param interval The time between sweeps, in seconds. If None, the
+                        'sweep_interval' option is used.
+        @param timeout The timeout of each probe, in milliseconds. If None,
+                       the 'sweep_timeout' option is used.
+        @param max_failures The number of failed probes in a row after which
+                            a node is considered dead.
+
+        '''
+        self._node = node
+        if interval is None:
+            interval = Options().get_option('sweep_interval')
+        if timeout is None:
+            timeout = Options().get_option('sweep_timeout')
+        self._interval = interval
+        self._timeout = timeout
+        self._max_failures = max_failures
+        self._failures = {}
+        self._last_error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._mutex = threading.Lock()
+
+    def start(self):
+        '''Start sweeping in a background thread.'''
+        with self._mutex:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                    name='rtctree-liveness-sweeper')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        '''Stop sweeping and wait for the background thread to exit.'''
+        with self._mutex:
+            thread = self._thread
+            self._thread = None
+        if thread:
+            self._stop.set()
+            thread.join()
+
+    def sweep(self):
+        '''Check all components and managers once.
+
+        This can be called without starting the background thread.
+
+        @return The list of Zombie nodes that replaced dead nodes.
+
+        '''
+        nodes = self._node.iterate(lambda n, args: n,
+                filter=[lambda n: n.is_component or n.is_manager])
+        timeout = self._timeout
+        results = utils.call_concurrently(
+                lambda n: probe(n.object, timeout), nodes)
+        zombies = []
+        for n, (alive, e) in zip(nodes, results):
+            if alive and not e:
+                self._failures.pop(id(n), None)
+                continue
+            failures = self._failures.get(id(n), 0) + 1
+            if failures < self._max_failures:
+                self._failures[id(n)] = failures
+                continue
+            self._failures.pop(id(n), None)
+            zombie = self._replace(n)
+            if zombie:
+                zombies.append(zombie)
+        return zombies
+
+    @property
+    def interval(self):
+        '''The time between sweeps, in seconds.'''
+        return self._interval
+
+    @property
+    def last_error(self):
+        '''The exception raised by the last sweep made in the background
+        thread, or None if it succeeded.'''
+        return self._last_error
+
+    @property
+    def running(self):
+        '''Is the background thread running?'''
+        with self._mutex:
+            return self._thread is not None
+
+    @property
+    def timeout(self):
+        '''The timeout of each probe, in milliseconds.'''
+        return self._timeout
+
+    def _replace(self, node):
+        # Replace a dead node with a zombie in its parent.
+        parent = node.parent
+        if not parent:
+            return None
+        with parent._mutex:
+            if parent._children.get(node.name) is not node:
+                # Already removed or replaced
+                return None
+            zombie = Zombie(node.name, parent, dynamic=node.dynamic)
+            parent._add_child(zombie)
+        # Remove any observer and loggers the dead node still has registered,
+        # outside the mutex as the calls may time out
+        node._discard()
+        if node.is_component:
+            InstanceNameCache().remove(node.object)
+        parent._call_tree_cb('node_replaced', (node, zombie))
+        return zombie
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+                self._last_error = None
+            except Exception as e:
+                # Keep sweeping; the error may not happen in the next sweep
+                self._last_error = e
+                print('{0}: Warning: failed to sweep for dead nodes: '\
+                        '{1}'.format(os.path.basename(sys.argv[0]), e),
+                        file=sys.stderr)
+            self._stop.wait(self._interval)
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
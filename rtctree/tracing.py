@@ -0,0 +1,353 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Tracing spans for discovery and control operations.
+
+Parsing name servers, processing naming context bindings, parsing component
+profiles and controlling components, ports and managers are each wrapped in a
+span. When at least one hook is added with add_hook(), the hooks are called
+at the start and end of every span. Otherwise spans cost almost nothing.
+
+A span has a name, such as 'Directory.process_binding', and attributes. The
+attributes used by rtctree are:
+
+  - path: the path of the node the operation is on.
+  - operation: the name of the operation.
+  - endpoint: the remote end point ('host:port') of the object called.
+
+Two hooks are provided: JSONLinesExporter writes each finished span as a
+line of JSON, and FlameSummary collects the time spent in each stack of
+spans in the folded format used by flame graph tools.
+
+'''
+
+
+import itertools
+import json
+import threading
+import time
+
+from rtctree import instrument
+from rtctree import utils
+
+
+_hooks = []
+_hooks_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+
+
+##############################################################################
+## Hooks
+
+def add_hook(on_start=None, on_end=None):
+    '''Add functions to call at the start and end of every span.
+
+    Each function is called with the Span object. The functions are called
+    in the thread that runs the span, so they should be quick and must be
+    thread-safe.
+
+    @param on_start The function to call when a span starts, or None.
+    @param on_end The function to call when a span ends, or None.
+
+    '''
+    global _hooks
+    with _hooks_lock:
+        _hooks = _hooks + [(on_start, on_end)]
+
+
+def remove_hook(on_start=None, on_end=None):
+    '''Remove functions added with add_hook().'''
+    global _hooks
+    with _hooks_lock:
+        _hooks = [h for h in _hooks if h != (on_start, on_end)]
+
+
+def current_span():
+    '''Get the innermost span running in this thread, or None.'''
+    stack = getattr(_local, 'stack', None)
+    if stack:
+        return stack[-1]
+    return None
+
+
+def enabled():
+    '''Are any hooks receiving spans?'''
+    return bool(_hooks)
+
+
+def span(name, node=None, obj=None, **attributes):
+    '''Create a span to wrap an operation in, using a with statement.
+
+    >>> with span('example', path='/localhost') as s:
+    ...     pass
+    >>> s is None
+    True
+
+    @param name The name of the span.
+    @param node If given, the full path of this node is added to the
+                attributes as 'path', unless a path is given in
+                @ref attributes.
+    @param obj If given, the remote end point of this object reference is
+               added to the attributes as 'endpoint'.
+    @param attributes Other attributes of the span.
+    @return A Span object, or a span that does nothing and gives None if no
+            hooks have been added.
+
+    '''
+    if not _hooks:
+        return _NULL_SPAN
+    if node is not None and attributes.get('path', None) is None:
+        attributes['path'] = node.full_path_str
+    if obj is not None:
+        attributes['endpoint'] = instrument.ior_endpoint(
+                utils.object_key(obj))
+    return Span(name, attributes)
+
+
+##############################################################################
+## Span objects
+
+class _NullSpan(object):
+    # A span that does nothing, used when there are no hooks.
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+    '''A single timed operation.
+
+    Spans nest: a span started while another span is running in the same
+    thread is a child of that span.
+
+    '''
+    def __init__(self, name, attributes=None):
+        '''Constructor.
+
+        @param name The name of the span.
+        @param attributes A dictionary of attributes.
+
+        '''
+        self._name = name
+        self._attributes = attributes or {}
+        self._id = next(_ids)
+        self._parent = None
+        self._start = None
+        self._end = None
+        self._error = None
+        self._child_time = 0.0
+
+    def __enter__(self):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        if stack:
+            self._parent = stack[-1]
+        stack.append(self)
+        self._start = time.time()
+        self._clock = time.perf_counter()
+        for on_start, on_end in _hooks:
+            if on_start:
+                on_start(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._end = self._start + time.perf_counter() - self._clock
+        if exc_value is not None:
+            self._error = exc_value
+        _local.stack.pop()
+        if self._parent:
+            self._parent._child_time += self.duration
+        for on_start, on_end in _hooks:
+            if on_end:
+                on_end(self)
+        return False
+
+    def set_attribute(self, name, value):
+        '''Set an attribute of the span.'''
+        self._attributes[name] = value
+
+    @property
+    def attributes(self):
+        '''The attributes of the span.'''
+        return self._attributes
+
+    @property
+    def duration(self):
+        '''The time the span took, in seconds, or None if it is running.'''
+        if self._end is None:
+            return None
+        return self._end - self._start
+
+    @property
+    def end(self):
+        '''The time the span ended, or None if it is running.'''
+        return self._end
+
+    @property
+    def error(self):
+        '''The exception that ended the span, or None.'''
+        return self._error
+
+    @property
+    def id(self):
+        '''A number identifying the span in this process.'''
+        return self._id
+
+    @property
+    def name(self):
+        '''The name of the span.'''
+        return self._name
+
+    @property
+    def parent(self):
+        '''The span this span is running inside, or None.'''
+        return self._parent
+
+    @property
+    def self_time(self):
+        '''The time spent in the span but not in its children, in seconds.'''
+        if self._end is None:
+            return None
+        return self.duration - self._child_time
+
+    @property
+    def stack(self):
+        '''The names of this span and the spans it is inside, outermost
+        first.'''
+        names = []
+        s = self
+        while s:
+            names.insert(0, s._name)
+            s = s._parent
+        return names
+
+    @property
+    def start(self):
+        '''The time the span started.'''
+        return self._start
+
+
+##############################################################################
+## Exporters
+
+class JSONLinesExporter(object):
+    '''Writes each finished span to a file as a line of JSON.
+
+    Each line holds the span's id, parent id, name, start time, duration in
+    seconds, attributes and, if it failed, the error.
+
+        exporter = JSONLinesExporter(open('trace.jsonl', 'w'))
+        tracing.add_hook(on_end=exporter.on_end)
+
+    '''
+    def __init__(self, f):
+        '''Constructor.
+
+        @param f A file object opened for writing text.
+
+        '''
+        self._f = f
+        self._mutex = threading.Lock()
+
+    def close(self):
+        '''Close the file.'''
+        with self._mutex:
+            self._f.close()
+
+    def on_end(self, span):
+        '''Write a finished span. Pass this to add_hook().'''
+        record = {'id': span.id,
+                  'parent': span.parent.id if span.parent else None,
+                  'name': span.name, 'start': span.start,
+                  'duration': span.duration,
+                  'attributes': dict([(k, str(v)) for k, v in \
+                          span.attributes.items()])}
+        if span.error is not None:
+            record['error'] = repr(span.error)
+        line = json.dumps(record, sort_keys=True)
+        with self._mutex:
+            self._f.write(line + '\n')
+
+
+class FlameSummary(object):
+    '''Sums the time spent in each stack of spans.
+
+    The summary can be written in the folded stack format read by flame
+    graph tools, one stack per line with the time spent in it, not counting
+    the time spent in nested spans, in microseconds:
+
+        Directory.process_binding;Component.parse_profile 5320
+
+    '''
+    def __init__(self, attribute=None):
+        '''Constructor.
+
+        @param attribute If not None, the value of this attribute is added
+                         to the name of each span in the stack, e.g. 'path'.
+
+        '''
+        self._attribute = attribute
+        self._times = {}
+        self._mutex = threading.Lock()
+
+    def clear(self):
+        '''Remove all collected times.'''
+        with self._mutex:
+            self._times = {}
+
+    def folded(self):
+        '''Get the summary in folded stack format.
+
+        @return A string with one line per stack, sorted by stack.
+
+        '''
+        with self._mutex:
+            return ''.join(['{0} {1}\n'.format(k, int(round(v * 1e6))) \
+                    for k, v in sorted(self._times.items())])
+
+    def on_end(self, span):
+        '''Add a finished span. Pass this to add_hook().'''
+        frames = []
+        s = span
+        while s:
+            frames.insert(0, self._frame(s))
+            s = s.parent
+        key = ';'.join(frames)
+        with self._mutex:
+            self._times[key] = self._times.get(key, 0.0) + span.self_time
+
+    @property
+    def times(self):
+        '''The time, in seconds, spent in each stack, by folded stack.'''
+        with self._mutex:
+            return dict(self._times)
+
+    def _frame(self, span):
+        # Flame graph tools use ';' to separate frames and ' ' to separate
+        # the count.
+        name = span.name
+        if self._attribute and self._attribute in span.attributes:
+            name += '({0})'.format(span.attributes[self._attribute])
+        return name.replace(';', ':').replace(' ', '_')
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79
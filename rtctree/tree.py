@@ -18,7 +18,6 @@ of name servers, directories, managers and components.
 
 '''
 
-import copy
 import os
 import sys
 
@@ -28,14 +27,26 @@ from rtctree import exceptions
 from rtctree import NAMESERVERS_ENV_VAR, ORB_ARGS_ENV_VAR
 from rtctree import ORB_SSL_ENABLE_ENV_VAR, ORB_SSL_CAFILE_ENV_VAR, ORB_SSL_KEYFILE_ENV_VAR, ORB_SSL_KEYPASSWORD_ENV_VAR
 from rtctree import ORB_HTTP_ENABLE_ENV_VAR, ORB_HTTPS_CAFILE_ENV_VAR, ORB_HTTPS_KEYFILE_ENV_VAR, ORB_HTTPS_KEYPASSWORD_ENV_VAR
+from rtctree import snapshot
 from rtctree import utils
+from rtctree.instrument import CallStats
 from rtctree.node import TreeNode
+from rtctree.options import orb_tuning_args
 from rtctree.directory import Directory
-from rtctree.nameserver import NameServer
+from rtctree.graph import DataflowGraph
+from rtctree.log_stream import LogAggregator
+from rtctree.nameserver import NameServer, clear_root_contexts
+from rtctree.path import Path
+from rtctree.sweeper import LivenessSweeper
+from rtctree.watch import TreeWatcher
 from rtctree.manager import Manager
 from rtctree.component import Component
 
 
+## The events available on the root node of a tree. See RTCTree.add_callback.
+TREE_EVENTS = ['node_added', 'node_removed', 'node_replaced']
+
+
 ##############################################################################
 ## Tree object
 
@@ -104,7 +115,8 @@ class RTCTree(object):
     -15
     '''
     def __init__(self, servers=None, paths=None, orb=None, filter=[],
-            dynamic=False, *args, **kwargs):
+            dynamic=False, orb_tuning=None, instrument=False, *args,
+            **kwargs):
         '''Constructor.
 
         @param servers A list of servers to parse into the tree.
@@ -122,12 +134,29 @@ class RTCTree(object):
                        when a component changes state, an observer can notify
                        RTCTree so that the corresponding object in the tree can
                        be updated. Currently this only affects components.
-        @raises NonRootPathError
+        @param orb_tuning A dictionary of ORB tuning option values, or the
+                          name of a preset. See rtctree.options for the
+                          available options and presets. Values not given
+                          are taken from the Options object. Only used if
+                          the tree creates its own ORB.
+        @param instrument Record statistics of the remote calls made by the
+                          nodes of this tree. Each tree keeps its own
+                          statistics. See stats().
+        @raises NonRootPathError, NoSuchOptionError
 
         '''
         super(RTCTree, self).__init__()
-        self._root = TreeNode('/', None, dynamic=dynamic)
-        self._create_orb(orb)
+        if instrument:
+            self._stats = CallStats()
+            self._stats.enable()
+        else:
+            self._stats = None
+        self._root = TreeNode('/', None, dynamic=dynamic,
+                call_stats=self._stats)
+        self._root._set_events(TREE_EVENTS)
+        self._sweeper = None
+        self._watcher = None
+        self._create_orb(orb, orb_tuning)
         self._dynamic = dynamic
         if servers:
             self._parse_name_servers(servers, filter=filter, dynamic=dynamic)
@@ -151,7 +180,12 @@ class RTCTree(object):
 
     def __del__(self):
         # Destructor to ensure the ORB shuts down correctly.
+        if self._sweeper:
+            self._sweeper.stop()
+        if self._watcher:
+            self._watcher.stop()
         if self._orb_is_mine:
+            clear_root_contexts(self._orb)
             self._orb.shutdown(wait_for_completion=CORBA.FALSE)
             self._orb.destroy()
 
@@ -159,6 +193,73 @@ class RTCTree(object):
         # Get a (potentially very large) string describing the tree.
         return str(self._root)
 
+    @classmethod
+    def from_snapshot(cls, f):
+        '''Create a tree from a snapshot written by write_snapshot().
+
+        The tree is built without an ORB and without any network access. Its
+        nodes hold the information in the snapshot; operations that need the
+        remote objects raise SnapshotError. See rtctree.snapshot.
+
+        @param f A file object opened for reading bytes.
+        @return A new RTCTree object.
+        @raises BadSnapshotError
+
+        '''
+        tree = cls.__new__(cls)
+        tree._root = snapshot.load(f)
+        tree._root._set_events(TREE_EVENTS)
+        tree._sweeper = None
+        tree._watcher = None
+        tree._stats = None
+        tree._orb = None
+        tree._orb_is_mine = False
+        tree._poa = None
+        tree._dynamic = False
+        return tree
+
+    def write_snapshot(self, f, path=['/']):
+        '''Write a snapshot of the tree to a file.
+
+        The information of every node below the node pointed to by @ref path
+        is collected, making remote calls for anything not already parsed,
+        and written in a compact binary format. Use from_snapshot() to read
+        it. See rtctree.snapshot.
+
+        @param f A file object opened for writing bytes.
+        @param path A list of path elements pointing to a node in the tree.
+                    By default, the whole tree is written.
+        @raises BadPathError
+
+        '''
+        node = self.get_node(path)
+        if not node:
+            raise exceptions.BadPathError(path)
+        snapshot.dump(node, f)
+
+    def add_callback(self, event, cb, args=None):
+        '''Add a callback for a tree-wide event.
+
+        The available events are:
+
+          - node_added: A node was added to a directory by relisting it, for
+            example by the watcher started with start_watcher(). The value is
+            the new node.
+          - node_removed: A node was removed from a directory by relisting
+            it. The value is the removed node.
+          - node_replaced: A node was replaced in its parent, for example when
+            a dead component was replaced with a zombie. The value is a tuple
+            of (old node, new node).
+
+        See TreeNode.add_callback() for the format of the callback. As with
+        nodes, there is one callback for each event; adding another replaces
+        it.
+
+        @raises NoSuchEventError
+
+        '''
+        self._root.add_callback(event, cb, args)
+
     def add_name_server(self, server, filter=[], dynamic=None):
         '''Parse a name server, adding its contents to the tree.
 
@@ -178,14 +279,243 @@ class RTCTree(object):
             dynamic = self._dynamic
         self._parse_name_server(server, filter, dynamic=dynamic)
 
+    def aggregate_logs(self, paths=[['/']], level='NORMAL', filters='ALL',
+            window=None):
+        '''Receive the logs of many components as one time-ordered stream.
+
+        Loggers are added to every component below the nodes pointed to by
+        @ref paths, in parallel. See rtctree.log_stream.LogAggregator.
+
+        @param paths A list of paths, each a list of path elements or an
+                     rtctree.path.Path object, pointing to components or to
+                     nodes to find components below. By default, all the
+                     components in the tree are included.
+        @param level The maximum level of log records to receive.
+        @param filters Filter the objects from which to receive log messages.
+        @param window The reorder window, in seconds. If None, the
+                      'log_reorder_window' option is used.
+        @return A LogAggregator object. Iterate over it to get the records,
+                and call its close() method to remove the loggers.
+        @raises BadPathError, AddLoggerError
+
+        '''
+        comps = []
+        seen = set()
+        for path in paths:
+            node = self.get_node(path)
+            if not node:
+                raise exceptions.BadPathError(path)
+            for c in node.iterate(lambda n, args: n, filter=['is_component']):
+                if id(c) not in seen:
+                    seen.add(id(c))
+                    comps.append(c)
+        return LogAggregator(comps, level=level, filters=filters,
+                window=window)
+
+    def apply_configuration(self, changes, dry_run=False):
+        '''Apply configuration changes to many components at once.
+
+        The current configuration sets of all the components are fetched in
+        parallel and compared with the requested values. Only the parameters
+        whose values differ are sent, with one update per configuration set
+        (see Component.set_conf_set_values()), and the components are updated
+        in parallel.
+
+        For example, {'/localhost/comp0.rtc': {'default': {'gain': '2.5'}}}
+        sets the 'gain' parameter of comp0.rtc's 'default' configuration set.
+
+        @param changes A dictionary mapping component paths to their changes.
+                       Each path is a string, such as '/localhost/comp0.rtc',
+                       or an rtctree.path.Path object. Each component's
+                       changes are a dictionary mapping configuration set names
+                       to dictionaries of parameter names and new values.
+        @param dry_run If True, the differences are found and reported but
+                       nothing is sent to the components.
+        @return A dictionary mapping each path in @ref changes to a tuple of
+                (differences, error). The differences are a dictionary
+                mapping configuration set names to dictionaries of the
+                changed parameters and their (old value, new value). The error
+                is None, or the exception raised while fetching or updating
+                the component's configuration, such as NoSuchConfSetError.
+                Sets and parameters that are already at the requested values
+                are left out of the differences.
+        @raises BadPathError
+
+        '''
+        keys = list(changes.keys())
+        comps = []
+        for key in keys:
+            if isinstance(key, Path):
+                path = key
+            else:
+                path = Path.parse(key)
+            node = self.get_node(path)
+            if not node or not node.is_component:
+                raise exceptions.BadPathError(key)
+            comps.append(node)
+
+        def fetch(c):
+            c.reparse_conf_sets()
+            return c.conf_sets
+        diffs = []
+        errors = []
+        for key, (conf_sets, e) in zip(keys, utils.call_concurrently(fetch,
+                comps)):
+            diff = {}
+            if not e:
+                try:
+                    diff = self._conf_diff(conf_sets, changes[key])
+                except exceptions.RtcTreeError as err:
+                    e = err
+            diffs.append(diff)
+            errors.append(e)
+
+        if not dry_run:
+            def write(item):
+                c, diff = item
+                for set_name in sorted(diff.keys()):
+                    c.set_conf_set_values(set_name, dict([(p, new) \
+                            for p, (old, new) in diff[set_name].items()]))
+            to_write = [(c, d) for c, d, e in zip(comps, diffs, errors) \
+                    if d and not e]
+            results = utils.call_concurrently(write, to_write)
+            written = dict([(id(c), e) for (c, d), (r, e) in zip(to_write,
+                results)])
+            errors = [written.get(id(c), e) for c, e in zip(comps, errors)]
+        return dict(zip(keys, zip(diffs, errors)))
+
+    def create_components(self, specs):
+        '''Create many components, possibly on several managers.
+
+        The components are created in parallel on all the managers, and each
+        manager's node is reparsed once, after all of its components have been
+        created. See Manager.create_components().
+
+        @param specs A list of (path, module name) tuples. Each path is a
+                     list of path elements or an rtctree.path.Path object
+                     pointing to a manager. Each module name can contain
+                     options, such as 'Motor?instance_name=motor1'.
+        @return A list of (component, error) tuples, one per spec in the same
+                order, as returned by Manager.create_components().
+        @raises BadPathError
+
+        '''
+        mgrs = []
+        indices = {}
+        for ii, (path, module_name) in enumerate(specs):
+            node = self.get_node(path)
+            if not node or not node.is_manager:
+                raise exceptions.BadPathError(path)
+            if id(node) not in indices:
+                indices[id(node)] = []
+                mgrs.append(node)
+            indices[id(node)].append(ii)
+        results = [None] * len(specs)
+        for m, (created, e) in zip(mgrs, utils.call_concurrently(
+                lambda m: m.create_components([specs[ii][1] \
+                        for ii in indices[id(m)]]), mgrs)):
+            for jj, ii in enumerate(indices[id(m)]):
+                results[ii] = (None, e) if e else created[jj]
+        return results
+
+    def dataflow_graph(self, path=['/']):
+        '''Build an index of the connections between components.
+
+        The index is built in one pass over the components below the node
+        pointed to by @ref path, and can then be queried without making
+        remote calls. See rtctree.graph.DataflowGraph.
+
+        @param path A list of path elements pointing to a node in the tree.
+                    By default, the whole tree is indexed.
+        @return A DataflowGraph object.
+        @raises BadPathError
+
+        '''
+        node = self.get_node(path)
+        if not node:
+            raise exceptions.BadPathError(path)
+        return DataflowGraph(node)
+
+    def disconnect_all(self, path=['/']):
+        '''Disconnect all connections involving components below a node.
+
+        The connections of every port of every component below the node
+        pointed to by @ref path are collected, and each connection is
+        disconnected once, even if more than one of its ports is below the
+        node. The disconnections are performed in parallel.
+
+        @param path A list of path elements pointing to a node in the tree.
+                    By default, all connections in the tree are disconnected.
+        @return A dictionary mapping each connection ID to the result of
+                disconnecting it. The result is the return code from the
+                component, or the exception raised while disconnecting.
+        @raises BadPathError
+
+        '''
+        node = self.get_node(path)
+        if not node:
+            raise exceptions.BadPathError(path)
+        comps = node.iterate(lambda n, args: n, filter=['is_component'])
+        ports = []
+        for comp_ports, e in utils.call_concurrently(lambda c: c.ports,
+                comps):
+            if e:
+                raise e
+            ports += comp_ports
+        # Use the first port found for each connection to disconnect it
+        conns = {}
+        for p, (p_conns, e) in zip(ports, utils.call_concurrently(
+                lambda p: p.connections, ports)):
+            if e:
+                raise e
+            for conn in p_conns:
+                if conn.id not in conns:
+                    conns[conn.id] = p
+        ids = list(conns.keys())
+        results = utils.call_concurrently(
+                lambda id: conns[id].object.disconnect(id), ids)
+        for p in ports:
+            p.reparse_connections()
+        return dict([(id, e if e else rc) for id, (rc, e) in zip(ids,
+            results)])
+
+    def fetch_manager_metadata(self, path=['/'], ttl=None):
+        '''Get the metadata of all managers below a node.
+
+        The managers are asked for their metadata in parallel. See
+        Manager.fetch_metadata().
+
+        @param path A list of path elements pointing to a node in the tree.
+                    By default, all managers in the tree are included.
+        @param ttl The age in seconds after which each manager's cached
+                   metadata is retrieved again. If None, the
+                   'manager_metadata_ttl' option is used.
+        @return A dictionary mapping the full path of each manager, as a
+                string, to a tuple of (metadata, error). If the metadata could
+                not be retrieved, metadata is None and error is the exception.
+        @raises BadPathError
+
+        '''
+        node = self.get_node(path)
+        if not node:
+            raise exceptions.BadPathError(path)
+        mgrs = node.iterate(lambda n, args: n, filter=['is_manager'])
+        results = utils.call_concurrently(lambda m: m.fetch_metadata(ttl),
+                mgrs)
+        return dict([(m.full_path_str, r) for m, r in zip(mgrs, results)])
+
     def get_node(self, path):
         '''Get a node by path.
 
         @param path A list of path elements pointing to a node in the tree.
                     For example, ['/', 'localhost', 'dir.host']. The first
                     element in this path should be the root node's name.
+                    An rtctree.path.Path object can also be given; its port
+                    is ignored.
 
         '''
+        if isinstance(path, Path):
+            path = path.parts
         return self._root.get_node(path)
 
     def has_path(self, path):
@@ -194,8 +524,12 @@ class RTCTree(object):
         @param path A list of path elements pointing to a node in the tree.
                     For example, ['/', 'localhost', 'dir.host']. The first
                     element in this path should be the root node's name.
+                    An rtctree.path.Path object can also be given; its port
+                    is ignored.
 
         '''
+        if isinstance(path, Path):
+            path = path.parts
         return self._root.has_path(path)
 
     def is_component(self, path):
@@ -286,6 +620,87 @@ class RTCTree(object):
                          if s]
             self._parse_name_servers(servers, filter, dynamic)
 
+    def rem_callback(self, event, cb):
+        '''Remove a callback added with add_callback().
+
+        @raises NoSuchEventError, NoCBError
+
+        '''
+        self._root.rem_callback(event, cb)
+
+    def start_sweeper(self, interval=None, timeout=None, max_failures=1):
+        '''Start checking the liveness of components and managers.
+
+        A background thread probes every component and manager in the tree
+        concurrently. Dead nodes are replaced with zombies in place and the
+        node_replaced event is called for them. See
+        rtctree.sweeper.LivenessSweeper.
+
+        @param interval The time between sweeps, in seconds. If None, the
+                        'sweep_interval' option is used.
+        @param timeout The timeout of each probe, in milliseconds. If None,
+                       the 'sweep_timeout' option is used.
+        @param max_failures The number of failed probes in a row after which
+                            a node is considered dead.
+        @return The LivenessSweeper object.
+
+        '''
+        if self._sweeper:
+            self._sweeper.stop()
+        self._sweeper = LivenessSweeper(self._root, interval=interval,
+                timeout=timeout, max_failures=max_failures)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        '''Stop the liveness checking started by start_sweeper().'''
+        if self._sweeper:
+            self._sweeper.stop()
+            self._sweeper = None
+
+    def start_watcher(self, min_interval=None, max_interval=None):
+        '''Start watching the name servers for added and removed bindings.
+
+        A background thread relists the naming contexts of the tree and
+        applies the changes, calling the node_added, node_removed and
+        node_replaced events. The time between checks adapts to how often
+        the tree changes. See rtctree.watch.TreeWatcher.
+
+        @param min_interval The shortest time between checks, in seconds. If
+                            None, the 'watch_min_interval' option is used.
+        @param max_interval The longest time between checks, in seconds. If
+                            None, the 'watch_max_interval' option is used.
+        @return The TreeWatcher object.
+
+        '''
+        if self._watcher:
+            self._watcher.stop()
+        self._watcher = TreeWatcher(self._root, min_interval=min_interval,
+                max_interval=max_interval)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        '''Stop the watching started by start_watcher().'''
+        if self._watcher:
+            self._watcher.stop()
+            self._watcher = None
+
+    def stats(self):
+        '''Get the statistics of the remote calls made by this tree's nodes.
+
+        Statistics are only recorded if the tree was created with
+        instrument=True. Other trees keep their own statistics.
+
+        @return The rtctree.instrument.CallStats object of this tree, or None
+                if it is not instrumented. Use its operations and endpoints
+                properties to read the statistics, reset() to clear them,
+                disable() and enable() to pause recording and dump() or
+                to_json() to export them as JSON.
+
+        '''
+        return self._stats
+
     def give_away_orb(self):
         '''Releases ownership of an ORB created by the tree.
 
@@ -307,9 +722,27 @@ class RTCTree(object):
         '''The reference to the ORB held by this tree.'''
         return self._orb
 
-    def _create_orb(self, orb=None):
+    def _conf_diff(self, conf_sets, changes):
+        # Find the parameters in changes that differ from the values in
+        # conf_sets, as {set name: {param: (old, new)}}.
+        diff = {}
+        for set_name, values in changes.items():
+            if not set_name in conf_sets:
+                raise exceptions.NoSuchConfSetError(set_name)
+            data = conf_sets[set_name].data
+            set_diff = {}
+            for param, value in values.items():
+                if not param in data:
+                    raise exceptions.NoSuchConfParamError(param)
+                if data[param] != value:
+                    set_diff[param] = (data[param], value)
+            if set_diff:
+                diff[set_name] = set_diff
+        return diff
+
+    def _create_orb(self, orb=None, orb_tuning=None):
         # Create the ORB, optionally checking the environment variable for
-        # arguments to pass to the ORB.
+        # arguments to pass to the ORB and applying tuning options.
         if orb:
             self._orb = orb
             self._orb_is_mine = False
@@ -343,7 +776,11 @@ class RTCTree(object):
                 orb_args = os.environ[ORB_ARGS_ENV_VAR].split(';')
             else:
                 orb_args = []
-            self._orb = CORBA.ORB_init(orb_args)
+            tuning_args = orb_tuning_args(orb_tuning)
+            if tuning_args and not orb_args:
+                # The ORB treats the first argument as the program name
+                orb_args = [os.path.basename(sys.argv[0]) or 'rtctree']
+            self._orb = CORBA.ORB_init(orb_args + tuning_args)
             self._orb_is_mine = True
         # Run the POA manager
         self._poa = self._orb.resolve_initial_references('RootPOA')
@@ -365,9 +802,10 @@ class RTCTree(object):
 
     def _parse_name_server(self, address, filter=[], dynamic=False):
         # Parse a single name server and add it to the root node.
-        if not utils.filtered(['/', address], filter):
+        ns_filter = utils.compile_filter(filter).descend(['/', address])
+        if ns_filter is not None:
             new_ns_node = NameServer(self._orb, address, self._root,
-                    utils.trim_filter(copy.deepcopy(filter), 2), dynamic=dynamic)
+                    ns_filter, dynamic=dynamic)
             self._root._add_child(new_ns_node)
 
 
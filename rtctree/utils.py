@@ -22,7 +22,9 @@ import sys
 
 import omniORB
 import omniORB.any
+from omniORB import CORBA
 
+from rtctree.options import Options
 from rtctree.rtc import SDOPackage
 
 
@@ -176,6 +178,16 @@ def nvlist_to_dict(nvlist):
     return result
 
 
+def object_key(obj):
+    '''Get a hashable key identifying the object a CORBA reference points to.
+
+    Different reference objects for the same remote object give the same key,
+    and no remote call is made to get it.
+
+    '''
+    return CORBA.ORB_init().object_to_string(obj)
+
+
 def filtered(path, filter):
     '''Check if a path is removed by a filter.
 
@@ -200,6 +212,153 @@ def filtered(path, filter):
     return True
 
 
+class FilterTrie(object):
+    '''A set of filter paths compiled into a prefix tree.
+
+    Checking a path against the trie takes time proportional to the length
+    of the path, not the number of filter paths. The trie for the children
+    of a node is a branch of the trie, so it can be passed down a
+    recursive parse without copying.
+
+    A trie with no paths does not filter anything. All paths below the end
+    of a filter path are unfiltered.
+
+    Example:
+    >>> t = FilterTrie([['/', 'localhost', 'a.cxt', 'c1.rtc'],
+    ...                 ['/', 'localhost', 'b.cxt']])
+    >>> t.filtered(['/', 'localhost', 'a.cxt'])
+    False
+    >>> t.filtered(['/', 'localhost', 'a.cxt', 'c2.rtc'])
+    True
+    >>> t.filtered(['/', 'localhost', 'b.cxt', 'c2.rtc'])
+    False
+    >>> t.filtered(['/', 'otherhost'])
+    True
+    >>> sub = t.descend(['/', 'localhost'])
+    >>> sub.filtered(['a.cxt']), sub.filtered(['c.cxt'])
+    (False, True)
+    >>> FilterTrie().filtered(['/', 'anything'])
+    False
+
+    '''
+    def __init__(self, paths=None):
+        '''Constructor.
+
+        @param paths A list of paths, each a list of strings.
+
+        '''
+        self._children = {}
+        self._terminal = False
+        if paths:
+            for p in paths:
+                self.add(p)
+
+    def add(self, path):
+        '''Add a path to the filter.'''
+        node = self
+        for name in path:
+            if node._terminal:
+                # Already unfiltered below here
+                return
+            if name not in node._children:
+                node._children[name] = FilterTrie()
+            node = node._children[name]
+        if path:
+            node._terminal = True
+            node._children = {}
+
+    def child(self, name):
+        '''Get the trie to filter the children of a path element by.
+
+        @param name The name of a child of the level this trie filters.
+        @return The trie for the child's children, or None if the child is
+                filtered out.
+
+        '''
+        if self.matches_all:
+            return self
+        return self._children.get(name, None)
+
+    def descend(self, path):
+        '''Get the trie to filter the children of a path by.
+
+        @return The trie, or None if the path is filtered out.
+
+        '''
+        node = self
+        for name in path:
+            node = node.child(name)
+            if node is None:
+                return None
+        return node
+
+    def filtered(self, path):
+        '''Check if a path is removed by the filter.'''
+        return self.descend(path) is None
+
+    @property
+    def matches_all(self):
+        '''Does this trie let every path through?'''
+        return self._terminal or not self._children
+
+
+def compile_filter(filter):
+    '''Compile a list of filter paths into a FilterTrie.
+
+    @param filter A list of paths, or a FilterTrie, which is returned as is.
+
+    '''
+    if isinstance(filter, FilterTrie):
+        return filter
+    return FilterTrie(filter)
+
+
+def call_concurrently(func, items, max_workers=None):
+    '''Call a function on each item of a list using a pool of threads.
+
+    This is intended for fanning out blocking remote calls. The calls are
+    made in parallel, but the results are returned in the same order as
+    @ref items. An exception raised by one call does not prevent the other
+    calls from being made; it is returned in place of that call's result.
+
+    @param func The function to call. It is called as func(item).
+    @param items The list of items to call @ref func on.
+    @param max_workers The maximum number of threads to use. If None, the
+                       'max_workers' option is used.
+    @return A list of (result, exception) tuples, one per item. If the call
+            succeeded, exception is None.
+
+    Example:
+    >>> call_concurrently(lambda x: x * 2, [1, 2, 3])
+    [(2, None), (4, None), (6, None)]
+
+    '''
+    items = list(items)
+    if max_workers is None:
+        max_workers = Options().get_option('max_workers')
+    max_workers = min(max_workers, len(items))
+    if max_workers <= 1:
+        # Not worth starting any threads
+        results = []
+        for item in items:
+            try:
+                results.append((func(item), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+    from concurrent import futures
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fs = [executor.submit(func, item) for item in items]
+        results = []
+        for f in fs:
+            e = f.exception()
+            if e is None:
+                results.append((f.result(), None))
+            else:
+                results.append((None, e))
+    return results
+
+
 def trim_filter(filter, levels=1):
     '''Trim @ref levels levels from the front of each path in @filter.'''
     trimmed = [f[levels:] for f in filter]
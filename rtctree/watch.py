@@ -0,0 +1,153 @@
+# -*- Python -*-
+# -*- coding: utf-8 -*-
+
+'''rtctree
+
+Copyright (C) 2009-2015
+    Geoffrey Biggs
+    RT-Synthesis Research Group
+    Intelligent Systems Research Institute,
+    National Institute of Advanced Industrial Science and Technology (AIST),
+    Japan
+    All rights reserved.
+Licensed under the GNU Lesser General Public License version 3.
+http://www.gnu.org/licenses/lgpl-3.0.en.html
+
+Background watching of the structure of a tree.
+
+'''
+
+
+from __future__ import print_function
+
+import os.path
+import sys
+import threading
+
+from rtctree import utils
+from rtctree.directory import Directory
+from rtctree.options import Options
+
+
+##############################################################################
+## Watcher object
+
+class TreeWatcher(object):
+    '''Periodically relists the naming contexts of a tree.
+
+    Each check calls Directory.relist() on the directories below a node, so
+    bindings that have been added to or removed from the name servers are
+    added to or removed from the tree, and the node_added, node_removed and
+    node_replaced callbacks are called.
+
+    The time between checks adapts to how often the tree changes. It starts
+    at the minimum interval and doubles after each check that finds no
+    changes, up to the maximum interval. A check that finds changes sets it
+    back to the minimum.
+
+    Errors raised by checks made in the background thread are written to
+    standard error and kept in @ref last_error.
+
+    '''
+    def __init__(self, node, min_interval=None, max_interval=None):
+        '''Constructor.
+
+        @param node The node below which to watch, usually the root node of
+                    a tree. If it is a directory, only it and its
+                    subdirectories are watched.
+        @param min_interval The shortest time between checks, in seconds. If
+                            None, the 'watch_min_interval' option is used.
+        @param max_interval The longest time between checks, in seconds. If
+                            None, the 'watch_max_interval' option is used.
+
+        '''
+        self._node = node
+        if min_interval is None:
+            min_interval = Options().get_option('watch_min_interval')
+        if max_interval is None:
+            max_interval = Options().get_option('watch_max_interval')
+        self._min_interval = min_interval
+        self._max_interval = max(min_interval, max_interval)
+        self._interval = min_interval
+        self._last_error = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._mutex = threading.Lock()
+
+    def start(self):
+        '''Start watching in a background thread.'''
+        with self._mutex:
+            if self._thread:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run,
+                    name='rtctree-tree-watcher')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        '''Stop watching and wait for the background thread to exit.'''
+        with self._mutex:
+            thread = self._thread
+            self._thread = None
+        if thread:
+            self._stop.set()
+            thread.join()
+
+    def check(self):
+        '''Relist all watched directories once.
+
+        This can be called without starting the background thread. The
+        name servers are relisted in parallel.
+
+        @return The number of changes found.
+
+        '''
+        if isinstance(self._node, Directory):
+            dirs = [self._node]
+        else:
+            dirs = [n for n in self._node.children \
+                    if isinstance(n, Directory)]
+        changes = 0
+        for count, e in utils.call_concurrently(lambda d: d.relist(), dirs):
+            if e:
+                raise e
+            changes += count
+        if changes:
+            self._interval = self._min_interval
+        else:
+            self._interval = min(self._interval * 2, self._max_interval)
+        return changes
+
+    @property
+    def interval(self):
+        '''The current time between checks, in seconds.'''
+        return self._interval
+
+    @property
+    def last_error(self):
+        '''The exception raised by the last check made in the background
+        thread, or None if it succeeded.'''
+        return self._last_error
+
+    @property
+    def running(self):
+        '''Is the background thread running?'''
+        with self._mutex:
+            return self._thread is not None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+                self._last_error = None
+            except Exception as e:
+                # Keep watching; a name server may be back by the next check
+                self._last_error = e
+                print('{0}: Warning: failed to relist naming contexts: '\
+                        '{1}'.format(os.path.basename(sys.argv[0]), e),
+                        file=sys.stderr)
+            self._stop.wait(self._interval)
+
+
+# vim: set expandtab tabstop=8 shiftwidth=4 softtabstop=4 textwidth=79